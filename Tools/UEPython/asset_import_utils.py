@@ -1,5 +1,10 @@
+import itertools
+import time
 import unreal
 
+# Tasks imported between two saves / garbage collections in execute_import_tasks_chunked
+DEFAULT_IMPORT_CHUNK_SIZE = 100
+
 
 def build_input_task_simple(filename, destination_path, destination_name='', option=None):
     unreal.log("Build Import Task: {} to {} as {}".format(filename, destination_path, destination_name))
@@ -16,6 +21,27 @@ def build_input_task_simple(filename, destination_path, destination_name='', opt
     return task
 
 
+def build_import_task(filename, destination_path, destination_name='', profile_name=None):
+    """
+    Bulk counterpart of build_input_task_simple for execute_import_tasks_chunked: no log line, every
+    property set in one call, options shared from an import profile and saving left to the chunk.
+    """
+    task = unreal.AssetImportTask()
+    properties = {
+        'automated': True,
+        'destination_name': destination_name,
+        'destination_path': destination_path,
+        'filename': filename,
+        'replace_existing': True,
+        'save': False,
+    }
+    options = get_import_options(profile_name) if profile_name else None
+    if options:
+        properties['options'] = options
+    task.set_editor_properties(properties)
+    return task
+
+
 def execute_import_tasks(tasks=[]):
     unreal.AssetToolsHelpers.get_asset_tools().import_asset_tasks(tasks)
     imported_asset_paths = []
@@ -26,7 +52,102 @@ def execute_import_tasks(tasks=[]):
     return imported_asset_paths
 
 
-def build_staticmesh_import_options():
+class ImportTaskResult:
+    def __init__(self, filename, destination, success, elapsed, imported_paths, error=None):
+        self.filename = filename
+        self.destination = destination
+        self.success = success
+        self.elapsed = elapsed
+        self.imported_paths = imported_paths
+        self.error = error
+
+    def __repr__(self):
+        return f"ImportTaskResult(filename={self.filename}, success={self.success}, elapsed={self.elapsed:.2f}s)"
+
+
+def execute_import_tasks_chunked(tasks, chunk_size=None, on_result=None):
+    """
+    Imports tasks chunk by chunk (DEFAULT_IMPORT_CHUNK_SIZE if chunk_size is not given).
+    Every task is imported on its own so a bad file only fails itself,
+    the imported assets are saved once per chunk instead of once per task, and garbage is collected
+    between chunks so editor memory follows the chunk size rather than the batch size.
+    tasks can be a generator, it is only consumed one chunk at a time.
+    on_result is called with the ImportTaskResult of every task.
+    """
+    chunk_size = chunk_size or DEFAULT_IMPORT_CHUNK_SIZE
+    asset_tools = unreal.AssetToolsHelpers.get_asset_tools()
+    task_iter = iter(tasks)
+    results = []
+    chunk_index = 0
+    while True:
+        chunk = list(itertools.islice(task_iter, chunk_size))
+        if not chunk:
+            break
+        chunk_start_time = time.perf_counter()
+        imported_assets = []
+        for task in chunk:
+            task.set_editor_property('save', False)
+            filename = task.get_editor_property('filename')
+            destination = "{}/{}".format(task.get_editor_property('destination_path'),
+                                         task.get_editor_property('destination_name'))
+            start_time = time.perf_counter()
+            error = None
+            imported_objects = []
+            try:
+                asset_tools.import_asset_tasks([task])
+                imported_objects = list(task.get_objects())
+            except Exception as e:
+                error = str(e)
+            elapsed = time.perf_counter() - start_time
+            if not imported_objects and not error:
+                error = "Nothing was imported"
+            imported_paths = [obj.get_package().get_path_name() for obj in imported_objects]
+            result = ImportTaskResult(filename, destination, not error, elapsed, imported_paths, error)
+            if error:
+                unreal.log_error("Import failed: {} ({:.2f}s): {}".format(filename, elapsed, error))
+            else:
+                unreal.log("Imported: {} ({:.2f}s)".format(destination, elapsed))
+            imported_assets.extend(imported_objects)
+            results.append(result)
+            if on_result:
+                on_result(result)
+
+        if imported_assets:
+            unreal.EditorAssetLibrary.save_loaded_assets(imported_assets, True)
+        unreal.log("Import chunk {}: {} tasks in {:.1f}s".format(
+            chunk_index, len(chunk), time.perf_counter() - chunk_start_time))
+        # drop every reference to the chunk before collecting
+        del chunk, task, imported_assets, imported_objects
+        unreal.SystemLibrary.collect_garbage()
+        chunk_index += 1
+
+    log_import_report(results)
+    return results
+
+
+def log_import_report(results, slowest_count=10):
+    failed = [r for r in results if not r.success]
+    total_time = sum(r.elapsed for r in results)
+    unreal.log("Import: {} succeeded, {} failed in {:.1f}s".format(len(results) - len(failed), len(failed), total_time))
+    if results:
+        unreal.log("Slowest imports:")
+    for result in sorted(results, key=lambda r: r.elapsed, reverse=True)[:slowest_count]:
+        unreal.log("  {:.2f}s {}".format(result.elapsed, result.filename))
+    for result in failed:
+        unreal.log_error("  FAILED {}: {}".format(result.filename, result.error))
+
+
+def list_existing_packages(root_path="/Game/Old"):
+    """
+    Returns the set of package names under root_path with a single asset registry query,
+    instead of one does_asset_exist call per asset.
+    """
+    asset_registry = unreal.AssetRegistryHelpers.get_asset_registry()
+    asset_datas = asset_registry.get_assets_by_path(root_path, recursive=True)
+    return {str(asset_data.package_name) for asset_data in asset_datas}
+
+
+def build_staticmesh_import_options(build_nanite=True, auto_generate_collision=True, generate_lightmap_uvs=False):
     options = unreal.FbxImportUI()
     # unreal.FbxImportUI
     options.set_editor_property('import_mesh', True)
@@ -39,16 +160,59 @@ def build_staticmesh_import_options():
     options.static_mesh_import_data.set_editor_property('import_uniform_scale', 1.0)
     # unreal.FbxStaticMeshImportData
     options.static_mesh_import_data.set_editor_property('combine_meshes', True)
-    options.static_mesh_import_data.set_editor_property('generate_lightmap_u_vs', False)
-    options.static_mesh_import_data.set_editor_property('auto_generate_collision', True)
+    options.static_mesh_import_data.set_editor_property('generate_lightmap_u_vs', generate_lightmap_uvs)
+    options.static_mesh_import_data.set_editor_property('auto_generate_collision', auto_generate_collision)
     options.static_mesh_import_data.set_editor_property('one_convex_hull_per_ucx', True)
-    options.static_mesh_import_data.set_editor_property('build_nanite', True)
+    options.static_mesh_import_data.set_editor_property('build_nanite', build_nanite)
     # force fix the normal from cgf
     options.static_mesh_import_data.set_editor_property('recompute_normals', True)
     
     return options
 
 
+class ImportProfile:
+    """
+    Import options shared by every task importing one kind of asset, built by build_options on first use.
+    A profile without build_options imports with the factory defaults.
+    """
+    def __init__(self, name, build_options=None):
+        self.name = name
+        self.build_options = build_options
+        self.options = None
+        self.built = False
+
+    def __repr__(self):
+        return f"ImportProfile(name={self.name}, built={self.built})"
+
+    def get_options(self):
+        if not self.built:
+            self.options = self.build_options() if self.build_options else None
+            self.built = True
+        return self.options
+
+
+# Profile name -> ImportProfile, see register_import_profile
+IMPORT_PROFILES = {}
+
+
+def register_import_profile(name, build_options=None):
+    """
+    Registers or replaces a profile, e.g. one per ce_mesh_policy class.
+    """
+    profile = ImportProfile(name, build_options)
+    IMPORT_PROFILES[name] = profile
+    return profile
+
+
+def get_import_options(profile_name):
+    return IMPORT_PROFILES[profile_name].get_options()
+
+
+register_import_profile('static_mesh', build_staticmesh_import_options)
+# texture settings come from the ce_texture_roles role applied right after import
+register_import_profile('texture')
+
+
 def open_editor_for_asset(asset_path):
     if not unreal.EditorAssetLibrary.does_asset_exist(asset_path):
         raise Exception('Fail to find asset: {}'.format(asset_path))
@@ -0,0 +1,95 @@
+import hashlib
+import json
+import os
+
+HASH_CHUNK_SIZE = 1024 * 1024
+
+
+def hash_file(file_path):
+    sha1 = hashlib.sha1()
+    with open(file_path, 'rb') as file:
+        for chunk in iter(lambda: file.read(HASH_CHUNK_SIZE), b''):
+            sha1.update(chunk)
+    return sha1.hexdigest()
+
+
+def file_fingerprint(file_path, previous=None):
+    """
+    Returns {size, mtime, hash} for a file. The hash of the previous fingerprint is reused
+    when size and mtime did not change, so unchanged files are never read again.
+    """
+    stat = os.stat(file_path)
+    if previous and previous.get('size') == stat.st_size and previous.get('mtime') == stat.st_mtime_ns:
+        return previous
+    return {'size': stat.st_size, 'mtime': stat.st_mtime_ns, 'hash': hash_file(file_path)}
+
+
+class BuildManifest:
+    """
+    JSON manifest of what each pipeline stage produced, stored as
+    stage -> key -> {inputs: {path: fingerprint}, outputs: {path: fingerprint}, ...extra}.
+    A stage can skip a key when is_up_to_date() reports its inputs and outputs unchanged.
+    """
+    def __init__(self, manifest_path):
+        self.manifest_path = manifest_path
+        self.stages = {}
+        self.dirty = False
+        if os.path.exists(manifest_path):
+            try:
+                with open(manifest_path, 'r', encoding='utf-8') as file:
+                    self.stages = json.load(file)
+            except (OSError, ValueError) as e:
+                print(f"Error reading build manifest {manifest_path}, starting from scratch: {e}")
+
+    def get_record(self, stage, key):
+        return self.stages.get(stage, {}).get(key)
+
+    def _files_unchanged(self, paths, recorded):
+        if set(paths) != set(recorded):
+            return False
+        for path in paths:
+            if not os.path.exists(path):
+                return False
+            fingerprint = file_fingerprint(path, recorded[path])
+            if fingerprint['hash'] != recorded[path]['hash']:
+                return False
+            if fingerprint is not recorded[path]:
+                # touched but same content, remember the new mtime so it is not hashed again
+                recorded[path] = fingerprint
+                self.dirty = True
+        return True
+
+    def is_up_to_date(self, stage, key, inputs, outputs=()):
+        record = self.get_record(stage, key)
+        if not record:
+            return False
+        return (self._files_unchanged(inputs, record.get('inputs', {})) and
+                self._files_unchanged(outputs, record.get('outputs', {})))
+
+    def record(self, stage, key, inputs, outputs=(), **extra):
+        previous = self.get_record(stage, key) or {}
+        previous_inputs = previous.get('inputs', {})
+        previous_outputs = previous.get('outputs', {})
+        record = {
+            'inputs': {path: file_fingerprint(path, previous_inputs.get(path)) for path in inputs},
+            'outputs': {path: file_fingerprint(path, previous_outputs.get(path))
+                        for path in outputs if os.path.exists(path)},
+        }
+        record.update(extra)
+        self.stages.setdefault(stage, {})[key] = record
+        self.dirty = True
+        return record
+
+    def remove(self, stage, key):
+        if self.stages.get(stage, {}).pop(key, None) is not None:
+            self.dirty = True
+
+    def save(self):
+        if not self.dirty:
+            return
+        os.makedirs(os.path.dirname(os.path.abspath(self.manifest_path)), exist_ok=True)
+        temp_path = self.manifest_path + ".tmp"
+        with open(temp_path, 'w', encoding='utf-8') as file:
+            json.dump(self.stages, file)
+        os.replace(temp_path, self.manifest_path)
+        self.dirty = False
@@ -0,0 +1,243 @@
+import os
+import sqlite3
+import time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+import ce_build_manifest
+import ce_path_utils
+
+SCRIPT_DIR = os.path.dirname(os.path.abspath(__file__))
+DATASET_CATALOG = os.path.join(SCRIPT_DIR, "build_manifests/dataset_catalog.sqlite")
+# Directory listing is I/O bound, threads overlap the file system calls
+DEFAULT_SCAN_WORKERS = 16
+CATALOG_INSERT_BATCH_SIZE = 10000
+
+# Extension -> kind, split .dds chains (name.dds, name.dds.1, name.dds.1a, ...) are all 'dds'
+FILE_KINDS = {
+    '.cgf': 'cgf',
+    '.cga': 'cgf',
+    '.mtl': 'mtl',
+    '.lyr': 'lyr',
+    '.veg': 'veg',
+    '.xml': 'xml',
+    '.editor_xml': 'xml',
+    '.tga': 'tga',
+    '.dae': 'dae',
+    '.fbx': 'fbx',
+}
+
+CATALOG_SCHEMA = """
+CREATE TABLE IF NOT EXISTS files (
+    path TEXT PRIMARY KEY,
+    dir TEXT NOT NULL,
+    name TEXT NOT NULL,
+    kind TEXT NOT NULL,
+    size INTEGER NOT NULL,
+    mtime_ns INTEGER NOT NULL,
+    hash TEXT
+);
+CREATE INDEX IF NOT EXISTS files_kind ON files (kind);
+CREATE INDEX IF NOT EXISTS files_dir ON files (dir);
+"""
+
+
+def get_file_kind(file_name):
+    if file_name.endswith('.dds') or '.dds.' in file_name:
+        return 'dds'
+    return FILE_KINDS.get(os.path.splitext(file_name)[1].lower(), 'other')
+
+
+def scan_directory(path):
+    """
+    One level of a directory: (path, [(file name, size, mtime_ns)], [sub directory paths]).
+    """
+    files = []
+    sub_directories = []
+    try:
+        with os.scandir(path) as entries:
+            for entry in entries:
+                if entry.is_dir(follow_symlinks=False):
+                    sub_directories.append(entry.path)
+                elif entry.is_file():
+                    stat = entry.stat()
+                    files.append((entry.name, stat.st_size, stat.st_mtime_ns))
+    except OSError as e:
+        print(f"Cannot scan {path}: {e}")
+    return path, files, sub_directories
+
+
+def scan_tree(root, max_workers=None):
+    """
+    Yields (directory path, files) of every directory under root, listed by max_workers threads,
+    each sub directory being queued as soon as its parent is listed.
+    """
+    with ThreadPoolExecutor(max_workers=max_workers or DEFAULT_SCAN_WORKERS) as executor:
+        pending = {executor.submit(scan_directory, root)}
+        while pending:
+            done, pending = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                path, files, sub_directories = future.result()
+                pending.update(executor.submit(scan_directory, sub_directory) for sub_directory in sub_directories)
+                yield path, files
+
+
+def get_walk_order_key(relative_dir):
+    # os.walk order on NTFS: a folder's files, then each sub folder in NTFS name order, which compares
+    # upper cased names (so 'ab' comes before 'a_b')
+    return relative_dir.upper().split('/') if relative_dir else []
+
+
+class DatasetCatalog:
+    """
+    SQLite index of every file under root (the CryEngine dump by default): '/' separated path relative to
+    root, kind (see FILE_KINDS), size, mtime and, for the kinds asked for, a content hash.
+    refresh() rescans the tree in parallel and only writes the rows of added, changed and removed files.
+    """
+    def __init__(self, root=None, db_path=DATASET_CATALOG):
+        self.root = os.path.abspath(root or ce_path_utils.CRY_ENGINE_OUTPUT_FOLDER_ROOT)
+        self.db_path = db_path
+        os.makedirs(os.path.dirname(os.path.abspath(db_path)), exist_ok=True)
+        self.connection = sqlite3.connect(db_path)
+        self.connection.executescript(CATALOG_SCHEMA)
+
+    def __repr__(self):
+        return f"DatasetCatalog(root={self.root}, db_path={self.db_path})"
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+    def close(self):
+        self.connection.close()
+
+    def get_relative_path(self, path):
+        """
+        '/' separated path relative to root, raises ValueError for a path outside of root.
+        """
+        relative_path = os.path.relpath(os.path.abspath(path), self.root).replace(os.sep, '/')
+        if relative_path == '..' or relative_path.startswith('../'):
+            raise ValueError(f"{path} is outside of the catalog root {self.root}")
+        return '' if relative_path == '.' else relative_path
+
+    def get_absolute_path(self, relative_path):
+        if not relative_path:
+            return self.root
+        return os.path.join(self.root, relative_path.replace('/', os.sep))
+
+    def refresh(self, max_workers=None, hash_kinds=()):
+        """
+        Brings the catalog up to date with the file system. Files of hash_kinds get a sha1, only computed
+        for new or changed files. Returns (added, changed, removed) counts.
+        """
+        start_time = time.perf_counter()
+        known = {path: (size, mtime_ns) for path, size, mtime_ns in
+                 self.connection.execute("SELECT path, size, mtime_ns FROM files")}
+        seen = set()
+        updates = []
+        added_count = 0
+        for dir_path, files in scan_tree(self.root, max_workers):
+            relative_dir = self.get_relative_path(dir_path)
+            for name, size, mtime_ns in files:
+                path = f"{relative_dir}/{name}" if relative_dir else name
+                seen.add(path)
+                previous = known.get(path)
+                if previous == (size, mtime_ns):
+                    continue
+                if previous is None:
+                    added_count += 1
+                updates.append((path, relative_dir, name, get_file_kind(name), size, mtime_ns))
+        removed = [(path,) for path in known.keys() - seen]
+        with self.connection:
+            for index in range(0, len(updates), CATALOG_INSERT_BATCH_SIZE):
+                self.connection.executemany(
+                    "INSERT OR REPLACE INTO files (path, dir, name, kind, size, mtime_ns, hash) "
+                    "VALUES (?, ?, ?, ?, ?, ?, NULL)", updates[index:index + CATALOG_INSERT_BATCH_SIZE])
+            self.connection.executemany("DELETE FROM files WHERE path = ?", removed)
+        if hash_kinds:
+            self.update_hashes(hash_kinds, max_workers)
+        print(f"Catalog {self.root}: {len(seen)} files, {added_count} added, {len(updates) - added_count} changed, "
+              f"{len(removed)} removed ({time.perf_counter() - start_time:.1f}s)")
+        return added_count, len(updates) - added_count, len(removed)
+
+    def update_hashes(self, kinds, max_workers=None):
+        placeholders = ','.join('?' * len(kinds))
+        paths = [path for path, in self.connection.execute(
+            f"SELECT path FROM files WHERE hash IS NULL AND kind IN ({placeholders})", tuple(kinds))]
+        if not paths:
+            return 0
+        with ThreadPoolExecutor(max_workers=max_workers or DEFAULT_SCAN_WORKERS) as executor:
+            hashes = list(executor.map(ce_build_manifest.hash_file, map(self.get_absolute_path, paths)))
+        with self.connection:
+            self.connection.executemany("UPDATE files SET hash = ? WHERE path = ?", zip(hashes, paths))
+        return len(paths)
+
+    def query(self, kind=None, under=None):
+        """
+        (relative path, dir, name, size, mtime_ns, hash) rows of the files of a kind under a folder
+        (absolute, or relative to root), in os.walk order. Raises ValueError for a folder outside of root.
+        """
+        conditions = []
+        args = []
+        if kind:
+            conditions.append("kind = ?")
+            args.append(kind)
+        relative_dir = self.get_relative_path(os.path.join(self.root, under)) if under else ''
+        if relative_dir:
+            conditions.append("(dir = ? OR substr(dir, 1, ?) = ?)")
+            args += [relative_dir, len(relative_dir) + 1, relative_dir + '/']
+        sql = "SELECT path, dir, name, size, mtime_ns, hash FROM files"
+        if conditions:
+            sql += " WHERE " + " AND ".join(conditions)
+        rows = self.connection.execute(sql, args).fetchall()
+        rows.sort(key=lambda row: (get_walk_order_key(row[1]), row[2].upper()))
+        return rows
+
+    def get_paths(self, kind=None, under=None):
+        """
+        Absolute paths of the files of a kind under a folder.
+        """
+        return [self.get_absolute_path(row[0]) for row in self.query(kind, under)]
+
+    def get_paths_by_stem(self, kind):
+        """
+        File name without extension -> absolute paths, e.g. the .mtl files of a material library name.
+        """
+        paths_by_stem = {}
+        for path, _, name, _, _, _ in self.query(kind):
+            paths_by_stem.setdefault(os.path.splitext(name)[0], []).append(self.get_absolute_path(path))
+        return paths_by_stem
+
+    def walk(self, under=None, kind=None):
+        """
+        Drop-in for os.walk loops that only need the files: yields (absolute folder, file names).
+        """
+        current_dir = None
+        names = []
+        for _, relative_dir, name, _, _, _ in self.query(kind, under):
+            if relative_dir != current_dir:
+                if names:
+                    yield self.get_absolute_path(current_dir), names
+                current_dir = relative_dir
+                names = []
+            names.append(name)
+        if names:
+            yield self.get_absolute_path(current_dir), names
+
+
+def walk_files(folder, catalog=None, kind=None):
+    """
+    (folder, file names) of every folder under folder, from the catalog when one is given (its root must
+    contain folder, ValueError otherwise), else from os.walk. kind only filters catalog results, callers
+    still check names.
+    """
+    if catalog:
+        yield from catalog.walk(os.path.abspath(folder), kind)
+        return
+    for root, _, files in os.walk(folder):
+        yield root, files
+
+
+if __name__ == "__main__":
+    with DatasetCatalog() as catalog:
+        catalog.refresh()
@@ -0,0 +1,678 @@
+"""
+In-process replacement for DDS-Unsplitter + nvtt_export: reassembles CryEngine split DDS chains
+(name.dds / name.dds.0 header, name.dds.1..N streamed mips, name.dds.1a..Na attached alpha mips),
+decodes the top mip with NumPy and writes it as .tga or .png.
+"""
+import os
+import re
+import struct
+import zlib
+import numpy as np
+
+DDS_MAGIC = b"DDS "
+DDS_HEADER_SIZE = 124
+DDS_DX10_HEADER_SIZE = 20
+
+DDPF_ALPHAPIXELS = 0x1
+DDPF_ALPHA = 0x2
+DDPF_FOURCC = 0x4
+DDPF_RGB = 0x40
+DDPF_LUMINANCE = 0x20000
+DDSCAPS2_CUBEMAP = 0x200
+DDSCAPS2_VOLUME = 0x200000
+
+# CryEngine extension chunks stored after the persistent mips of the header file
+CRY_EXTENSION_BEGIN = b"CExt"
+CRY_EXTENSION_END = b"CEnd"
+CRY_ATTACHED_IMAGE = b"AttC"
+
+# format -> bytes per 4x4 block
+BLOCK_SIZES = {'BC1': 8, 'BC2': 16, 'BC3': 16, 'BC4': 8, 'BC5': 16, 'BC7': 16}
+
+FOURCC_FORMATS = {
+    b"DXT1": 'BC1', b"DXT2": 'BC2', b"DXT3": 'BC2', b"DXT4": 'BC3', b"DXT5": 'BC3',
+    b"ATI1": 'BC4', b"BC4U": 'BC4', b"ATI2": 'BC5', b"BC5U": 'BC5',
+}
+DXGI_FORMATS = {
+    70: 'BC1', 71: 'BC1', 72: 'BC1', 73: 'BC2', 74: 'BC2', 75: 'BC2', 76: 'BC3', 77: 'BC3', 78: 'BC3',
+    79: 'BC4', 80: 'BC4', 82: 'BC5', 83: 'BC5', 97: 'BC7', 98: 'BC7', 99: 'BC7',
+    27: 'RGBA8', 28: 'RGBA8', 29: 'RGBA8', 87: 'BGRA8', 88: 'BGRX8', 90: 'BGRA8', 91: 'BGRA8',
+    92: 'BGRX8', 93: 'BGRX8', 61: 'R8', 65: 'A8',
+}
+DXGI_PIXEL_SIZES = {'RGBA8': 4, 'BGRA8': 4, 'BGRX8': 4, 'R8': 1, 'A8': 1}
+
+OUTPUT_FORMATS = ('tga', 'png')
+GLOSS_SUFFIX = "_glossmap"
+
+
+class DDSDecodeError(Exception):
+    pass
+
+
+class DdsHeader:
+    def __init__(self):
+        self.width = 0
+        self.height = 0
+        self.mip_count = 1
+        self.format = None
+        # legacy uncompressed formats
+        self.bit_count = 0
+        self.masks = (0, 0, 0, 0)
+        self.pixel_flags = 0
+        self.header_size = 0
+
+    def get_mip_size(self, mip):
+        width = max(1, self.width >> mip)
+        height = max(1, self.height >> mip)
+        if self.format in BLOCK_SIZES:
+            return max(1, (width + 3) // 4) * max(1, (height + 3) // 4) * BLOCK_SIZES[self.format]
+        if self.format in DXGI_PIXEL_SIZES:
+            return width * height * DXGI_PIXEL_SIZES[self.format]
+        return width * height * (self.bit_count // 8)
+
+    def get_mip_sizes(self):
+        return [self.get_mip_size(mip) for mip in range(self.mip_count)]
+
+    def __repr__(self):
+        return f"DdsHeader({self.width}x{self.height}, mips={self.mip_count}, format={self.format})"
+
+
+def parse_dds_header(data, offset=0):
+    """
+    Parses a DDS header at offset, with or without the 'DDS ' magic. Returns a DdsHeader whose
+    header_size covers magic, header and DX10 extension.
+    """
+    start = offset
+    if data[offset:offset + 4] == DDS_MAGIC:
+        offset += 4
+    if len(data) < offset + DDS_HEADER_SIZE:
+        raise DDSDecodeError("File too small for a DDS header")
+    (size, _, height, width, _, _, mip_count) = struct.unpack_from('<7I', data, offset)
+    if size != DDS_HEADER_SIZE:
+        raise DDSDecodeError(f"Bad DDS header size {size}")
+    pf_flags, fourcc, bit_count, r_mask, g_mask, b_mask, a_mask = struct.unpack_from('<I4s5I', data, offset + 76)
+    caps2 = struct.unpack_from('<I', data, offset + 108)[0]
+    if caps2 & (DDSCAPS2_CUBEMAP | DDSCAPS2_VOLUME):
+        raise DDSDecodeError("Cube maps and volume textures are not supported")
+    offset += DDS_HEADER_SIZE
+
+    header = DdsHeader()
+    header.width = width
+    header.height = height
+    header.mip_count = max(1, mip_count)
+    header.pixel_flags = pf_flags
+    header.bit_count = bit_count
+    header.masks = (r_mask, g_mask, b_mask, a_mask)
+    if pf_flags & DDPF_FOURCC:
+        if fourcc == b"DX10":
+            dxgi_format, dimension, _, array_size = struct.unpack_from('<4I', data, offset)
+            offset += DDS_DX10_HEADER_SIZE
+            if dimension != 3 or array_size > 1:
+                raise DDSDecodeError("Only single 2D DX10 textures are supported")
+            header.format = DXGI_FORMATS.get(dxgi_format)
+            if header.format is None:
+                raise DDSDecodeError(f"Unsupported DXGI format {dxgi_format}")
+        else:
+            header.format = FOURCC_FORMATS.get(fourcc)
+            if header.format is None:
+                raise DDSDecodeError(f"Unsupported FourCC {fourcc!r}")
+    elif pf_flags & (DDPF_RGB | DDPF_LUMINANCE | DDPF_ALPHA) and bit_count in (8, 16, 24, 32):
+        header.format = 'MASKED'
+    else:
+        raise DDSDecodeError(f"Unsupported pixel format flags {pf_flags:#x}")
+    header.header_size = offset - start
+    return header
+
+
+class DdsChain:
+    """
+    The files of one split texture: header file, streamed mip files and attached alpha mip files,
+    the latter two as chunk number -> path.
+    """
+    def __init__(self, header_path, mip_files, alpha_mip_files):
+        self.header_path = header_path
+        self.mip_files = mip_files
+        self.alpha_mip_files = alpha_mip_files
+
+    def get_base_path(self):
+        return re.sub(r'\.dds(\.0)?$', '', self.header_path)
+
+    def __repr__(self):
+        return f"DdsChain({self.header_path}, mips={len(self.mip_files)}, alpha mips={len(self.alpha_mip_files)})"
+
+
+def find_dds_chain(header_path, dir_files=None):
+    """
+    Collects the split files belonging to a header file (name.dds, or name.dds.0 once staged).
+    dir_files is the listing of its folder, to avoid listing it again for every texture.
+    """
+    folder, header_name = os.path.split(header_path)
+    dds_name = re.sub(r'\.0$', '', header_name)
+    chunk_pattern = re.compile(re.escape(dds_name) + r'\.(\d+)(a?)$', re.IGNORECASE)
+    mip_files = {}
+    alpha_mip_files = {}
+    for file_name in (dir_files if dir_files is not None else os.listdir(folder)):
+        match = chunk_pattern.match(file_name)
+        if not match or file_name == header_name:
+            continue
+        chunk = int(match.group(1))
+        if chunk == 0 and not match.group(2):
+            continue
+        (alpha_mip_files if match.group(2) else mip_files)[chunk] = os.path.join(folder, file_name)
+    return DdsChain(header_path, mip_files, alpha_mip_files)
+
+
+def _assign_split_files(mip_sizes, file_sizes):
+    """
+    Returns the first mip held in the header file if the files, in the given order, hold whole
+    consecutive mips starting at mip 0, otherwise None.
+    """
+    mip = 0
+    for file_size in file_sizes:
+        remaining = file_size
+        while remaining > 0 and mip < len(mip_sizes):
+            remaining -= mip_sizes[mip]
+            mip += 1
+        if remaining != 0:
+            return None
+    return mip
+
+
+def reassemble_mips(header, persistent_data, split_files):
+    """
+    Returns the full mip chain of a split image. The split files hold the largest mips, the header file
+    the rest; which end of the numbering holds mip 0 is worked out from the file sizes.
+    Also returns the bytes left in persistent_data after the image (the CryEngine extension chunks).
+    """
+    mip_sizes = header.get_mip_sizes()
+    chunks = sorted(split_files)
+    file_sizes = {chunk: os.path.getsize(split_files[chunk]) for chunk in chunks}
+    for ordered_chunks in (chunks[::-1], chunks):
+        first_persistent_mip = _assign_split_files(mip_sizes, [file_sizes[chunk] for chunk in ordered_chunks])
+        if first_persistent_mip is None:
+            continue
+        persistent_size = sum(mip_sizes[first_persistent_mip:])
+        if persistent_size > len(persistent_data):
+            continue
+        parts = []
+        for chunk in ordered_chunks:
+            with open(split_files[chunk], 'rb') as file:
+                parts.append(file.read())
+        parts.append(persistent_data[:persistent_size])
+        return b''.join(parts), persistent_data[persistent_size:]
+    raise DDSDecodeError("Split mip files don't match the mip chain of the header")
+
+
+def find_attached_image(extension_data):
+    """
+    Returns the attached image (header + persistent mips) stored in the CryEngine extension chunks, or None.
+    """
+    offset = extension_data.find(CRY_EXTENSION_BEGIN)
+    if offset < 0:
+        return None
+    offset += 4
+    while offset + 8 <= len(extension_data):
+        chunk_id = extension_data[offset:offset + 4]
+        if chunk_id == CRY_EXTENSION_END:
+            break
+        chunk_size = struct.unpack_from('<I', extension_data, offset + 4)[0]
+        offset += 8
+        if chunk_id == CRY_ATTACHED_IMAGE:
+            return extension_data[offset:offset + chunk_size]
+        offset += chunk_size
+    return None
+
+
+def read_dds_chain(chain):
+    """
+    Returns ((header, mip data), (alpha header, alpha mip data) or None) for a split texture.
+    """
+    with open(chain.header_path, 'rb') as file:
+        data = file.read()
+    header = parse_dds_header(data)
+    mip_data, extension_data = reassemble_mips(header, data[header.header_size:], chain.mip_files)
+
+    attached = None
+    attached_data = find_attached_image(extension_data)
+    if attached_data:
+        alpha_header = parse_dds_header(attached_data)
+        alpha_mip_data, _ = reassemble_mips(alpha_header, attached_data[alpha_header.header_size:],
+                                            chain.alpha_mip_files)
+        attached = (alpha_header, alpha_mip_data)
+    return (header, mip_data), attached
+
+
+# ---------------------------------------------------------------------------------------------------------
+# Block decoders. Each takes the raw blocks of one mip as an (n, block size) uint8 array and returns
+# (n, 16, 4) RGBA pixels in block raster order.
+# ---------------------------------------------------------------------------------------------------------
+
+def _expand_565(colors):
+    r = (colors >> 11) & 31
+    g = (colors >> 5) & 63
+    b = colors & 31
+    return np.stack([(r << 3) | (r >> 2), (g << 2) | (g >> 4), (b << 3) | (b >> 2)], axis=-1)
+
+
+def decode_bc1_colors(blocks, allow_transparent=True):
+    c0 = blocks[:, 0].astype(np.int32) | (blocks[:, 1].astype(np.int32) << 8)
+    c1 = blocks[:, 2].astype(np.int32) | (blocks[:, 3].astype(np.int32) << 8)
+    rgb0 = _expand_565(c0)
+    rgb1 = _expand_565(c1)
+    four_colors = (c0 > c1)[:, None]
+    if not allow_transparent:
+        four_colors = np.ones_like(four_colors)
+    palette = np.empty((len(blocks), 4, 4), dtype=np.int32)
+    palette[:, 0, :3] = rgb0
+    palette[:, 1, :3] = rgb1
+    palette[:, 2, :3] = np.where(four_colors, (2 * rgb0 + rgb1) // 3, (rgb0 + rgb1) // 2)
+    palette[:, 3, :3] = np.where(four_colors, (rgb0 + 2 * rgb1) // 3, 0)
+    palette[:, :, 3] = 255
+    palette[:, 3, 3] = np.where(four_colors[:, 0], 255, 0)
+
+    indices = blocks[:, 4:8].copy().view('<u4')[:, 0]
+    pixel_indices = (indices[:, None] >> (2 * np.arange(16, dtype=np.uint32))) & 3
+    return np.take_along_axis(palette, pixel_indices[:, :, None].astype(np.intp), axis=1)
+
+
+def decode_bc4_channel(blocks):
+    a0 = blocks[:, 0].astype(np.int32)
+    a1 = blocks[:, 1].astype(np.int32)
+    eight_values = (a0 > a1)[:, None]
+    weights = np.arange(1, 7, dtype=np.int32)
+    palette = np.empty((len(blocks), 8), dtype=np.int32)
+    palette[:, 0] = a0
+    palette[:, 1] = a1
+    interpolated_8 = ((7 - weights) * a0[:, None] + weights * a1[:, None]) // 7
+    interpolated_6 = ((5 - weights[:4]) * a0[:, None] + weights[:4] * a1[:, None]) // 5
+    palette[:, 2:8] = interpolated_8
+    six = ~eight_values[:, 0]
+    palette[six, 2:6] = interpolated_6[six]
+    palette[six, 6] = 0
+    palette[six, 7] = 255
+
+    index_bytes = np.zeros((len(blocks), 8), dtype=np.uint8)
+    index_bytes[:, :6] = blocks[:, 2:8]
+    indices = index_bytes.view('<u8')[:, 0]
+    pixel_indices = (indices[:, None] >> (3 * np.arange(16, dtype=np.uint64))) & 7
+    return np.take_along_axis(palette, pixel_indices.astype(np.intp), axis=1)
+
+
+def decode_bc1(blocks):
+    return decode_bc1_colors(blocks)
+
+
+def decode_bc2(blocks):
+    pixels = decode_bc1_colors(blocks[:, 8:16], allow_transparent=False)
+    alpha_bits = blocks[:, :8].copy().view('<u8')[:, 0]
+    alpha = (alpha_bits[:, None] >> (4 * np.arange(16, dtype=np.uint64))) & 15
+    pixels[:, :, 3] = alpha.astype(np.int32) * 17
+    return pixels
+
+
+def decode_bc3(blocks):
+    pixels = decode_bc1_colors(blocks[:, 8:16], allow_transparent=False)
+    pixels[:, :, 3] = decode_bc4_channel(blocks[:, :8])
+    return pixels
+
+
+def decode_bc4(blocks):
+    value = decode_bc4_channel(blocks)
+    pixels = np.empty((len(blocks), 16, 4), dtype=np.int32)
+    pixels[:, :, 0] = value
+    pixels[:, :, 1] = value
+    pixels[:, :, 2] = value
+    pixels[:, :, 3] = 255
+    return pixels
+
+
+def decode_bc5(blocks):
+    """
+    Two channel normal maps: red and green are stored, blue is rebuilt from them.
+    """
+    pixels = np.empty((len(blocks), 16, 4), dtype=np.int32)
+    red = decode_bc4_channel(blocks[:, :8])
+    green = decode_bc4_channel(blocks[:, 8:16])
+    x = red / 127.5 - 1.0
+    y = green / 127.5 - 1.0
+    z = np.sqrt(np.clip(1.0 - x * x - y * y, 0.0, 1.0))
+    pixels[:, :, 0] = red
+    pixels[:, :, 1] = green
+    pixels[:, :, 2] = np.clip(np.rint((z + 1.0) * 127.5), 0, 255).astype(np.int32)
+    pixels[:, :, 3] = 255
+    return pixels
+
+
+# BC7 partition tables: 2 subsets as 1 bit per pixel, 3 subsets as 2 bits per pixel
+BC7_PARTITIONS_2 = (
+    0xCCCC, 0x8888, 0xEEEE, 0xECC8, 0xC880, 0xFEEC, 0xFEC8, 0xEC80, 0xC800, 0xFFEC, 0xFE80, 0xE800, 0xFFE8, 0xFF00, 0xFFF0, 0xF000,
+    0xF710, 0x008E, 0x7100, 0x08CE, 0x008C, 0x7310, 0x3100, 0x8CCE, 0x088C, 0x3110, 0x6666, 0x366C, 0x17E8, 0x0FF0, 0x718E, 0x399C,
+    0xAAAA, 0xF0F0, 0x5A5A, 0x33CC, 0x3C3C, 0x55AA, 0x9696, 0xA55A, 0x73CE, 0x13C8, 0x324C, 0x3BDC, 0x6996, 0xC33C, 0x9966, 0x0660,
+    0x0272, 0x04E4, 0x4E40, 0x2720, 0xC936, 0x936C, 0x39C6, 0x639C, 0x9336, 0x9CC6, 0x817E, 0xE718, 0xCCF0, 0x0FCC, 0x7744, 0xEE22,
+)
+BC7_PARTITIONS_3 = (
+    0xAA685050, 0x6A5A5040, 0x5A5A4200, 0x5450A0A8, 0xA5A50000, 0xA0A05050, 0x5555A0A0, 0x5A5A5050,
+    0xAA550000, 0xAA555500, 0xAAAA5500, 0x90909090, 0x94949494, 0xA4A4A4A4, 0xA9A59450, 0x2A0A4250,
+    0xA5945040, 0x0A425054, 0xA5A5A500, 0x55A0A0A0, 0xA8A85454, 0x6A6A4040, 0xA4A45000, 0x1A1A0500,
+    0x0050A4A4, 0xAAA59090, 0x14696914, 0x69691400, 0xA08585A0, 0xAA821414, 0x50A4A450, 0x6A5A0200,
+    0xA9A58000, 0x5090A0A8, 0xA8A09050, 0x24242424, 0x00AA5500, 0x24924924, 0x24499224, 0x50A50A50,
+    0x500AA550, 0xAAAA4444, 0x66660000, 0xA5A0A5A0, 0x50A050A0, 0x69286928, 0x44AAAA44, 0x66666600,
+    0xAA444444, 0x54A854A8, 0x95809580, 0x96969600, 0xA85454A8, 0x80959580, 0xAA141414, 0x96960000,
+    0xAAAA1414, 0xA05050A0, 0xA0A5A5A0, 0x96000000, 0x40804080, 0xA9A8A9A8, 0xAAAAAA44, 0x2A4A5254,
+)
+BC7_ANCHORS_2 = (
+    15, 15, 15, 15, 15, 15, 15, 15, 15, 15, 15, 15, 15, 15, 15, 15,
+    15, 2, 8, 2, 2, 8, 8, 15, 2, 8, 2, 2, 8, 8, 2, 2,
+    15, 15, 6, 8, 2, 8, 15, 15, 2, 8, 2, 2, 2, 15, 15, 6,
+    6, 2, 6, 8, 15, 15, 2, 2, 15, 15, 15, 15, 15, 2, 2, 15,
+)
+BC7_ANCHORS_3_SECOND = (
+    3, 3, 15, 15, 8, 3, 15, 15, 8, 8, 6, 6, 6, 5, 3, 3,
+    3, 3, 8, 15, 3, 3, 6, 10, 5, 8, 8, 6, 8, 5, 15, 15,
+    8, 15, 3, 5, 6, 10, 8, 15, 15, 3, 15, 5, 15, 15, 15, 15,
+    3, 15, 5, 5, 5, 8, 5, 10, 5, 10, 8, 13, 15, 12, 3, 3,
+)
+BC7_ANCHORS_3_THIRD = (
+    15, 8, 8, 3, 15, 15, 3, 8, 15, 15, 15, 15, 15, 15, 15, 8,
+    15, 8, 15, 3, 15, 8, 15, 8, 3, 15, 6, 10, 15, 15, 10, 8,
+    15, 3, 15, 10, 10, 8, 9, 10, 6, 15, 8, 15, 3, 6, 6, 8,
+    15, 3, 15, 15, 15, 15, 15, 15, 15, 15, 15, 15, 3, 15, 15, 8,
+)
+BC7_WEIGHTS = {
+    2: np.array([0, 21, 43, 64], dtype=np.int32),
+    3: np.array([0, 9, 18, 27, 37, 46, 55, 64], dtype=np.int32),
+    4: np.array([0, 4, 9, 13, 17, 21, 26, 30, 34, 38, 43, 47, 51, 55, 60, 64], dtype=np.int32),
+}
+
+
+class _Bc7Mode:
+    def __init__(self, subsets, partition_bits, rotation_bits, index_selection_bits, color_bits, alpha_bits,
+                 endpoint_pbits, shared_pbits, index_bits, index_bits2):
+        self.subsets = subsets
+        self.partition_bits = partition_bits
+        self.rotation_bits = rotation_bits
+        self.index_selection_bits = index_selection_bits
+        self.color_bits = color_bits
+        self.alpha_bits = alpha_bits
+        self.endpoint_pbits = endpoint_pbits
+        self.shared_pbits = shared_pbits
+        self.index_bits = index_bits
+        self.index_bits2 = index_bits2
+
+
+BC7_MODES = (
+    _Bc7Mode(3, 4, 0, 0, 4, 0, 1, 0, 3, 0),
+    _Bc7Mode(2, 6, 0, 0, 6, 0, 0, 1, 3, 0),
+    _Bc7Mode(3, 6, 0, 0, 5, 0, 0, 0, 2, 0),
+    _Bc7Mode(2, 6, 0, 0, 7, 0, 1, 0, 2, 0),
+    _Bc7Mode(1, 0, 2, 1, 5, 6, 0, 0, 2, 3),
+    _Bc7Mode(1, 0, 2, 0, 7, 8, 0, 0, 2, 2),
+    _Bc7Mode(1, 0, 0, 0, 7, 7, 1, 0, 4, 0),
+    _Bc7Mode(2, 6, 0, 0, 5, 5, 1, 0, 2, 0),
+)
+
+
+def _build_bc7_subset_tables():
+    pixels = np.arange(16)
+    subsets_2 = np.array([(mask >> pixels) & 1 for mask in BC7_PARTITIONS_2], dtype=np.intp)
+    subsets_3 = np.array([(mask >> (2 * pixels)) & 3 for mask in BC7_PARTITIONS_3], dtype=np.intp)
+    anchors_1 = np.zeros((1, 16), dtype=bool)
+    anchors_1[0, 0] = True
+    anchors_2 = np.zeros((64, 16), dtype=bool)
+    anchors_2[:, 0] = True
+    anchors_2[np.arange(64), BC7_ANCHORS_2] = True
+    anchors_3 = np.zeros((64, 16), dtype=bool)
+    anchors_3[:, 0] = True
+    anchors_3[np.arange(64), BC7_ANCHORS_3_SECOND] = True
+    anchors_3[np.arange(64), BC7_ANCHORS_3_THIRD] = True
+    return {
+        1: (np.zeros((1, 16), dtype=np.intp), anchors_1),
+        2: (subsets_2, anchors_2),
+        3: (subsets_3, anchors_3),
+    }
+
+
+BC7_SUBSET_TABLES = _build_bc7_subset_tables()
+
+
+def _read_bits(bits, start, count):
+    if count == 0:
+        return np.zeros(len(bits), dtype=np.int32)
+    weights = 1 << np.arange(count, dtype=np.int32)
+    return (bits[:, start:start + count].astype(np.int32) * weights).sum(axis=1)
+
+
+def _read_indices(bits, start, index_bits, anchors):
+    """
+    Reads 16 per-pixel indices starting at bit start; anchor pixels are stored with one bit less.
+    """
+    widths = np.where(anchors, index_bits - 1, index_bits)
+    offsets = start + np.cumsum(widths, axis=1) - widths
+    values = np.zeros(widths.shape, dtype=np.int32)
+    for bit in range(index_bits):
+        positions = np.minimum(offsets + bit, 127)
+        bit_values = np.take_along_axis(bits, positions, axis=1).astype(np.int32)
+        values |= np.where(bit < widths, bit_values << bit, 0)
+    return values, start + int(widths[0].sum())
+
+
+def _unquantize(values, precision):
+    values = values << (8 - precision)
+    return values | (values >> precision)
+
+
+def _decode_bc7_mode(bits, mode_index):
+    mode = BC7_MODES[mode_index]
+    count = len(bits)
+    position = mode_index + 1
+    partition = _read_bits(bits, position, mode.partition_bits)
+    position += mode.partition_bits
+    rotation = _read_bits(bits, position, mode.rotation_bits)
+    position += mode.rotation_bits
+    index_selection = _read_bits(bits, position, mode.index_selection_bits)
+    position += mode.index_selection_bits
+
+    endpoint_count = mode.subsets * 2
+    endpoints = np.zeros((count, endpoint_count, 4), dtype=np.int32)
+    for channel in range(3):
+        for endpoint in range(endpoint_count):
+            endpoints[:, endpoint, channel] = _read_bits(bits, position, mode.color_bits)
+            position += mode.color_bits
+    if mode.alpha_bits:
+        for endpoint in range(endpoint_count):
+            endpoints[:, endpoint, 3] = _read_bits(bits, position, mode.alpha_bits)
+            position += mode.alpha_bits
+
+    color_precision = mode.color_bits
+    alpha_precision = mode.alpha_bits
+    if mode.endpoint_pbits or mode.shared_pbits:
+        if mode.endpoint_pbits:
+            pbits = np.stack([_read_bits(bits, position + i, 1) for i in range(endpoint_count)], axis=1)
+            position += endpoint_count
+        else:
+            shared = np.stack([_read_bits(bits, position + i, 1) for i in range(mode.subsets)], axis=1)
+            pbits = np.repeat(shared, 2, axis=1)
+            position += mode.subsets
+        endpoints = (endpoints << 1) | pbits[:, :, None]
+        color_precision += 1
+        alpha_precision += 1 if mode.alpha_bits else 0
+
+    endpoints[:, :, :3] = _unquantize(endpoints[:, :, :3], color_precision)
+    if mode.alpha_bits:
+        endpoints[:, :, 3] = _unquantize(endpoints[:, :, 3], alpha_precision)
+    else:
+        endpoints[:, :, 3] = 255
+
+    subset_table, anchor_table = BC7_SUBSET_TABLES[mode.subsets]
+    table_row = partition if mode.subsets > 1 else np.zeros(count, dtype=np.intp)
+    subsets = subset_table[table_row]
+    anchors = anchor_table[table_row]
+    indices, position = _read_indices(bits, position, mode.index_bits, anchors)
+
+    rows = np.arange(count)[:, None]
+    endpoint0 = endpoints[rows, subsets * 2]
+    endpoint1 = endpoints[rows, subsets * 2 + 1]
+    color_weights = BC7_WEIGHTS[mode.index_bits][indices]
+    alpha_weights = color_weights
+    if mode.index_bits2:
+        first_pixel_anchor = np.zeros((count, 16), dtype=bool)
+        first_pixel_anchor[:, 0] = True
+        indices2, _ = _read_indices(bits, position, mode.index_bits2, first_pixel_anchor)
+        weights2 = BC7_WEIGHTS[mode.index_bits2][indices2]
+        swap = (index_selection == 1)[:, None]
+        color_weights = np.where(swap, weights2, BC7_WEIGHTS[mode.index_bits][indices])
+        alpha_weights = np.where(swap, BC7_WEIGHTS[mode.index_bits][indices], weights2)
+
+    pixels = np.empty((count, 16, 4), dtype=np.int32)
+    pixels[:, :, :3] = ((64 - color_weights[:, :, None]) * endpoint0[:, :, :3] +
+                        color_weights[:, :, None] * endpoint1[:, :, :3] + 32) >> 6
+    pixels[:, :, 3] = ((64 - alpha_weights) * endpoint0[:, :, 3] + alpha_weights * endpoint1[:, :, 3] + 32) >> 6
+
+    if mode.rotation_bits:
+        for rotation_value, channel in ((1, 0), (2, 1), (3, 2)):
+            rotated = rotation == rotation_value
+            if rotated.any():
+                swapped = pixels[rotated][:, :, [channel, 3]]
+                pixels[rotated, :, channel] = swapped[:, :, 1]
+                pixels[rotated, :, 3] = swapped[:, :, 0]
+    return pixels
+
+
+def decode_bc7(blocks, batch_size=65536):
+    pixels = np.zeros((len(blocks), 16, 4), dtype=np.int32)
+    for batch_start in range(0, len(blocks), batch_size):
+        batch = blocks[batch_start:batch_start + batch_size]
+        bits = np.unpackbits(batch, axis=1, bitorder='little')
+        first_byte = batch[:, 0].astype(np.int32)
+        # the mode is the position of the lowest set bit of the first byte, 0 is a reserved mode
+        modes = np.where(first_byte == 0, 8, np.log2(first_byte & -first_byte).astype(np.int32))
+        for mode_index in range(8):
+            selected = np.nonzero(modes == mode_index)[0]
+            if len(selected):
+                pixels[batch_start + selected] = _decode_bc7_mode(bits[selected], mode_index)
+    return pixels
+
+
+BLOCK_DECODERS = {'BC1': decode_bc1, 'BC2': decode_bc2, 'BC3': decode_bc3, 'BC4': decode_bc4,
+                  'BC5': decode_bc5, 'BC7': decode_bc7}
+
+
+def _decode_masked(header, data, width, height):
+    bytes_per_pixel = header.bit_count // 8
+    raw = np.frombuffer(data, dtype=np.uint8, count=width * height * bytes_per_pixel)
+    raw = raw.reshape(height * width, bytes_per_pixel).astype(np.uint32)
+    pixels_value = np.zeros(len(raw), dtype=np.uint32)
+    for byte in range(bytes_per_pixel):
+        pixels_value |= raw[:, byte] << (8 * byte)
+    rgba = np.zeros((height * width, 4), dtype=np.int32)
+    rgba[:, 3] = 255
+    r_mask, g_mask, b_mask, a_mask = header.masks
+    if header.pixel_flags & DDPF_LUMINANCE:
+        g_mask = b_mask = r_mask
+    if header.pixel_flags & DDPF_ALPHA and not header.pixel_flags & DDPF_RGB:
+        r_mask = g_mask = b_mask = 0
+    for channel, mask in enumerate((r_mask, g_mask, b_mask, a_mask)):
+        if not mask:
+            continue
+        shift = (mask & -mask).bit_length() - 1
+        max_value = mask >> shift
+        rgba[:, channel] = (((pixels_value & mask) >> shift) * 255 + max_value // 2) // max_value
+    return rgba.reshape(height, width, 4)
+
+
+def decode_image(header, data):
+    """
+    Decodes the top mip of an image to a (height, width, 4) uint8 RGBA array.
+    """
+    width, height = header.width, header.height
+    if header.format in BLOCK_DECODERS:
+        blocks_x = max(1, (width + 3) // 4)
+        blocks_y = max(1, (height + 3) // 4)
+        block_size = BLOCK_SIZES[header.format]
+        blocks = np.frombuffer(data, dtype=np.uint8, count=blocks_x * blocks_y * block_size)
+        pixels = BLOCK_DECODERS[header.format](blocks.reshape(-1, block_size))
+        image = pixels.reshape(blocks_y, blocks_x, 4, 4, 4).transpose(0, 2, 1, 3, 4)
+        image = image.reshape(blocks_y * 4, blocks_x * 4, 4)[:height, :width]
+    elif header.format in DXGI_PIXEL_SIZES:
+        pixel_size = DXGI_PIXEL_SIZES[header.format]
+        raw = np.frombuffer(data, dtype=np.uint8, count=width * height * pixel_size).reshape(height, width, pixel_size)
+        image = np.empty((height, width, 4), dtype=np.int32)
+        if header.format == 'RGBA8':
+            image[:] = raw
+        elif header.format in ('BGRA8', 'BGRX8'):
+            image[:] = raw[:, :, [2, 1, 0, 3]]
+            if header.format == 'BGRX8':
+                image[:, :, 3] = 255
+        elif header.format == 'R8':
+            image[:, :, :3] = raw
+            image[:, :, 3] = 255
+        else:
+            image[:, :, :3] = 0
+            image[:, :, 3] = raw[:, :, 0]
+    else:
+        image = _decode_masked(header, data, width, height)
+    return np.ascontiguousarray(image, dtype=np.uint8)
+
+
+# ---------------------------------------------------------------------------------------------------------
+# Writers
+# ---------------------------------------------------------------------------------------------------------
+
+def write_tga(file_path, image):
+    """
+    Writes an RGBA image as an uncompressed 32 bit top-left origin TGA.
+    """
+    height, width = image.shape[:2]
+    header = struct.pack('<BBBHHBHHHHBB', 0, 0, 2, 0, 0, 0, 0, 0, width, height, 32, 0x28)
+    with open(file_path, 'wb') as file:
+        file.write(header)
+        file.write(np.ascontiguousarray(image[:, :, [2, 1, 0, 3]]).tobytes())
+
+
+def _png_chunk(chunk_type, data):
+    return (struct.pack('>I', len(data)) + chunk_type + data +
+            struct.pack('>I', zlib.crc32(chunk_type + data) & 0xFFFFFFFF))
+
+
+def write_png(file_path, image, compress_level=6):
+    height, width = image.shape[:2]
+    rows = np.zeros((height, width * 4 + 1), dtype=np.uint8)
+    rows[:, 1:] = image.reshape(height, width * 4)
+    with open(file_path, 'wb') as file:
+        file.write(b'\x89PNG\r\n\x1a\n')
+        file.write(_png_chunk(b'IHDR', struct.pack('>IIBBBBB', width, height, 8, 6, 0, 0, 0)))
+        file.write(_png_chunk(b'IDAT', zlib.compress(rows.tobytes(), compress_level)))
+        file.write(_png_chunk(b'IEND', b''))
+
+
+IMAGE_WRITERS = {'tga': write_tga, 'png': write_png}
+
+
+def convert_dds_chain(header_path, output_format='tga', dir_files=None):
+    """
+    Converts one split texture to <base>.<output_format>, plus <base>_glossmap.<output_format> when it
+    has an attached alpha image (the gloss of CryEngine normal maps). Returns the written paths.
+    """
+    if output_format not in IMAGE_WRITERS:
+        raise ValueError(f"Unsupported output format {output_format}, expected one of {OUTPUT_FORMATS}")
+    chain = find_dds_chain(header_path, dir_files)
+    (header, data), attached = read_dds_chain(chain)
+    base_path = chain.get_base_path()
+    written_paths = []
+
+    output_path = f"{base_path}.{output_format}"
+    IMAGE_WRITERS[output_format](output_path, decode_image(header, data))
+    written_paths.append(output_path)
+
+    if attached:
+        alpha_header, alpha_data = attached
+        alpha_image = decode_image(alpha_header, alpha_data)
+        # single channel images decode to grey RGB, any other format keeps the gloss in its alpha channel,
+        # which is copied to RGB
+        if alpha_header.format not in ('BC4', 'R8', 'MASKED'):
+            alpha_image[:, :, :3] = alpha_image[:, :, 3:4]
+        alpha_image[:, :, 3] = 255
+        gloss_path = f"{base_path}{GLOSS_SUFFIX}.{output_format}"
+        IMAGE_WRITERS[output_format](gloss_path, alpha_image)
+        written_paths.append(gloss_path)
+    return written_paths
@@ -0,0 +1,124 @@
+import hashlib
+import json
+import os
+from collections import defaultdict
+import ce_build_manifest
+import ce_fbx_utils
+
+SCRIPT_DIR = os.path.dirname(os.path.abspath(__file__))
+# Duplicate -> canonical mesh paths written by ce_mesh_convertor.dedup_converted_meshes
+MESH_ALIAS_MAP = os.path.join(SCRIPT_DIR, "build_manifests/mesh_alias_map.json")
+# Duplicate -> canonical texture paths written by ce_texture_convertor.dedup_dds_files
+TEXTURE_ALIAS_MAP = os.path.join(SCRIPT_DIR, "build_manifests/texture_alias_map.json")
+
+
+def normalize_asset_key(path):
+    """
+    Case, separator and extension insensitive key of a dump relative path:
+    'Objects\\Props\\Barrel.cgf' -> 'objects/props/barrel'.
+    """
+    path = path.replace('\\', '/').strip('/')
+    return os.path.splitext(path)[0].lower()
+
+
+class AliasTable:
+    """
+    Maps the dump relative path of a duplicate asset to the extension-less path of the
+    canonical copy that is actually converted and imported.
+    """
+    def __init__(self, table_path=None):
+        self.table_path = table_path
+        self.aliases = {}
+        if table_path and os.path.exists(table_path):
+            with open(table_path, 'r', encoding='utf-8') as file:
+                self.aliases = json.load(file).get('aliases', {})
+
+    def __len__(self):
+        return len(self.aliases)
+
+    def add(self, duplicate_path, canonical_path):
+        canonical = os.path.splitext(canonical_path.replace('\\', '/').strip('/'))[0]
+        self.aliases[normalize_asset_key(duplicate_path)] = canonical
+
+    def resolve(self, path):
+        """
+        Returns the canonical extension-less path of a duplicate, None if path is not a duplicate.
+        """
+        return self.aliases.get(normalize_asset_key(path))
+
+    def save(self, table_path=None):
+        table_path = table_path or self.table_path
+        os.makedirs(os.path.dirname(os.path.abspath(table_path)), exist_ok=True)
+        with open(table_path, 'w', encoding='utf-8') as file:
+            json.dump({'aliases': self.aliases}, file, indent=1, sort_keys=True)
+
+
+def group_duplicates(dedup_keys):
+    """
+    Groups paths sharing a dedup key. The alphabetically first path of a group is its canonical copy.
+    Returns the (duplicate, canonical) pairs and the number of unique keys.
+    """
+    groups = defaultdict(list)
+    for path, dedup_key in dedup_keys.items():
+        if dedup_key:
+            groups[dedup_key].append(path)
+    aliases = []
+    for paths in groups.values():
+        paths.sort(key=str.lower)
+        for duplicate in paths[1:]:
+            aliases.append((duplicate, paths[0]))
+    return aliases, len(groups)
+
+
+def compute_mesh_dedup_key(fbx_path):
+    """
+    Hashes the geometry of a converted mesh (see ce_fbx_utils.hash_fbx_geometry) together with the
+    .mtl files its slots resolve next to it, since two copies can only share an asset if their materials
+    match too. ASCII FBX files fall back to a byte hash.
+    Returns (dedup key, mtl paths that went into it), or (None, []) if the file can't be read.
+    """
+    import ce_material_convertor
+    try:
+        root = ce_fbx_utils.read_fbx(fbx_path)
+        geometry_hash = ce_fbx_utils.hash_fbx_geometry(root)
+        material_names = ce_fbx_utils.get_material_names(root)
+    except ce_fbx_utils.FbxFormatError:
+        geometry_hash = ce_build_manifest.hash_file(fbx_path)
+        material_names = []
+    except OSError as e:
+        print(f"Error reading {fbx_path}: {e}")
+        return None, []
+
+    sha1 = hashlib.sha1(geometry_hash.encode('ascii'))
+    mtl_paths = []
+    folder = os.path.dirname(fbx_path)
+    mtl_file_names = set()
+    for material_name in material_names:
+        parts = ce_material_convertor.split_material_slot_name(material_name)
+        if parts:
+            mtl_file_names.add(parts[0])
+    for mtl_file_name in sorted(mtl_file_names):
+        mtl_path = os.path.join(folder, mtl_file_name + ".mtl")
+        sha1.update(mtl_file_name.encode('utf-8'))
+        if os.path.exists(mtl_path):
+            sha1.update(ce_build_manifest.hash_file(mtl_path).encode('ascii'))
+            mtl_paths.append(mtl_path)
+    return sha1.hexdigest(), mtl_paths
+
+
+def compute_texture_dedup_key(chain_paths):
+    """
+    Hashes the source files of a split .dds chain (header, mips and attached alpha mips). The suffix of
+    each file ('.dds.0', '.dds.1a', ...) goes into the key so chains only match file for file.
+    Returns the dedup key, or None if a file can't be read.
+    """
+    sha1 = hashlib.sha1()
+    try:
+        for path in sorted(chain_paths, key=lambda p: os.path.basename(p).lower()):
+            file_name = os.path.basename(path).lower()
+            sha1.update(file_name[file_name.find('.dds'):].encode('utf-8'))
+            sha1.update(ce_build_manifest.hash_file(path).encode('ascii'))
+    except OSError as e:
+        print(f"Error reading {chain_paths[0]}: {e}")
+        return None
+    return sha1.hexdigest()
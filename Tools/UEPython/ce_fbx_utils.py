@@ -0,0 +1,240 @@
+import array
+import hashlib
+import struct
+import sys
+import zlib
+
+FBX_BINARY_MAGIC = b"Kaydara FBX Binary  \x00"
+FBX_HEADER_SIZE = 27
+
+ARRAY_TYPECODES = {'f': 'f', 'd': 'd', 'l': 'q', 'i': 'i', 'b': 'b'}
+SCALAR_FORMATS = {'Y': '<h', 'C': '<?', 'I': '<i', 'F': '<f', 'D': '<d', 'L': '<q'}
+
+# Geometry children that define what the imported static mesh looks like
+GEOMETRY_ARRAY_NODES = ("Vertices", "PolygonVertexIndex")
+GEOMETRY_LAYER_ARRAY_NODES = ("Normals", "UV", "UVIndex", "Materials", "Colors", "ColorIndex")
+TRANSFORM_PROPERTY_NAMES = ("Lcl Translation", "Lcl Rotation", "Lcl Scaling",
+                            "PreRotation", "PostRotation", "GeometricTranslation",
+                            "GeometricRotation", "GeometricScaling")
+
+
+class FbxFormatError(Exception):
+    pass
+
+
+class FbxNode:
+    __slots__ = ('name', 'properties', 'children')
+
+    def __init__(self, name, properties, children):
+        self.name = name
+        self.properties = properties
+        self.children = children
+
+    def find(self, name):
+        for child in self.children:
+            if child.name == name:
+                return child
+        return None
+
+    def find_all(self, name):
+        return [child for child in self.children if child.name == name]
+
+    def __repr__(self):
+        return f"FbxNode(name={self.name}, properties={len(self.properties)}, children={len(self.children)})"
+
+
+def _read_property(data, offset):
+    type_code = chr(data[offset])
+    offset += 1
+    if type_code in SCALAR_FORMATS:
+        fmt = SCALAR_FORMATS[type_code]
+        return struct.unpack_from(fmt, data, offset)[0], offset + struct.calcsize(fmt)
+    if type_code in ARRAY_TYPECODES:
+        array_length, encoding, compressed_length = struct.unpack_from('<III', data, offset)
+        offset += 12
+        raw = data[offset:offset + compressed_length]
+        if encoding == 1:
+            raw = zlib.decompress(raw)
+        values = array.array(ARRAY_TYPECODES[type_code])
+        values.frombytes(raw)
+        if sys.byteorder == 'big':
+            values.byteswap()
+        if len(values) != array_length:
+            raise FbxFormatError(f"Array length mismatch ({len(values)} != {array_length})")
+        return values, offset + compressed_length
+    if type_code in ('S', 'R'):
+        length = struct.unpack_from('<I', data, offset)[0]
+        offset += 4
+        raw = bytes(data[offset:offset + length])
+        value = raw.decode('utf-8', 'replace') if type_code == 'S' else raw
+        return value, offset + length
+    raise FbxFormatError(f"Unknown property type {type_code!r} at offset {offset - 1}")
+
+
+def _read_node(data, offset, version):
+    if version >= 7500:
+        end_offset, num_properties, _ = struct.unpack_from('<QQQ', data, offset)
+        offset += 24
+    else:
+        end_offset, num_properties, _ = struct.unpack_from('<III', data, offset)
+        offset += 12
+    name_length = data[offset]
+    offset += 1
+    if end_offset == 0:
+        # null record closing a node list
+        return None, offset
+    name = bytes(data[offset:offset + name_length]).decode('ascii', 'replace')
+    offset += name_length
+    properties = []
+    for _ in range(num_properties):
+        value, offset = _read_property(data, offset)
+        properties.append(value)
+    children = []
+    while offset < end_offset:
+        child, offset = _read_node(data, offset, version)
+        if child is None:
+            break
+        children.append(child)
+    return FbxNode(name, properties, children), end_offset
+
+
+def read_fbx(file_path):
+    """
+    Parses a binary FBX file and returns a root FbxNode holding the top level nodes.
+    Raises FbxFormatError for ASCII or broken files.
+    """
+    with open(file_path, 'rb') as file:
+        data = memoryview(file.read())
+    if bytes(data[:len(FBX_BINARY_MAGIC)]) != FBX_BINARY_MAGIC:
+        raise FbxFormatError(f"Not a binary FBX file: {file_path}")
+    version = struct.unpack_from('<I', data, 23)[0]
+    offset = FBX_HEADER_SIZE
+    children = []
+    try:
+        while offset < len(data):
+            node, offset = _read_node(data, offset, version)
+            if node is None:
+                break
+            children.append(node)
+    except (struct.error, zlib.error, IndexError) as e:
+        raise FbxFormatError(f"Error parsing {file_path}: {e}")
+    return FbxNode("", [version], children)
+
+
+def split_object_name(name):
+    """
+    FBX object names are stored as 'Name\\x00\\x01Class'.
+    """
+    return name.split('\x00\x01')[0]
+
+
+def get_objects(root, node_name):
+    objects_node = root.find("Objects")
+    return objects_node.find_all(node_name) if objects_node is not None else []
+
+
+def get_properties70(node):
+    """
+    Returns the Properties70 block of a node as name -> list of values.
+    """
+    values = {}
+    props_node = node.find("Properties70")
+    if props_node is not None:
+        for p_node in props_node.find_all("P"):
+            if p_node.properties:
+                values[p_node.properties[0]] = p_node.properties[4:]
+    return values
+
+
+def get_unit_scale(root):
+    """
+    Size of one file unit in centimeters.
+    """
+    settings_node = root.find("GlobalSettings")
+    if settings_node is not None:
+        unit_scale = get_properties70(settings_node).get("UnitScaleFactor")
+        if unit_scale:
+            return float(unit_scale[0])
+    return 1.0
+
+
+def get_material_names(root):
+    return [split_object_name(node.properties[1]) for node in get_objects(root, "Material")
+            if len(node.properties) > 1]
+
+
+class FbxMeshStats:
+    def __init__(self):
+        self.triangle_count = 0
+        self.vertex_count = 0
+        self.bounds_min = None
+        self.bounds_max = None
+        self.material_names = []
+
+    def get_bounds_size(self):
+        if self.bounds_min is None:
+            return (0.0, 0.0, 0.0)
+        return tuple(self.bounds_max[i] - self.bounds_min[i] for i in range(3))
+
+    def __repr__(self):
+        return (f"FbxMeshStats(triangles={self.triangle_count}, vertices={self.vertex_count}, "
+                f"bounds={self.get_bounds_size()})")
+
+
+def get_mesh_stats(root):
+    """
+    Triangle/vertex counts and the geometry bounds in centimeters. Bounds ignore node transforms,
+    which is good enough to tell props from buildings.
+    """
+    stats = FbxMeshStats()
+    unit_scale = get_unit_scale(root)
+    for geometry in get_objects(root, "Geometry"):
+        vertices_node = geometry.find("Vertices")
+        indices_node = geometry.find("PolygonVertexIndex")
+        if vertices_node is None or indices_node is None:
+            continue
+        vertices = vertices_node.properties[0]
+        indices = indices_node.properties[0]
+        # the last index of every polygon is stored as -(index + 1)
+        polygon_count = sum(1 for index in indices if index < 0)
+        stats.triangle_count += len(indices) - 2 * polygon_count
+        stats.vertex_count += len(vertices) // 3
+        if not vertices:
+            continue
+        if stats.bounds_min is None:
+            stats.bounds_min = [float('inf')] * 3
+            stats.bounds_max = [float('-inf')] * 3
+        for axis in range(3):
+            axis_values = vertices[axis::3]
+            stats.bounds_min[axis] = min(stats.bounds_min[axis], min(axis_values) * unit_scale)
+            stats.bounds_max[axis] = max(stats.bounds_max[axis], max(axis_values) * unit_scale)
+    stats.material_names = get_material_names(root)
+    return stats
+
+
+def hash_fbx_geometry(root):
+    """
+    Hashes what the imported mesh is made of (geometry arrays, node transforms, material names)
+    while ignoring file ids, object ids and creation times, so re-exports of the same mesh match.
+    """
+    sha1 = hashlib.sha1()
+    sha1.update(struct.pack('<d', get_unit_scale(root)))
+    for geometry in get_objects(root, "Geometry"):
+        for child in geometry.children:
+            if child.name in GEOMETRY_ARRAY_NODES and child.properties:
+                sha1.update(child.name.encode('ascii'))
+                sha1.update(child.properties[0].tobytes())
+            elif child.name.startswith("LayerElement"):
+                for layer_child in child.children:
+                    if layer_child.name in GEOMETRY_LAYER_ARRAY_NODES and layer_child.properties:
+                        sha1.update(layer_child.name.encode('ascii'))
+                        sha1.update(layer_child.properties[0].tobytes())
+    for model in get_objects(root, "Model"):
+        transform = get_properties70(model)
+        for prop_name in TRANSFORM_PROPERTY_NAMES:
+            if prop_name in transform:
+                sha1.update(prop_name.encode('ascii'))
+                sha1.update(repr(transform[prop_name]).encode('ascii'))
+    for material_name in get_material_names(root):
+        sha1.update(material_name.encode('utf-8'))
+    return sha1.hexdigest()
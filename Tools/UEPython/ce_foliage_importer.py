@@ -1,6 +1,7 @@
 import xml.etree.ElementTree as ET
 from typing import List, Dict
 import os
+import ce_dedup
 
 class VegetationInstance:
     def __init__(self):
@@ -119,7 +120,7 @@ def print_vegetation_summary(vegetation_map: Dict[str, List[Vegetation]]):
         f.write("\n".join(obj_list))
         
 
-def create_instance_static_mesh_actor(name, veg_list: List[Vegetation]):
+def create_instance_static_mesh_actor(name, veg_list: List[Vegetation], alias_table=None):
     import unreal
     # Create a new empty Actor in the level
     actor_location = unreal.Vector(0, 0, 0)
@@ -141,7 +142,8 @@ def create_instance_static_mesh_actor(name, veg_list: List[Vegetation]):
         so_subsystem.rename_subobject(new_handle, component_name)  # Use the last part of the path as name
         ism_component = actor.get_components_by_class(unreal.InstancedStaticMeshComponent)[-1]  # Get the last added component
 
-        package_name = f"/Game/Old/{veg.object_path.replace('.cgf', '')}"
+        mesh_path = alias_table.resolve(veg.object_path) if alias_table else None
+        package_name = f"/Game/Old/{mesh_path or veg.object_path.replace('.cgf', '')}"
         if not unreal.EditorAssetLibrary.does_asset_exist(package_name):
             print(f"Asset does not exist: {package_name}")
             continue
@@ -167,9 +169,11 @@ def import_veg_into_unreal(veg_map: Dict[str, List[Vegetation]]):
     Args:
         veg_map: Dictionary mapping category names to lists of Vegetation objects
     """
+    # duplicate meshes are only imported once, see ce_mesh_convertor.dedup_converted_meshes
+    alias_table = ce_dedup.AliasTable(ce_dedup.MESH_ALIAS_MAP)
     for category, veg_list in veg_map.items():
         print(f"Importing category: {category}")
-        create_instance_static_mesh_actor(category, veg_list)
+        create_instance_static_mesh_actor(category, veg_list, alias_table)
 
 # Example usage
 if __name__ == "__main__":
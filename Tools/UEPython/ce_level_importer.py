@@ -1,5 +1,7 @@
 import os
+import time
 import xml.etree.ElementTree as ET
+import ce_dedup
 
 CRY_ENGINE_OUTPUT_FOLDER_ROOT = "D:/temp/rataja"
 LEVEL_ROOT_FOLDER = "data/levels"  # Removed leading slash for consistency
@@ -9,10 +11,14 @@ PREFAB_ROOT_FOLDER = 'prefabs'
 
 LEVEL_NAME = "rataje"
 
+# Root layers imported by the __main__ block, parse_level imports every root layer by default
 LAYER_WHITELIST = [
     "Rataje",
 ]
 
+# Prefab library name -> parsed prefabs, shared by every level parsed in this session
+prefab_library_cache = {}
+
 class StaticMesh:
     def __init__(self):
         self.name = None
@@ -59,7 +65,7 @@ class Layer:
         self.static_meshes = []
         self.child_layers = []
         
-    def init_from_xml(self, xml_node):
+    def init_from_xml(self, xml_node, level_name=LEVEL_NAME):
         # self.name = xml_node.get("Name") if "Name" in xml_node.attrib else None
         self.prefab_actors = []
         self.static_meshes = []
@@ -90,12 +96,12 @@ class Layer:
                 fullname = layer_node.get("FullName")
                 name = layer_node.get("Name")
                 
-                layer_xml_path = os.path.join(CRY_ENGINE_OUTPUT_FOLDER_ROOT, LEVEL_ROOT_FOLDER, LEVEL_NAME, LEVEL_LAYERS_FOLDER, f"{fullname}.lyr")
+                layer_xml_path = os.path.join(CRY_ENGINE_OUTPUT_FOLDER_ROOT, LEVEL_ROOT_FOLDER, level_name, LEVEL_LAYERS_FOLDER, f"{fullname}.lyr")
                 if os.path.exists(layer_xml_path):
                     tree = ET.parse(layer_xml_path)
                     root = tree.getroot()
                     layer = Layer(name)
-                    layer.init_from_xml(root)
+                    layer.init_from_xml(root, level_name)
                     self.child_layers.append(layer)
                 else:
                     print(f"Layer file not found: {layer_xml_path}")
@@ -185,6 +191,25 @@ class Level:
         return all_mesh_paths
 
 
+def parse_prefab_library_file(library_name):
+    """
+    Prefabs of a shared library under PREFAB_ROOT_FOLDER, parsed once and cached in prefab_library_cache.
+    """
+    library_key = library_name.lower()
+    if library_key not in prefab_library_cache:
+        prefabs = []
+        library_path = os.path.join(CRY_ENGINE_OUTPUT_FOLDER_ROOT, PREFAB_ROOT_FOLDER, f"{library_key}.xml")
+        if os.path.exists(library_path):
+            tree = ET.parse(library_path)
+            root = tree.getroot()
+            for prefab_node in root.findall("Prefab"):
+                prefab = Prefab()
+                prefab.init_from_xml(prefab_node)
+                prefabs.append(prefab)
+        prefab_library_cache[library_key] = prefabs
+    return prefab_library_cache[library_key]
+
+
 def parse_prefabs_library(prefabs_library_node):
     prefabs = []
     libraries = []
@@ -204,14 +229,7 @@ def parse_prefabs_library(prefabs_library_node):
             libraries.append(library_name)
 
     for library_name in libraries:
-        library_path = os.path.join(CRY_ENGINE_OUTPUT_FOLDER_ROOT, PREFAB_ROOT_FOLDER, f"{library_name.lower()}.xml")
-        if os.path.exists(library_path):
-            tree = ET.parse(library_path)
-            root = tree.getroot()
-            for prefab_node in root.findall("Prefab"):
-                prefab = Prefab()
-                prefab.init_from_xml(prefab_node)
-                prefabs.append(prefab)
+        prefabs.extend(parse_prefab_library_file(library_name))
         
     prefab_dict = {}        
     for prefab in prefabs:
@@ -220,11 +238,14 @@ def parse_prefabs_library(prefabs_library_node):
     return prefab_dict
 
 
-def parse_level():
+def parse_level(level_name=LEVEL_NAME, layer_whitelist=None):
+    """
+    Parses a level and its root layers, only the ones named in layer_whitelist when given.
+    """
     level = Level()
-    level.name = LEVEL_NAME
+    level.name = level_name
     # Extract and parse the PrefabsLibrary contents
-    file_path = os.path.join(CRY_ENGINE_OUTPUT_FOLDER_ROOT, LEVEL_ROOT_FOLDER, LEVEL_NAME, LEVEL_EDITOR_XML)
+    file_path = os.path.join(CRY_ENGINE_OUTPUT_FOLDER_ROOT, LEVEL_ROOT_FOLDER, level_name, LEVEL_EDITOR_XML)
     if os.path.exists(file_path):
         tree = ET.parse(file_path)
         root = tree.getroot()
@@ -251,16 +272,16 @@ def parse_level():
                 fullname = layer_node.get("FullName")
                 name = layer_node.get("Name")
                 
-                if name not in LAYER_WHITELIST:
+                if layer_whitelist is not None and name not in layer_whitelist:
                     print(f"Layer {name} not in whitelist, skipping.")
                     continue
                 
-                layer_xml_path = os.path.join(CRY_ENGINE_OUTPUT_FOLDER_ROOT, LEVEL_ROOT_FOLDER, LEVEL_NAME, LEVEL_LAYERS_FOLDER, f"{fullname}.lyr")
+                layer_xml_path = os.path.join(CRY_ENGINE_OUTPUT_FOLDER_ROOT, LEVEL_ROOT_FOLDER, level_name, LEVEL_LAYERS_FOLDER, f"{fullname}.lyr")
                 if os.path.exists(layer_xml_path):
                     tree = ET.parse(layer_xml_path)
                     root = tree.getroot()
                     layer = Layer(name)
-                    layer.init_from_xml(root)
+                    layer.init_from_xml(root, level_name)
                     layers.append(layer)
                 else:
                     print(f"Layer file not found: {layer_xml_path}")
@@ -280,8 +301,59 @@ PLACE_HOLDER_SM= "/Engine/BasicShapes/Cube"
 place_holder_sm_obj = unreal.EditorAssetLibrary.load_asset(PLACE_HOLDER_SM)
 
 PREFAB_PACKAGE_PATH = "/Game/Old/prefabs"
+LEVEL_PACKAGE_PATH = "/Game/Old/levels"
 INPUT_PACKAGE_ROOT = "/Game/Old"
 
+# duplicate meshes are only imported once, see ce_mesh_convertor.dedup_converted_meshes
+mesh_alias_table = ce_dedup.AliasTable(ce_dedup.MESH_ALIAS_MAP)
+
+
+class AssetCache:
+    """
+    Mesh package resolution shared by every prefab and level spawned in an editor session: CE mesh path ->
+    package path after aliasing, None if that mesh is not imported. Only names are cached, assets are
+    loaded when spawned so nothing stays referenced once a level is saved and closed.
+    """
+    def __init__(self):
+        self.mesh_package_paths = {}
+
+    def __repr__(self):
+        missing = sum(1 for package_path in self.mesh_package_paths.values() if package_path is None)
+        return f"AssetCache(meshes={len(self.mesh_package_paths)}, missing={missing})"
+
+    def get_mesh_package_path(self, mesh_path):
+        if mesh_path not in self.mesh_package_paths:
+            resolved_path = mesh_alias_table.resolve(mesh_path) or mesh_path.replace('.cgf', '')
+            mesh_package_path = INPUT_PACKAGE_ROOT + '/' + resolved_path
+            if not editor_asset_sub.does_asset_exist(mesh_package_path):
+                mesh_package_path = None
+            self.mesh_package_paths[mesh_path] = mesh_package_path
+        return self.mesh_package_paths[mesh_path]
+
+    def clear(self):
+        self.mesh_package_paths.clear()
+
+
+asset_cache = AssetCache()
+# Prefab levels generated in this session, a prefab library shared by several levels is generated once
+generated_prefab_paths = set()
+
+
+def reset_import_caches():
+    """
+    Forgets parsed prefab libraries, resolved mesh packages and generated prefabs and reloads the mesh
+    alias table, e.g. after reimporting meshes.
+    """
+    global mesh_alias_table
+    mesh_alias_table = ce_dedup.AliasTable(ce_dedup.MESH_ALIAS_MAP)
+    prefab_library_cache.clear()
+    asset_cache.clear()
+    generated_prefab_paths.clear()
+
+
+def get_prefab_package_path(prefab_name):
+    return PREFAB_PACKAGE_PATH + "/" + prefab_name.replace('.', '/')
+
 import math
 
 def quaternion_to_euler(quaternion):
@@ -395,8 +467,8 @@ def spawn_static_mesh(static_mesh):
     mesh_actor = spawn_actor_common(static_mesh, unreal.StaticMeshActor)
     mesh_actor.set_actor_label(static_mesh.name)
     mesh_component = mesh_actor.get_component_by_class(unreal.StaticMeshComponent)
-    mesh_package_path = INPUT_PACKAGE_ROOT + '/' + static_mesh.mesh_path.replace('.cgf', '')
-    if editor_asset_sub.does_asset_exist(mesh_package_path):
+    mesh_package_path = asset_cache.get_mesh_package_path(static_mesh.mesh_path)
+    if mesh_package_path:
         static_mesh_obj = editor_asset_sub.load_asset(mesh_package_path)
         mesh_component.set_static_mesh(static_mesh_obj)
     else:
@@ -405,11 +477,8 @@ def spawn_static_mesh(static_mesh):
     return mesh_actor
     
 def spawn_prefab_actor(prefab_actor):
-    prefab_path = prefab_actor.prefab_name.replace('.', '/')
-    prefab_path = PREFAB_PACKAGE_PATH + "/" + prefab_path
-    
     level_instance_actor = spawn_actor_common(prefab_actor, unreal.LevelInstance)
-    world_asset = unreal.EditorAssetLibrary.load_asset(prefab_path)
+    world_asset = unreal.EditorAssetLibrary.load_asset(get_prefab_package_path(prefab_actor.prefab_name))
     level_instance_actor.set_editor_property("world_asset", world_asset)
     level_instance_actor.set_actor_label(prefab_actor.name)
     
@@ -420,21 +489,60 @@ def generated_all_prefabs(level_data: Level):
         create_level_prefab(prefab)
 
 def create_level_prefab(prefab: Prefab):
+    new_level_path = get_prefab_package_path(prefab.get_prefab_name())
+    if new_level_path in generated_prefab_paths:
+        return
     print(prefab.get_prefab_name())
-    new_level_path = prefab.get_prefab_name().replace('.', '/')
-    new_level_path = PREFAB_PACKAGE_PATH + "/" + new_level_path
     print(new_level_path)
     level_editor_sub.new_level(new_level_path, False)
     for static_mesh in prefab.static_meshes:
         spawn_static_mesh(static_mesh)
     level_editor_sub.save_current_level()
+    generated_prefab_paths.add(new_level_path)
+
+def open_level_map(level_name):
+    """
+    Opens the map a level is recreated in, creating it as a partitioned world (data layers need one) the first time.
+    """
+    level_path = LEVEL_PACKAGE_PATH + "/" + level_name
+    if editor_asset_sub.does_asset_exist(level_path):
+        level_editor_sub.load_level(level_path)
+    else:
+        level_editor_sub.new_level(level_path, True)
+
+def import_levels(level_names, generate_prefabs=True, recreate=True, layer_whitelists=None):
+    """
+    Imports several levels in one editor session, each into its own map under LEVEL_PACKAGE_PATH.
+    layer_whitelists maps a level name to the root layers to import, levels not in it import all of them.
+    Parsed prefab libraries, generated prefab levels and resolved mesh packages are shared across the levels,
+    so a level only costs its own layers and the prefabs no previous level generated.
+    Returns the names of the levels that had no layer to import.
+    """
+    layer_whitelists = layer_whitelists or {}
+    empty_levels = []
+    for level_name in level_names:
+        start_time = time.perf_counter()
+        level_data = parse_level(level_name, layer_whitelists.get(level_name))
+        if generate_prefabs:
+            generated_all_prefabs(level_data)
+        if recreate and not level_data.layers:
+            print(f"Level {level_name}: no layer to import, map not created")
+            empty_levels.append(level_name)
+            continue
+        if recreate:
+            open_level_map(level_name)
+            recreate_level_in_unreal(level_data)
+            level_editor_sub.save_current_level()
+        print(f"Level {level_name}: {len(level_data.layers)} layers, {len(level_data.prefabs)} prefabs "
+              f"({time.perf_counter() - start_time:.1f}s), {asset_cache}")
+    if empty_levels:
+        print(f"Levels without layers: {empty_levels}")
+    return empty_levels
 
 if __name__ == "__main__":
-    level_data = parse_level()
-    # generated_all_prefabs(level_data)
-    recreate_level_in_unreal(level_data)
+    import_levels([LEVEL_NAME], layer_whitelists={LEVEL_NAME: LAYER_WHITELIST})
     
-    # all_mesh_paths = level_data.get_all_mesh_paths()
+    # all_mesh_paths = parse_level().get_all_mesh_paths()
     # print(all_mesh_paths)
     # for mesh_path in all_mesh_paths:
     #     print(mesh_path)
\ No newline at end of file
@@ -1,130 +1,131 @@
+import functools
+import hashlib
+import json
 import os
 import xml.etree.ElementTree as ET
 from collections import defaultdict
+import ce_catalog
+import ce_dedup
 import ce_path_utils
 from typing import List
 
+SCRIPT_DIR = os.path.dirname(os.path.abspath(__file__))
+
+
+def parse_float(value):
+    return float(value)
+
+
+def parse_int(value):
+    return int(float(value))
+
+
+def parse_vec3(value):
+    """
+    'r,g,b' -> (r, g, b); anything else -> (0, 0, 0), as str_to_vec3.
+    """
+    return tuple(str_to_vec3(value))
+
+
+# CE texture attribute -> parser
+TEXTURE_FIELDS = {
+    'Filter': parse_int,
+    'IsTileU': parse_int,
+    'Map': str,
+    'IsTileV': parse_int,
+    'File': str,
+}
+
+# CE material and PublicParams attribute -> parser. Values are converted once when the .mtl is parsed,
+# attributes not listed here are kept as strings in Material.extra.
+MATERIAL_FIELDS = {
+    # Material attributes
+    'Emittance': str, 'VoxelCoverage': parse_float, 'FurAmount': parse_float, 'Emissive': str,
+    'CloakAmount': parse_float, 'Opacity': parse_float, 'StringGenMask': str, 'GlowAmount': parse_float,
+    'vertModifType': parse_int, 'MtlFlags': parse_int, 'Shininess': parse_float, 'Diffuse': parse_vec3,
+    'HeatAmountScaled': parse_float, 'Shader': str, 'CustomSortPriority': parse_int, 'MatTemplate': str,
+    'SurfaceType': str, 'Specular': parse_vec3, 'AlphaTest': parse_float, 'GenMask': str, 'LayerAct': parse_int,
+    # PublicParams attributes
+    'WeaponBloodColor': parse_vec3, 'WeaponQualityZone2': parse_float, 'MaskSaturation3': parse_float,
+    'FresnelPower': parse_float, 'FresnelScale': parse_float, 'DirOverlayX': parse_float,
+    'DecalFalloff': parse_float, 'DetailDiffuseScale': parse_float, 'RandomValueOffset': parse_float,
+    'BlendLayer2Specular': parse_float, 'ColorizingHue': parse_float, 'SelfShadowStrength': parse_float,
+    'WeaponBloodSpecular': parse_float, 'ObmDisplacement': parse_float, 'AmbientMultiplier': parse_float,
+    'MaskBrightness2': parse_float, 'RandomValueScale': parse_float, 'WeaponQualityZone0': parse_float,
+    'TessellationFactorMin': parse_float, 'WeaponQualityZone5': parse_float, 'FresnelBias': parse_float,
+    'BlendMaskTiling': parse_float, 'WeaponBloodBlendFactor': parse_float, 'ColorizingSaturation': parse_float,
+    'WeaponBloodBlendFalloff': parse_float, 'OverlayDetailR': parse_float, 'OverlayDetailG': parse_float,
+    'BackFaceBrightnessMult': parse_float, 'HeightBias': parse_float, 'DirOverlayThresholdMin': parse_float,
+    'WeaponBloodGloss': parse_float, 'BlendFactor': parse_float, 'MaskBrightness3': parse_float,
+    'DecalAlphaMult': parse_float, 'OverlayTiling': parse_float, 'GlossFromDiffuseOffset': parse_float,
+    'DirOverlayTilingU': parse_float, 'SubsurfaceScatteringAmount': parse_float, 'EmittanceMapGamma': parse_float,
+    'SndUVsTileV': parse_float, 'IndirectColor': parse_vec3, 'SSSIndex': parse_float,
+    'WeaponQualityZone6': parse_float, 'WeaponBloodTexScale': parse_float, 'WeaponQualityZone4': parse_float,
+    'MaskSaturation1': parse_float, 'GlossFromDiffuseContrast': parse_float, 'MaskHue2': parse_float,
+    'DirOverlayThresholdMax': parse_float, 'ColorizingBrightness': parse_float,
+    'GlossFromDiffuseBrightness': parse_float, 'MaskBrightness1': parse_float, 'MaskHue1': parse_float,
+    'GlossFromDiffuseAmount': parse_float, 'BlendLayer2Tiling': parse_float, 'DirOverlayTilingV': parse_float,
+    'WeaponQualityZone7': parse_float, 'SndUVsTileU': parse_float, 'WeaponRustBlendFalloff': parse_float,
+    'TessellationFaceCull': parse_float, 'BlendFalloff': parse_float, 'DirOverlayZ': parse_float,
+    'MaskSaturation2': parse_float, 'WeaponQualityZone1': parse_float, 'NumTexParts': parse_int,
+    'WeaponRustTexScale': parse_float, 'DetailGlossScale': parse_float, 'DirOverlayBumpScale': parse_float,
+    'TessellationFactor': parse_float, 'DecalDiffuseOpacity': parse_float, 'DebugUVScale': parse_float,
+    'PomDisplacement': parse_float, 'TessellationFactorMax': parse_float, 'WeaponQualityZone3': parse_float,
+    'WeaponRustBlendFactor': parse_float, 'WeaponRustBlend': parse_float, 'MaskHue3': parse_float,
+    'OverlayDetailB': parse_float, 'DirOverlayY': parse_float, 'DetailBumpScale': parse_float,
+}
+
+
+def set_parsed_fields(record, fields, attributes):
+    """
+    Sets the attributes of an XML element on a record, converted by the field table. Empty values stay
+    unset, values that don't convert and unknown attributes go to record.extra as strings.
+    """
+    for k, v in attributes.items():
+        parser = fields.get(k)
+        if parser is None:
+            record.extra[k] = v
+            continue
+        if v == '':
+            continue
+        try:
+            setattr(record, k, parser(v))
+        except ValueError:
+            print(f"Can't read {k}={v!r} of {record!r}, keeping it as text")
+            record.extra[k] = v
+
+
 class Texture:
+    __slots__ = ('TileU', 'TileV', 'extra') + tuple(TEXTURE_FIELDS)
+
     def __init__(self):
-        self.Filter = None
-        self.IsTileU = None
-        self.Map = None
-        self.IsTileV = None
-        self.File = None
         self.TileU = 1.0
         self.TileV = 1.0
+        self.extra = {}
+
+    def __getattr__(self, name):
+        # only reached for unset slots and unknown names
+        if name in TEXTURE_FIELDS:
+            return None
+        raise AttributeError(name)
 
     def __repr__(self):
         return f"Texture(Map={self.Map}, File={self.File})"
 
 class Material:
+    __slots__ = ('name', 'textures', 'extra') + tuple(MATERIAL_FIELDS)
+
     def __init__(self, name) -> None:
         self.name = name
-        # Material attributes
-        self.Emittance = None
-        self.VoxelCoverage = None
-        self.FurAmount = None
-        self.Emissive = None
-        self.CloakAmount = None
-        self.Opacity = None
-        self.StringGenMask = None
-        self.GlowAmount = None
-        self.vertModifType = None
-        self.MtlFlags = None
-        self.Shininess = None
-        self.Diffuse = None
-        self.HeatAmountScaled = None
-        self.Shader = None
-        self.CustomSortPriority = None
-        self.MatTemplate = None
-        self.SurfaceType = None
-        self.Specular = None
-        self.AlphaTest = None
-        self.GenMask = None
-        self.LayerAct = None
-        # PublicParams attributes
-        self.WeaponBloodColor = None
-        self.WeaponQualityZone2 = None
-        self.MaskSaturation3 = None
-        self.FresnelPower = None
-        self.FresnelScale = None
-        self.DirOverlayX = None
-        self.DecalFalloff = None
-        self.DetailDiffuseScale = None
-        self.RandomValueOffset = None
-        self.BlendLayer2Specular = None
-        self.ColorizingHue = None
-        self.SelfShadowStrength = None
-        self.WeaponBloodSpecular = None
-        self.ObmDisplacement = None
-        self.AmbientMultiplier = None
-        self.MaskBrightness2 = None
-        self.RandomValueScale = None
-        self.WeaponQualityZone0 = None
-        self.TessellationFactorMin = None
-        self.WeaponQualityZone5 = None
-        self.FresnelBias = None
-        self.BlendMaskTiling = None
-        self.WeaponBloodBlendFactor = None
-        self.ColorizingSaturation = None
-        self.WeaponBloodBlendFalloff = None
-        self.OverlayDetailR = None
-        self.OverlayDetailG = None
-        self.BackFaceBrightnessMult = None
-        self.HeightBias = None
-        self.DirOverlayThresholdMin = None
-        self.WeaponBloodGloss = None
-        self.BlendFactor = None
-        self.MaskBrightness3 = None
-        self.DecalAlphaMult = None
-        self.OverlayTiling = None
-        self.GlossFromDiffuseOffset = None
-        self.DirOverlayTilingU = None
-        self.SubsurfaceScatteringAmount = None
-        self.EmittanceMapGamma = None
-        self.SndUVsTileV = None
-        self.IndirectColor = None
-        self.SSSIndex = None
-        self.WeaponQualityZone6 = None
-        self.WeaponBloodTexScale = None
-        self.WeaponQualityZone4 = None
-        self.MaskSaturation1 = None
-        self.GlossFromDiffuseContrast = None
-        self.MaskHue2 = None
-        self.DirOverlayThresholdMax = None
-        self.ColorizingBrightness = None
-        self.GlossFromDiffuseBrightness = None
-        self.MaskBrightness1 = None
-        self.MaskHue1 = None
-        self.GlossFromDiffuseAmount = None
-        self.BlendLayer2Tiling = None
-        self.DirOverlayTilingV = None
-        self.WeaponQualityZone7 = None
-        self.SndUVsTileU = None
-        self.WeaponRustBlendFalloff = None
-        self.TessellationFaceCull = None
-        self.BlendFalloff = None
-        self.DirOverlayZ = None
-        self.MaskSaturation2 = None
-        self.WeaponQualityZone1 = None
-        self.NumTexParts = None
-        self.WeaponRustTexScale = None
-        self.DetailGlossScale = None
-        self.DirOverlayBumpScale = None
-        self.TessellationFactor = None
-        self.DecalDiffuseOpacity = None
-        self.DebugUVScale = None
-        self.PomDisplacement = None
-        self.TessellationFactorMax = None
-        self.WeaponQualityZone3 = None
-        self.WeaponRustBlendFactor = None
-        self.WeaponRustBlend = None
-        self.MaskHue3 = None
-        self.OverlayDetailB = None
-        self.DirOverlayY = None
-        self.DetailBumpScale = None
         # Textures
         self.textures = []
+        self.extra = {}
+
+    def __getattr__(self, name):
+        # only reached for unset slots and unknown names
+        if name in MATERIAL_FIELDS:
+            return None
+        raise AttributeError(name)
         
     def get_enabled_switches(self):
         enabled_switches = self.StringGenMask.split('%') if self.StringGenMask else []
@@ -158,17 +159,13 @@ def parse_mtl_file(file_path) -> List[Material]:
                 mat_name = os.path.splitext(os.path.basename(file_path))[0]
             mat = Material(mat_name.replace(".", "_"))
             # Set Material attributes
-            for k, v in material_elem.attrib.items():
-                if hasattr(mat, k):
-                    setattr(mat, k, v)
+            set_parsed_fields(mat, MATERIAL_FIELDS, material_elem.attrib)
             # Parse <Textures>
             textures_elem = material_elem.find("Textures")
             if textures_elem is not None:
                 for tex_elem in textures_elem.findall("Texture"):
                     tex = Texture()
-                    for k, v in tex_elem.attrib.items():
-                        if hasattr(tex, k):
-                            setattr(tex, k, v)
+                    set_parsed_fields(tex, TEXTURE_FIELDS, tex_elem.attrib)
                     texmod_elem = tex_elem.find("TexMod")
                     if texmod_elem is not None:
                         tex.TileU = float(texmod_elem.attrib.get("TileU", 1.0))
@@ -177,20 +174,37 @@ def parse_mtl_file(file_path) -> List[Material]:
             # Parse <PublicParams>
             public_params_elem = material_elem.find("PublicParams")
             if public_params_elem is not None:
-                for k, v in public_params_elem.attrib.items():
-                    if hasattr(mat, k):
-                        setattr(mat, k, v)
+                set_parsed_fields(mat, MATERIAL_FIELDS, public_params_elem.attrib)
             materials.append(mat)
     except ET.ParseError as e:
         print(f"Error parsing {file_path}: {e}")
     return materials
 
-def collect_unique_attributes(directory):
+# Parsed .mtl files kept by parse_mtl_file_cached
+MTL_CACHE_SIZE = 4096
+
+
+@functools.lru_cache(maxsize=MTL_CACHE_SIZE)
+def _parse_mtl_file_version(file_path, mtime_ns):
+    return tuple(parse_mtl_file(file_path))
+
+
+def parse_mtl_file_cached(file_path):
+    """
+    parse_mtl_file through a process wide cache keyed on path and modification time, so slots and meshes
+    sharing a .mtl parse it once per batch and an edited file is parsed again. The returned tuple and its
+    materials are shared between callers and must not be modified.
+    """
+    file_path = os.path.normpath(file_path)
+    return _parse_mtl_file_version(file_path, os.stat(file_path).st_mtime_ns)
+
+
+def collect_unique_attributes(directory, catalog=None):
     # Dictionary to store unique attributes for each element type
     unique_attributes = defaultdict(set)
 
     # Recursively iterate through all files in the directory and subdirectories
-    for root_dir, _, files in os.walk(directory):
+    for root_dir, files in ce_catalog.walk_files(directory, catalog, 'mtl'):
         for filename in files:
             if filename.endswith(".mtl"):
                 file_path = os.path.join(root_dir, filename)
@@ -231,58 +245,149 @@ def collect_unique_attributes(directory):
 #     print(f"{element_type}: {', '.join(attributes)}")
 
 
-def find_material_by_name(materials, name):
-    # First try exact match
-    for mat in materials:
-        if mat.name == name:
-            return mat
-    
-    # If no exact match, try to find by decrementing trailing numbers
+def split_material_slot_name(mat_slot_name):
+    """
+    Splits a '<mtl file>_mtl_<material>' slot name into (mtl file name, material name).
+    Returns None if the slot name does not follow that format.
+    """
+    parts = []
+    if '_mtl__' in mat_slot_name:
+        parts = mat_slot_name.split('_mtl__')
+    elif '_mtl_' in mat_slot_name:
+        parts = mat_slot_name.split('_mtl_')
+    if len(parts) != 2:
+        return None
+    return parts[0], parts[1]
+
+
+@functools.lru_cache(maxsize=None)
+def get_material_name_candidates(name):
+    """
+    Names find_material_by_name tries for name, in order: the name itself, then the same name with its
+    trailing number decremented ("stone_wall_03" -> "stone_wall_02", ...), then with a numbered suffix
+    stripped ("_decals1" -> "_decals").
+    """
     import re
-    
+    candidates = [name]
+
     # Pattern to match trailing numbers (e.g., "_03", "_02_decals1")
     pattern = r'(.+?)(\d+)(_.*)?$'
     match = re.match(pattern, name)
-    
+
     if match:
         base_name = match.group(1)  # Everything before the number
         number = int(match.group(2))  # The number
         suffix = match.group(3) or ""  # Everything after the number (if any)
-        
+
         # Try decrementing the number until we find a match or reach 0
         for i in range(number - 1, 0, -1):
             # For cases like "stone_wall_03" -> "stone_wall_02"
-            candidate_name = f"{base_name}{i:02d}{suffix}"
-            for mat in materials:
-                if mat.name == candidate_name:
-                    return mat
-            
+            candidates.append(f"{base_name}{i:02d}{suffix}")
             # Also try without zero-padding for single digits
             if i < 10:
-                candidate_name = f"{base_name}{i}{suffix}"
-                for mat in materials:
-                    if mat.name == candidate_name:
-                        return mat
-        
+                candidates.append(f"{base_name}{i}{suffix}")
+
         # Special case for suffix numbers like "_decals1" -> "_decals"
         if suffix and re.match(r'_.*\d+$', suffix):
             # Remove trailing digit from suffix
             suffix_no_digit = re.sub(r'\d+$', '', suffix)
-            candidate_name = f"{base_name}{number:02d}{suffix_no_digit}"
-            for mat in materials:
-                if mat.name == candidate_name:
-                    return mat
-            
+            candidates.append(f"{base_name}{number:02d}{suffix_no_digit}")
             # Also try with original number decremented
             for i in range(number - 1, 0, -1):
-                candidate_name = f"{base_name}{i:02d}{suffix_no_digit}"
-                for mat in materials:
-                    if mat.name == candidate_name:
-                        return mat
-    
+                candidates.append(f"{base_name}{i:02d}{suffix_no_digit}")
+    return tuple(candidates)
+
+
+def index_materials_by_name(materials):
+    # the first material of a name wins, as in a linear search
+    materials_by_name = {}
+    for mat in materials:
+        materials_by_name.setdefault(mat.name, mat)
+    return materials_by_name
+
+
+def find_material_by_name(materials, name):
+    materials_by_name = index_materials_by_name(materials)
+    for candidate_name in get_material_name_candidates(name):
+        mat = materials_by_name.get(candidate_name)
+        if mat:
+            return mat
     return None
 
-def find_texture_by_path(mat_data, texture_name, is_gloss=False):
+
+class MaterialIndex:
+    """
+    Material lookups shared by a whole batch: .mtl file name -> paths under root_folder (one walk, only
+    built once a slot's .mtl is not next to its mesh), parsed materials by name per .mtl, and resolved
+    (mtl path, material name) pairs including the decrementing-number fallback.
+    With a ce_catalog.DatasetCatalog of root_folder the .mtl files are listed from it instead of os.walk.
+    """
+    def __init__(self, root_folder=None, catalog=None):
+        self.root_folder = root_folder or ce_path_utils.CRY_ENGINE_OUTPUT_FOLDER_ROOT
+        self.catalog = catalog
+        self.mtl_paths_by_name = None
+        self.materials_by_mtl = {}
+        self.resolved = {}
+
+    def __repr__(self):
+        indexed = len(self.mtl_paths_by_name) if self.mtl_paths_by_name is not None else None
+        return f"MaterialIndex(root_folder={self.root_folder}, mtl names={indexed}, mtl files={len(self.materials_by_mtl)})"
+
+    def build_mtl_index(self):
+        self.mtl_paths_by_name = defaultdict(list)
+        for dirpath, filenames in ce_catalog.walk_files(self.root_folder, self.catalog, 'mtl'):
+            for f in filenames:
+                if f.endswith('.mtl'):
+                    self.mtl_paths_by_name[os.path.splitext(f)[0]].append(os.path.join(dirpath, f))
+
+    def find_mtl_file(self, source_folder, mtl_file_name):
+        """
+        Path of the .mtl a slot refers to: next to the mesh, else the first one of that name under
+        root_folder. None if there is none.
+        """
+        target_mat = os.path.join(source_folder, mtl_file_name + ".mtl")
+        if os.path.exists(target_mat):
+            return target_mat
+        if self.mtl_paths_by_name is None:
+            self.build_mtl_index()
+        paths = self.mtl_paths_by_name.get(mtl_file_name)
+        return paths[0] if paths else None
+
+    def get_materials_by_name(self, mtl_path):
+        if mtl_path not in self.materials_by_mtl:
+            self.materials_by_mtl[mtl_path] = index_materials_by_name(parse_mtl_file_cached(mtl_path))
+        return self.materials_by_mtl[mtl_path]
+
+    def find_material(self, mtl_path, mat_name):
+        """
+        Same result as find_material_by_name(parse_mtl_file(mtl_path), mat_name), resolved once per pair.
+        """
+        key = (mtl_path, mat_name)
+        if key not in self.resolved:
+            materials_by_name = self.get_materials_by_name(mtl_path)
+            self.resolved[key] = next((materials_by_name[candidate_name]
+                                       for candidate_name in get_material_name_candidates(mat_name)
+                                       if candidate_name in materials_by_name), None)
+        return self.resolved[key]
+
+
+_texture_alias_table = None
+
+
+def get_texture_alias_table():
+    """
+    The texture alias map written by ce_texture_convertor.dedup_dds_files, loaded once.
+    """
+    global _texture_alias_table
+    if _texture_alias_table is None:
+        _texture_alias_table = ce_dedup.AliasTable(ce_dedup.TEXTURE_ALIAS_MAP)
+    return _texture_alias_table
+
+
+def get_texture_package_name(mat_data, texture_name, is_gloss=False):
+    """
+    Package name a material's texture map was imported to, None if the material has no such map.
+    """
     texture_path = None
     for tex in mat_data.textures:
         if tex.Map == texture_name:
@@ -293,12 +398,21 @@ def find_texture_by_path(mat_data, texture_name, is_gloss=False):
         print(f"Texture {texture_name} not found in material {mat_data.name}")
         return None
     
+    # duplicate textures are only imported once, under their canonical path
+    texture_path = get_texture_alias_table().resolve(texture_path) or texture_path
     texture_path = texture_path.replace('.tif', '')
     texture_path = texture_path.replace('.dds', '')
     texture_path = f"/Game/Old/{texture_path}"
     
     if is_gloss:
         texture_path += "_glossmap"
+    return texture_path
+
+
+def find_texture_by_path(mat_data, texture_name, is_gloss=False):
+    texture_path = get_texture_package_name(mat_data, texture_name, is_gloss)
+    if not texture_path:
+        return None
     
     import unreal
     if unreal.EditorAssetLibrary.does_asset_exist(texture_path):
@@ -306,7 +420,65 @@ def find_texture_by_path(mat_data, texture_name, is_gloss=False):
     else: 
         unreal.log_warning(f"Texture asset not found: {texture_path}")
         return None
-    
+
+
+class TextureResolver:
+    """
+    Texture lookups used while building MaterialParams: the imported package of a texture map and
+    whether it has an alpha channel. Share one resolver across a batch: every package is checked and
+    tagged once, missing ones included, instead of once per material using it. Textures are only loaded
+    when apply_material_params sets them on an instance, and stay loaded until clear().
+    """
+    def __init__(self):
+        # package name -> whether the asset exists
+        self.exists = {}
+        self.alpha_channels = {}
+        # package name -> loaded texture
+        self.assets = {}
+
+    def __repr__(self):
+        missing = sum(1 for exists in self.exists.values() if not exists)
+        return f"TextureResolver(textures={len(self.exists)}, missing={missing}, loaded={len(self.assets)})"
+
+    def find_texture(self, mat_data, texture_name, is_gloss=False):
+        """
+        Package name of an existing texture asset, None if the map or the asset is missing.
+        """
+        texture_path = get_texture_package_name(mat_data, texture_name, is_gloss)
+        if not texture_path:
+            return None
+        return texture_path if self.texture_exists(texture_path) else None
+
+    def texture_exists(self, texture_path):
+        import unreal
+        if texture_path not in self.exists:
+            self.exists[texture_path] = unreal.EditorAssetLibrary.does_asset_exist(texture_path)
+            if not self.exists[texture_path]:
+                unreal.log_warning(f"Texture asset not found: {texture_path}")
+        return self.exists[texture_path]
+
+    def load_texture(self, texture_path):
+        import unreal
+        if not self.texture_exists(texture_path):
+            return None
+        if texture_path not in self.assets:
+            self.assets[texture_path] = unreal.EditorAssetLibrary.load_asset(texture_path)
+        return self.assets[texture_path]
+
+    def has_alpha_channel(self, texture_path):
+        import unreal
+        if texture_path not in self.alpha_channels:
+            texture_data = unreal.EditorAssetLibrary.find_asset_data(texture_path)
+            self.alpha_channels[texture_path] = texture_data.get_tag_value("HasAlphaChannel") == "True"
+        return self.alpha_channels[texture_path]
+
+    def clear(self):
+        """
+        Drops the loaded textures so they can be garbage collected, existence and alpha lookups are kept.
+        """
+        self.assets.clear()
+
+
 def get_texture_tiling(mat_data, texture_name):
     for tex in mat_data.textures:
         if tex.Map == texture_name:
@@ -320,6 +492,301 @@ def str_to_vec3(s):
     return [0.0, 0.0, 0.0]  # Default if parsing fails
 
 
+ILLUM_PARENT_MATERIAL = "/Game/Materials/CE/M_CE_Illum"
+VEGETATION_PARENT_MATERIAL = "/Game/Materials/CE/M_CE_Vegetation"
+GLASS_PARENT_MATERIAL = "/Game/Materials/CE/M_CE_Glass"
+# Folder of the instances shared by every mesh slot with the same parameters
+SHARED_MATERIAL_FOLDER = "/Game/Old/SharedMaterials"
+# Rare static switch permutations -> kept ones, written by ce_material_permutations.write_permutation_budget
+PERMUTATION_BUDGET_MAP = os.path.join(SCRIPT_DIR, "build_manifests/material_permutation_budget.json")
+# Metadata tag holding the MaterialParams key an instance was last set from, checked by batch assignment
+MATERIAL_PARAMS_TAG = "CEMaterialParams"
+# Meshes processed between two bulk saves of the batch material assignment
+DEFAULT_MATERIAL_CHUNK_SIZE = 50
+
+
+class MaterialParams:
+    """
+    Everything a CE material sets on its material instance: parent, texture parameters (package names),
+    scalar, vector and static switch parameters and the masked blend override, as (blend mode name,
+    opacity mask clip value). Built without touching assets, applied by apply_material_params.
+    """
+    def __init__(self, parent):
+        self.parent = parent
+        self.textures = {}
+        self.scalars = {}
+        self.vectors = {}
+        self.switches = {}
+        self.blend_override = None
+
+    def __repr__(self):
+        return (f"MaterialParams(parent={self.parent}, textures={len(self.textures)}, scalars={len(self.scalars)}, "
+                f"vectors={len(self.vectors)}, switches={len(self.switches)})")
+
+    def to_dict(self):
+        return {
+            'parent': self.parent,
+            'textures': self.textures,
+            'scalars': self.scalars,
+            'vectors': self.vectors,
+            'switches': self.switches,
+            'blend_override': self.blend_override,
+        }
+
+    @classmethod
+    def from_dict(cls, data):
+        params = cls(data['parent'])
+        params.textures = dict(data['textures'])
+        params.scalars = dict(data['scalars'])
+        params.vectors = dict(data['vectors'])
+        params.switches = dict(data['switches'])
+        params.blend_override = tuple(data['blend_override']) if data['blend_override'] else None
+        return params
+
+    def key(self):
+        """
+        Hash of all parameters: two materials with the same key render the same and can share an instance.
+        """
+        data = json.dumps(self.to_dict(), sort_keys=True, separators=(',', ':'))
+        return hashlib.sha1(data.encode('utf-8')).hexdigest()
+
+
+def build_illum_params(material_data: Material, textures):
+    params = MaterialParams(ILLUM_PARENT_MATERIAL)
+    diffuse_tex = textures.find_texture(material_data, "Diffuse")
+    if diffuse_tex:
+        if material_data.AlphaTest is not None and material_data.AlphaTest > 0.0:
+            if textures.has_alpha_channel(diffuse_tex):
+                print(f"Material {material_data.name} has alpha channel in Diffuse texture, setting blend mode to Masked.")
+                params.blend_override = ("BLEND_MASKED", material_data.AlphaTest)
+        params.textures["Diffuse"] = diffuse_tex
+    bump_tex = textures.find_texture(material_data, "Bumpmap")
+    if bump_tex:
+        params.textures["Bumpmap"] = bump_tex
+    gloss_tex = textures.find_texture(material_data, "Bumpmap", is_gloss=True)
+    if gloss_tex:
+        params.textures["Bumpmap Gloss"] = gloss_tex
+    specular_tex = textures.find_texture(material_data, "Specular")
+    if specular_tex:
+        params.textures["Specular"] = specular_tex
+        
+    if material_data.Diffuse is not None:
+        params.vectors["MatDiffuse"] = list(material_data.Diffuse)
+    if material_data.Specular is not None:
+        params.vectors["MatSpecular"] = list(material_data.Specular)
+
+    enabled_switches = material_data.get_enabled_switches()
+    if "BLENDLAYER" in enabled_switches:
+        params.switches["BLENDLAYER"] = True
+        if material_data.BlendFactor is not None:
+            params.scalars["BlendFactor"] = material_data.BlendFactor
+        if material_data.BlendMaskTiling is not None:
+            params.scalars["BlendMaskTiling"] = material_data.BlendMaskTiling
+        if material_data.BlendFalloff is not None:
+            params.scalars["BlendFalloff"] = material_data.BlendFalloff
+        if material_data.BlendLayer2Tiling is not None:
+            params.scalars["BlendLayer2Tiling"] = material_data.BlendLayer2Tiling
+        if material_data.BlendLayer2Specular is not None:
+            params.scalars["BlendLayer2Specular"] = material_data.BlendLayer2Specular
+        custom_tex = textures.find_texture(material_data, "Custom")
+        if custom_tex:
+            params.textures["Custom"] = custom_tex
+        custom_1_tex = textures.find_texture(material_data, "[1] Custom")
+        if custom_1_tex:
+            params.textures["[1] Custom"] = custom_1_tex
+        custom_1_gloss_tex = textures.find_texture(material_data, "[1] Custom", is_gloss=True)
+        if custom_1_gloss_tex:
+            params.textures["[1] Custom Gloss"] = custom_1_gloss_tex
+        opacity_tex = textures.find_texture(material_data, "Opacity")
+        if opacity_tex:
+            params.textures["Opacity"] = opacity_tex
+    
+    if "DETAIL_MAPPING" in enabled_switches:
+        params.switches["DETAIL_MAPPING"] = True
+        detail_tex = textures.find_texture(material_data, "Detail")
+        if detail_tex:
+            params.textures["Detail"] = detail_tex
+    
+    if "DETAIL_ATLAS" in enabled_switches:
+        params.switches["DETAIL_ATLAS"] = True
+        params.switches["DETAIL_MAPPING"] = True
+        # set even when missing, as before
+        params.textures["DetailMask"] = textures.find_texture(material_data, "Detail")
+    
+    if "DETAIL_ATLAS" in enabled_switches or "DETAIL_MAPPING" in enabled_switches:
+        if material_data.DetailDiffuseScale is not None:
+            params.scalars["DetailDiffuseScale"] = material_data.DetailDiffuseScale
+        if material_data.DetailGlossScale is not None:
+            params.scalars["DetailGlossScale"] = material_data.DetailGlossScale
+        if material_data.DetailBumpScale is not None:
+            params.scalars["DetailBumpScale"] = material_data.DetailBumpScale
+        tile_u, tile_v = get_texture_tiling(material_data, "Detail")
+        params.scalars["Detail Tile U"] = float(tile_u)
+        params.scalars["Detail Tile V"] = float(tile_v)
+        
+    if "USE_FIRST_UV_DETMAP" in enabled_switches:
+        params.switches["USE_FIRST_UV_DETMAP"] = True
+    
+    if "SNDUVS" in enabled_switches:
+        params.switches["SNDUVS"] = True
+        snd_uvs_tex = textures.find_texture(material_data, "[1] Diffuse")
+        if snd_uvs_tex:
+            params.textures["[1] Diffuse"] = snd_uvs_tex
+        if material_data.SndUVsTileU is not None:
+            params.scalars["SndUVsTileU"] = material_data.SndUVsTileU
+        if material_data.SndUVsTileV is not None:
+            params.scalars["SndUVsTileV"] = material_data.SndUVsTileV
+    return params
+
+
+def build_vegetation_params(material_data: Material, textures):
+    params = MaterialParams(VEGETATION_PARENT_MATERIAL)
+    diffuse_tex = textures.find_texture(material_data, "Diffuse")
+    if diffuse_tex:
+        params.textures["Diffuse"] = diffuse_tex
+    bump_tex = textures.find_texture(material_data, "Bumpmap")
+    if bump_tex:
+        params.textures["Bumpmap"] = bump_tex
+    gloss_tex = textures.find_texture(material_data, "Bumpmap", is_gloss=True)
+    if gloss_tex:
+        params.textures["Bumpmap Gloss"] = gloss_tex
+        
+    if material_data.Diffuse is not None:
+        params.vectors["MatDiffuse"] = list(material_data.Diffuse)
+
+    opacity_tex = textures.find_texture(material_data, "Opacity")
+    if opacity_tex:
+        params.textures["Opacity"] = opacity_tex
+    return params
+
+
+def build_glass_params(material_data: Material, textures):
+    params = MaterialParams(GLASS_PARENT_MATERIAL)
+    diffuse_tex = textures.find_texture(material_data, "Diffuse")
+    if diffuse_tex:
+        params.textures["Diffuse"] = diffuse_tex
+    bump_tex = textures.find_texture(material_data, "Bumpmap")
+    if bump_tex:
+        params.textures["Bumpmap"] = bump_tex
+    gloss_tex = textures.find_texture(material_data, "Bumpmap", is_gloss=True)
+    if gloss_tex:
+        params.textures["Bumpmap Gloss"] = gloss_tex
+        
+    if material_data.Diffuse is not None:
+        params.vectors["MatDiffuse"] = list(material_data.Diffuse)
+    if material_data.Specular is not None:
+        params.vectors["MatSpecular"] = list(material_data.Specular)
+    return params
+
+
+DETAIL_PARAMETERS = ("DetailDiffuseScale", "DetailGlossScale", "DetailBumpScale", "Detail Tile U", "Detail Tile V")
+
+# Static switch -> the texture and scalar parameters build_illum_params only sets when it is on
+SWITCH_PARAMETERS = {
+    "BLENDLAYER": ("BlendFactor", "BlendMaskTiling", "BlendFalloff", "BlendLayer2Tiling", "BlendLayer2Specular",
+                   "Custom", "[1] Custom", "[1] Custom Gloss", "Opacity"),
+    "DETAIL_MAPPING": ("Detail",) + DETAIL_PARAMETERS,
+    "DETAIL_ATLAS": ("DetailMask",) + DETAIL_PARAMETERS,
+    "SNDUVS": ("[1] Diffuse", "SndUVsTileU", "SndUVsTileV"),
+}
+
+
+# Shader -> parameter builder, the shaders a material instance can be created for
+MATERIAL_PARAM_BUILDERS = {
+    "Illum": build_illum_params,
+    "Vegetation": build_vegetation_params,
+    "Glass": build_glass_params,
+}
+
+
+def get_permutation_key(switches):
+    """
+    Static switch permutation of a MaterialParams switch dict, as a StringGenMask like 'BLENDLAYER%SNDUVS'.
+    """
+    return '%'.join(sorted(name for name, enabled in switches.items() if enabled))
+
+
+@functools.lru_cache(maxsize=1)
+def _load_permutation_budget(budget_path, mtime_ns):
+    with open(budget_path, 'r', encoding='utf-8') as file:
+        return json.load(file).get('parents', {})
+
+
+def get_permutation_budget():
+    """
+    Parent material -> {permutation key: kept permutation key} from PERMUTATION_BUDGET_MAP, cached on its
+    modification time so a budget written in the same session is picked up.
+    Empty when no budget was written, every permutation is then kept.
+    """
+    try:
+        mtime_ns = os.stat(PERMUTATION_BUDGET_MAP).st_mtime_ns
+    except FileNotFoundError:
+        return {}
+    return _load_permutation_budget(PERMUTATION_BUDGET_MAP, mtime_ns)
+
+
+def remove_switch_parameters(params, removed_switches):
+    """
+    Drops the parameters only set for switches that were folded away, unless a kept switch sets them too,
+    so materials that are identical after folding get the same key.
+    """
+    kept_names = set()
+    for switch in params.switches:
+        kept_names.update(SWITCH_PARAMETERS.get(switch, ()))
+    for switch in removed_switches:
+        for name in set(SWITCH_PARAMETERS.get(switch, ())) - kept_names:
+            params.textures.pop(name, None)
+            params.scalars.pop(name, None)
+
+
+def build_material_params(material_data: Material, textures):
+    """
+    MaterialParams of a CE material, None if its shader is not supported.
+    A rare static switch permutation is folded into its kept one when a permutation budget exists.
+    """
+    builder = MATERIAL_PARAM_BUILDERS.get(material_data.Shader)
+    if not builder:
+        return None
+    params = builder(material_data, textures)
+    folded = get_permutation_budget().get(params.parent, {}).get(get_permutation_key(params.switches))
+    if folded is not None:
+        removed_switches = set(params.switches)
+        params.switches = {name: True for name in folded.split('%') if name}
+        remove_switch_parameters(params, removed_switches - set(params.switches))
+    return params
+
+
+def apply_material_params(material_instance, params, textures=None):
+    """
+    Sets the parameters of a MaterialParams on a material instance (the parent is set at creation).
+    Textures are loaded through the TextureResolver textures when given.
+    """
+    import unreal
+    mat_edit_lib = unreal.MaterialEditingLibrary
+    if params.blend_override:
+        blend_mode, clip_value = params.blend_override
+        overide_prop = material_instance.get_editor_property("base_property_overrides")
+        overide_prop.set_editor_property("override_blend_mode", True)
+        overide_prop.set_editor_property("blend_mode", getattr(unreal.BlendMode, blend_mode))
+        overide_prop.set_editor_property("override_opacity_mask_clip_value", True)
+        overide_prop.set_editor_property("opacity_mask_clip_value", clip_value)
+        material_instance.set_editor_property("base_property_overrides", overide_prop)
+    for name, texture_path in params.textures.items():
+        if not texture_path:
+            texture = None
+        elif textures:
+            texture = textures.load_texture(texture_path)
+        else:
+            texture = unreal.EditorAssetLibrary.load_asset(texture_path)
+        mat_edit_lib.set_material_instance_texture_parameter_value(material_instance, name, texture)
+    for name, value in params.vectors.items():
+        mat_edit_lib.set_material_instance_vector_parameter_value(material_instance, name, value)
+    for name, value in params.switches.items():
+        mat_edit_lib.set_material_instance_static_switch_parameter_value(material_instance, name, value)
+    for name, value in params.scalars.items():
+        mat_edit_lib.set_material_instance_scalar_parameter_value(material_instance, name, value)
+
+
 def create_material_instance(material_data: Material, target_path, mesh_name, parent_material_path, cached_instance):
     import unreal
     parent_material = unreal.EditorAssetLibrary.load_asset(parent_material_path)
@@ -351,287 +818,260 @@ def create_material_instance(material_data: Material, target_path, mesh_name, pa
     return material_instance
 
 
-def create_material_instance_illum(material_data: Material, target_path, mesh_name, cached_instance):
+def create_material_instance_from_params(material_data: Material, params, target_path, mesh_name, cached_instance,
+                                         textures=None):
+    """
+    Creates the per mesh instance mtl_<mesh>_<material> of a material and sets its parameters.
+    """
     import unreal
-
     material_instance = create_material_instance(
-        material_data, target_path, mesh_name, 
-        "/Game/Materials/CE/M_CE_Illum", cached_instance)
-    
+        material_data, target_path, mesh_name, params.parent, cached_instance)
     if material_instance:
-        # set material properties
-        mat_edit_lib = unreal.MaterialEditingLibrary
-        diffuse_tex = find_texture_by_path(material_data, "Diffuse")
-        if diffuse_tex:
-            if material_data.AlphaTest and float(material_data.AlphaTest) > 0.0:
-                diffuse_tex_data = unreal.EditorAssetLibrary.find_asset_data(diffuse_tex.get_path_name())
-                has_alpha  = diffuse_tex_data.get_tag_value("HasAlphaChannel")
-                if has_alpha == "True":
-                    print(f"Material {material_data.name} has alpha channel in Diffuse texture, setting blend mode to Masked.")
-                    overide_prop = material_instance.get_editor_property("base_property_overrides")
-                    overide_prop.set_editor_property("override_blend_mode", True)
-                    overide_prop.set_editor_property("blend_mode", unreal.BlendMode.BLEND_MASKED)
-                    overide_prop.set_editor_property("override_opacity_mask_clip_value", True)
-                    overide_prop.set_editor_property("opacity_mask_clip_value", float(material_data.AlphaTest))
-                    material_instance.set_editor_property("base_property_overrides", overide_prop)
-            mat_edit_lib.set_material_instance_texture_parameter_value(material_instance, "Diffuse", diffuse_tex)
-        bump_tex = find_texture_by_path(material_data, "Bumpmap")
-        if bump_tex:
-            mat_edit_lib.set_material_instance_texture_parameter_value(material_instance, "Bumpmap", bump_tex)
-        gloss_tex = find_texture_by_path(material_data, "Bumpmap", is_gloss=True)
-        if gloss_tex:
-            mat_edit_lib.set_material_instance_texture_parameter_value(material_instance, "Bumpmap Gloss", gloss_tex)
-        specular_tex = find_texture_by_path(material_data, "Specular")
-        if specular_tex:
-            mat_edit_lib.set_material_instance_texture_parameter_value(material_instance, "Specular", specular_tex)
-            
-        if material_data.Diffuse:
-            mat_edit_lib.set_material_instance_vector_parameter_value(
-                material_instance, "MatDiffuse", str_to_vec3(material_data.Diffuse))
-        if material_data.Specular:
-            mat_edit_lib.set_material_instance_vector_parameter_value(
-                material_instance, "MatSpecular", str_to_vec3(material_data.Specular))
-
-        enabled_switches = material_data.get_enabled_switches()
-        if "BLENDLAYER" in enabled_switches:
-            mat_edit_lib.set_material_instance_static_switch_parameter_value(
-                material_instance, "BLENDLAYER", True)
-            if material_data.BlendFactor:
-                mat_edit_lib.set_material_instance_scalar_parameter_value(
-                    material_instance, "BlendFactor", float(material_data.BlendFactor))
-            if material_data.BlendMaskTiling:
-                mat_edit_lib.set_material_instance_scalar_parameter_value(
-                    material_instance, "BlendMaskTiling", float(material_data.BlendMaskTiling))
-            if material_data.BlendFalloff:
-                mat_edit_lib.set_material_instance_scalar_parameter_value(
-                    material_instance, "BlendFalloff", float(material_data.BlendFalloff))
-            if material_data.BlendLayer2Tiling:
-                mat_edit_lib.set_material_instance_scalar_parameter_value(
-                    material_instance, "BlendLayer2Tiling", float(material_data.BlendLayer2Tiling))
-            if material_data.BlendLayer2Specular:
-                mat_edit_lib.set_material_instance_scalar_parameter_value(
-                    material_instance, "BlendLayer2Specular", float(material_data.BlendLayer2Specular))
-            custom_tex = find_texture_by_path(material_data, "Custom")
-            if custom_tex:
-                mat_edit_lib.set_material_instance_texture_parameter_value(
-                    material_instance, "Custom", custom_tex)
-            custom_1_tex = find_texture_by_path(material_data, "[1] Custom")
-            if custom_1_tex:
-                mat_edit_lib.set_material_instance_texture_parameter_value(
-                    material_instance, "[1] Custom", custom_1_tex)
-            custom_1_gloss_tex = find_texture_by_path(material_data, "[1] Custom", is_gloss=True)
-            if custom_1_gloss_tex:
-                mat_edit_lib.set_material_instance_texture_parameter_value(
-                    material_instance, "[1] Custom Gloss", custom_1_gloss_tex)
-            opacity_tex = find_texture_by_path(material_data, "Opacity")
-            if opacity_tex:
-                mat_edit_lib.set_material_instance_texture_parameter_value(
-                    material_instance, "Opacity", opacity_tex)
-        
-        if "DETAIL_MAPPING" in enabled_switches:
-            mat_edit_lib.set_material_instance_static_switch_parameter_value(
-                material_instance, "DETAIL_MAPPING", True)
-            detail_tex = find_texture_by_path(material_data, "Detail")
-            if detail_tex:
-                mat_edit_lib.set_material_instance_texture_parameter_value(
-                    material_instance, "Detail", detail_tex)
-        
-        if "DETAIL_ATLAS" in enabled_switches:
-            mat_edit_lib.set_material_instance_static_switch_parameter_value(
-                material_instance, "DETAIL_ATLAS", True)
-            mat_edit_lib.set_material_instance_static_switch_parameter_value(
-                material_instance, "DETAIL_MAPPING", True)
-            detail_atlas_tex = find_texture_by_path(material_data, "Detail")
-            mat_edit_lib.set_material_instance_texture_parameter_value(
-                material_instance, "DetailMask", detail_atlas_tex)
-        
-        if "DETAIL_ATLAS" in enabled_switches or "DETAIL_MAPPING" in enabled_switches:
-            if material_data.DetailDiffuseScale:
-                mat_edit_lib.set_material_instance_scalar_parameter_value(
-                    material_instance, "DetailDiffuseScale", float(material_data.DetailDiffuseScale))
-            if material_data.DetailGlossScale:
-                mat_edit_lib.set_material_instance_scalar_parameter_value(
-                    material_instance, "DetailGlossScale", float(material_data.DetailGlossScale))
-            if material_data.DetailBumpScale:
-                mat_edit_lib.set_material_instance_scalar_parameter_value(
-                    material_instance, "DetailBumpScale", float(material_data.DetailBumpScale))
-            tile_u, tile_v = get_texture_tiling(material_data, "Detail")
-            mat_edit_lib.set_material_instance_scalar_parameter_value(
-                material_instance, "Detail Tile U", float(tile_u))
-            mat_edit_lib.set_material_instance_scalar_parameter_value(
-                material_instance, "Detail Tile V", float(tile_v))
-            
-        if "USE_FIRST_UV_DETMAP" in enabled_switches:
-            mat_edit_lib.set_material_instance_static_switch_parameter_value(
-                material_instance, "USE_FIRST_UV_DETMAP", True)
-        
-        if "SNDUVS" in enabled_switches:
-            mat_edit_lib.set_material_instance_static_switch_parameter_value(
-                material_instance, "SNDUVS", True)
-            snd_uvs_tex = find_texture_by_path(material_data, "[1] Diffuse")
-            if snd_uvs_tex:
-                mat_edit_lib.set_material_instance_texture_parameter_value(
-                    material_instance, "[1] Diffuse", snd_uvs_tex)
-            if material_data.SndUVsTileU:
-                mat_edit_lib.set_material_instance_scalar_parameter_value(
-                    material_instance, "SndUVsTileU", float(material_data.SndUVsTileU))
-            if material_data.SndUVsTileV:
-                mat_edit_lib.set_material_instance_scalar_parameter_value(
-                    material_instance, "SndUVsTileV", float(material_data.SndUVsTileV))
-            
-            
+        apply_material_params(material_instance, params, textures)
         unreal.EditorAssetLibrary.save_loaded_asset(material_instance)
         return material_instance
-    
     return None
 
-def create_material_instance_vegetation(material_data: Material, target_path, mesh_name, cached_instance):
+
+def update_material_instance(package_path, instance_name, params, dirty_assets, textures=None):
+    """
+    Batch counterpart of create_material_instance_from_params: an existing instance is reused and only
+    reset and set again when the MaterialParams key it was set from (MATERIAL_PARAMS_TAG) differs.
+    Created or changed instances are appended to dirty_assets instead of being saved.
+    """
     import unreal
-    PARENT_MATERIAL_PATH = "/Game/Materials/CE/M_CE_Vegetation"
-    
-    material_instance = create_material_instance(
-        material_data, target_path, mesh_name, 
-        PARENT_MATERIAL_PATH, cached_instance)
-    
-    if material_instance:
-        # set material properties
-        mat_edit_lib = unreal.MaterialEditingLibrary
-        diffuse_tex = find_texture_by_path(material_data, "Diffuse")
-        if diffuse_tex:
-            mat_edit_lib.set_material_instance_texture_parameter_value(material_instance, "Diffuse", diffuse_tex)
-        bump_tex = find_texture_by_path(material_data, "Bumpmap")
-        if bump_tex:
-            mat_edit_lib.set_material_instance_texture_parameter_value(material_instance, "Bumpmap", bump_tex)
-        gloss_tex = find_texture_by_path(material_data, "Bumpmap", is_gloss=True)
-        if gloss_tex:
-            mat_edit_lib.set_material_instance_texture_parameter_value(material_instance, "Bumpmap Gloss", gloss_tex)
-            
-        if material_data.Diffuse:
-            mat_edit_lib.set_material_instance_vector_parameter_value(
-                material_instance, "MatDiffuse", str_to_vec3(material_data.Diffuse))
+    package_name = f"{package_path}/{instance_name}"
+    key = params.key()
+    if unreal.EditorAssetLibrary.does_asset_exist(package_name):
+        material_instance = unreal.EditorAssetLibrary.load_asset(package_name)
+        if unreal.EditorAssetLibrary.get_metadata_tag(material_instance, MATERIAL_PARAMS_TAG) == key:
+            return material_instance
+        # parameters of the previous build may not be in the new set
+        unreal.MaterialEditingLibrary.clear_all_material_instance_parameters(material_instance)
+        if not params.blend_override:
+            overide_prop = material_instance.get_editor_property("base_property_overrides")
+            overide_prop.set_editor_property("override_blend_mode", False)
+            overide_prop.set_editor_property("override_opacity_mask_clip_value", False)
+            material_instance.set_editor_property("base_property_overrides", overide_prop)
+    else:
+        asset_tools = unreal.AssetToolsHelpers.get_asset_tools()
+        material_instance = asset_tools.create_asset(
+            asset_name=instance_name,
+            package_path=package_path,
+            asset_class=unreal.MaterialInstanceConstant,
+            factory=unreal.MaterialInstanceConstantFactoryNew()
+        )
+        if not material_instance:
+            return None
+    material_instance.set_editor_property("parent", unreal.EditorAssetLibrary.load_asset(params.parent))
+    apply_material_params(material_instance, params, textures)
+    unreal.EditorAssetLibrary.set_metadata_tag(material_instance, MATERIAL_PARAMS_TAG, key)
+    dirty_assets.append(material_instance)
+    return material_instance
 
-        opacity_tex = find_texture_by_path(material_data, "Opacity")
-        if opacity_tex:
-            mat_edit_lib.set_material_instance_texture_parameter_value(
-                material_instance, "Opacity", opacity_tex)
-            
-        unreal.EditorAssetLibrary.save_loaded_asset(material_instance)
-        return material_instance
-    
-    return None
+
+def save_dirty_assets(dirty_assets):
+    """
+    Saves the assets collected by a batch in one call and empties the list. Returns the number saved.
+    """
+    import unreal
+    unique_assets = list({asset.get_path_name(): asset for asset in dirty_assets}.values())
+    dirty_assets.clear()
+    if unique_assets:
+        unreal.EditorAssetLibrary.save_loaded_assets(unique_assets, True)
+    return len(unique_assets)
+
+
+def create_material_instance_illum(material_data: Material, target_path, mesh_name, cached_instance):
+    params = build_illum_params(material_data, TextureResolver())
+    return create_material_instance_from_params(material_data, params, target_path, mesh_name, cached_instance)
+
+
+def create_material_instance_vegetation(material_data: Material, target_path, mesh_name, cached_instance):
+    params = build_vegetation_params(material_data, TextureResolver())
+    return create_material_instance_from_params(material_data, params, target_path, mesh_name, cached_instance)
 
 
 def create_material_instance_glass(material_data: Material, target_path, mesh_name, cached_instance):
-    import unreal
-    PARENT_MATERIAL_PATH = "/Game/Materials/CE/M_CE_Glass"
-    
-    material_instance = create_material_instance(
-        material_data, target_path, mesh_name, 
-        PARENT_MATERIAL_PATH, cached_instance)
-    
-    if material_instance:
-        # set material properties
-        mat_edit_lib = unreal.MaterialEditingLibrary
-        diffuse_tex = find_texture_by_path(material_data, "Diffuse")
-        if diffuse_tex:
-            mat_edit_lib.set_material_instance_texture_parameter_value(material_instance, "Diffuse", diffuse_tex)
-        bump_tex = find_texture_by_path(material_data, "Bumpmap")
-        if bump_tex:
-            mat_edit_lib.set_material_instance_texture_parameter_value(material_instance, "Bumpmap", bump_tex)
-        gloss_tex = find_texture_by_path(material_data, "Bumpmap", is_gloss=True)
-        if gloss_tex:
-            mat_edit_lib.set_material_instance_texture_parameter_value(material_instance, "Bumpmap Gloss", gloss_tex)
-            
-        if material_data.Diffuse:
-            mat_edit_lib.set_material_instance_vector_parameter_value(
-                material_instance, "MatDiffuse", str_to_vec3(material_data.Diffuse))
-        if material_data.Specular:
-            mat_edit_lib.set_material_instance_vector_parameter_value(
-                material_instance, "MatSpecular", str_to_vec3(material_data.Specular))
-            
-        unreal.EditorAssetLibrary.save_loaded_asset(material_instance)
+    params = build_glass_params(material_data, TextureResolver())
+    return create_material_instance_from_params(material_data, params, target_path, mesh_name, cached_instance)
+
+
+class SharedMaterialInstances:
+    """
+    One material instance per unique MaterialParams key, named mtl_<material>_<key[:8]> in folder and
+    reused by every mesh slot resolving to the same parameters, in this run and later ones.
+    """
+    def __init__(self, folder=SHARED_MATERIAL_FOLDER):
+        self.folder = folder
+        self.instances = {}
+        self.created_count = 0
+
+    def __repr__(self):
+        return f"SharedMaterialInstances(folder={self.folder}, instances={len(self.instances)}, created={self.created_count})"
+
+    def get_instance_name(self, material_name, params):
+        return f"mtl_{material_name}_{params.key()[:8]}"
+
+    def get_or_create(self, material_name, params, textures=None, dirty_assets=None):
+        """
+        With dirty_assets (batch mode) a created instance is appended to it instead of being saved.
+        """
+        import unreal
+        instance_name = self.get_instance_name(material_name, params)
+        if instance_name in self.instances:
+            return self.instances[instance_name]
+        if dirty_assets is not None:
+            dirty_count = len(dirty_assets)
+            material_instance = update_material_instance(self.folder, instance_name, params, dirty_assets, textures)
+            self.created_count += len(dirty_assets) - dirty_count
+            self.instances[instance_name] = material_instance
+            return material_instance
+        package_name = f"{self.folder}/{instance_name}"
+        if unreal.EditorAssetLibrary.does_asset_exist(package_name):
+            # the name carries the parameter hash, an existing instance already has these parameters
+            material_instance = unreal.EditorAssetLibrary.load_asset(package_name)
+        else:
+            asset_tools = unreal.AssetToolsHelpers.get_asset_tools()
+            material_instance = asset_tools.create_asset(
+                asset_name=instance_name,
+                package_path=self.folder,
+                asset_class=unreal.MaterialInstanceConstant,
+                factory=unreal.MaterialInstanceConstantFactoryNew()
+            )
+            if material_instance:
+                material_instance.set_editor_property("parent", unreal.EditorAssetLibrary.load_asset(params.parent))
+                apply_material_params(material_instance, params, textures)
+                unreal.EditorAssetLibrary.save_loaded_asset(material_instance)
+                self.created_count += 1
+        self.instances[instance_name] = material_instance
         return material_instance
-    
-    return None
-    
 
-def create_and_assign_mat_to_mesh(mesh_data):
+
+def disable_nanite(static_mesh):
+    """
+    Turns Nanite off on a mesh with translucent materials. Returns False if it already was off.
+    """
+    import unreal
+    sm_edit_sub = unreal.get_editor_subsystem(unreal.StaticMeshEditorSubsystem)
+    nanite_setting = sm_edit_sub.get_nanite_settings(static_mesh)
+    # meshes imported with the 'translucent' ce_mesh_policy are already built without Nanite
+    if not nanite_setting.get_editor_property('enabled'):
+        return False
+    nanite_setting.set_editor_property('enabled', False)
+    sm_edit_sub.set_nanite_settings(static_mesh, nanite_setting, True)
+    return True
+
+
+def create_and_assign_mat_to_mesh(mesh_data, material_index=None, shared_instances=None, textures=None,
+                                  dirty_assets=None):
+    """
+    Creates the material instances of a mesh's slots from their .mtl and assigns them.
+    Pass the same MaterialIndex for every mesh of a batch so .mtl lookups are shared.
+    With shared_instances (a SharedMaterialInstances) slots with identical parameters share one instance
+    instead of getting a mtl_<mesh>_<material> instance next to each mesh.
+    Pass the same TextureResolver for every mesh of a batch so each texture is looked up once.
+    With dirty_assets (batch mode) existing instances are reused through update_material_instance,
+    slots already holding their instance are left alone and changed assets are appended to the list
+    for save_dirty_assets instead of being saved; an unchanged mesh is not touched at all.
+    """
     import unreal
+    material_index = material_index or MaterialIndex()
+    textures = textures or TextureResolver()
     static_mesh = unreal.EditorAssetLibrary.load_asset(mesh_data.package_name)
     
     mesh_path = str(mesh_data.package_path)
     name = str(mesh_data.asset_name)
     source_folder = os.path.join(ce_path_utils.CRY_ENGINE_OUTPUT_FOLDER_ROOT, mesh_path.replace('/Game/Old/', ''))
     if os.path.exists(source_folder):
+        batch = dirty_assets is not None
+        mesh_changed = False
         has_transparency = False
         cached_instance = []
         for mat_slot in static_mesh.static_materials:
             mat_slot_name = str(mat_slot.material_slot_name)
             
-            parts = []
-            if '_mtl__' in mat_slot_name:
-                parts = mat_slot_name.split('_mtl__')
-            elif '_mtl_' in mat_slot_name:
-                parts = mat_slot_name.split('_mtl_')
-            
-            if len(parts) != 2:
+            parts = split_material_slot_name(mat_slot_name)
+            if not parts:
                 unreal.log_warning(f"Material slot name {mat_slot_name} does not match expected format, skipping.")
                 continue
             
-            mtl_file_name = parts[0]
-            mat_name = parts[1]
+            mtl_file_name, mat_name = parts
         
-            target_mat = os.path.join(source_folder, mtl_file_name + ".mtl")
-            materials = None
-            if os.path.exists(target_mat):
-                materials = parse_mtl_file(target_mat)
-            else:
-                root_folder = ce_path_utils.CRY_ENGINE_OUTPUT_FOLDER_ROOT
-                found_mtl_files = []
-                for dirpath, dirnames, filenames in os.walk(root_folder):
-                    for f in filenames:
-                        if f.endswith('.mtl'):
-                            found_mtl_files.append(os.path.join(dirpath, f))
-                for mtl_file in found_mtl_files:
-                    # get file name without extension
-                    mtl_name = os.path.splitext(os.path.basename(mtl_file))[0]
-                    if mtl_name == mtl_file_name:
-                        target_mat = mtl_file
-                        materials = parse_mtl_file(target_mat)
-                        break
-            if materials:
-                mat_data = find_material_by_name(materials, mat_name)
+            target_mat = material_index.find_mtl_file(source_folder, mtl_file_name)
+            if target_mat:
+                mat_data = material_index.find_material(target_mat, mat_name)
                 if mat_data:
-                    material_instance = None
-                    if mat_data.Shader == "Illum":
-                        material_instance = create_material_instance_illum(mat_data, mesh_path, mesh_data.asset_name, cached_instance)
-                    elif mat_data.Shader == "Vegetation":
-                        material_instance = create_material_instance_vegetation(mat_data, mesh_path, mesh_data.asset_name, cached_instance)
-                    elif mat_data.Shader == "Glass":
-                        material_instance = create_material_instance_glass(mat_data, mesh_path, mesh_data.asset_name, cached_instance)
-                        has_transparency = True
-                    else:
+                    params = build_material_params(mat_data, textures)
+                    if params is None:
                         unreal.log_warning(f"Material {mat_data.name} is not Illum/Vege, skipping.")
                         continue
+                    if mat_data.Shader == "Glass":
+                        has_transparency = True
+                    if shared_instances:
+                        material_instance = shared_instances.get_or_create(mat_data.name, params, textures, dirty_assets)
+                    elif batch:
+                        material_instance = update_material_instance(
+                            mesh_path, f"mtl_{name}_{mat_data.name}", params, dirty_assets, textures)
+                    else:
+                        material_instance = create_material_instance_from_params(
+                            mat_data, params, mesh_path, mesh_data.asset_name, cached_instance, textures)
                     if material_instance:
+                        slot_index = static_mesh.get_material_index(mat_slot.material_slot_name)
+                        if batch and static_mesh.get_material(slot_index) == material_instance:
+                            continue
                         mat_slot.material_interface = material_instance
-                        static_mesh.set_material(static_mesh.get_material_index(mat_slot.material_slot_name), material_instance)
+                        static_mesh.set_material(slot_index, material_instance)
                         cached_instance.append(material_instance)
+                        mesh_changed = True
             else:
-                unreal.log_warning(f"Material file not found: {target_mat}")
-        if has_transparency:
-            sm_edit_sub = unreal.get_editor_subsystem(unreal.StaticMeshEditorSubsystem)
-            nanite_setting = sm_edit_sub.get_nanite_settings(static_mesh)
-            nanite_setting.set_editor_property('enabled', False)
-            sm_edit_sub.set_nanite_settings(static_mesh, nanite_setting, True)
-        unreal.EditorAssetLibrary.save_loaded_asset(static_mesh)
+                unreal.log_warning(f"Material file not found: {mtl_file_name}.mtl")
+        if has_transparency and disable_nanite(static_mesh):
+            mesh_changed = True
+        if not batch:
+            unreal.EditorAssetLibrary.save_loaded_asset(static_mesh)
+        elif mesh_changed:
+            dirty_assets.append(static_mesh)
     
 
-def create_and_assign_mat_to_selected_meshes():
+def create_and_assign_mat_to_meshes(asset_datas, chunk_size=DEFAULT_MATERIAL_CHUNK_SIZE, share_instances=False):
+    """
+    Batch material assignment: instances and meshes are only modified when their parameters or slots
+    changed, and the modified packages are saved together every chunk_size meshes.
+    """
+    import unreal
+    material_index = MaterialIndex()
+    textures = TextureResolver()
+    shared_instances = SharedMaterialInstances() if share_instances else None
+    dirty_assets = []
+    saved_count = 0
+    with unreal.ScopedSlowTask(len(asset_datas), "Importing Materials..") as slow_task:
+        slow_task.make_dialog(True)
+        for index, asset_data in enumerate(asset_datas):
+            if slow_task.should_cancel():
+                break
+            slow_task.enter_progress_frame(1, "Importing Materials For {}".format(asset_data.asset_name))
+            create_and_assign_mat_to_mesh(asset_data, material_index, shared_instances, textures, dirty_assets)
+            if (index + 1) % chunk_size == 0:
+                saved_count += save_dirty_assets(dirty_assets)
+                textures.clear()
+    # whatever was modified before a cancel is saved as well
+    saved_count += save_dirty_assets(dirty_assets)
+    unreal.log(f"Material assignment: {len(asset_datas)} meshes, {saved_count} packages saved")
+    return saved_count
+
+
+def create_and_assign_mat_to_selected_meshes(share_instances=False, batch=False, chunk_size=DEFAULT_MATERIAL_CHUNK_SIZE):
     import unreal
     editor_util_lib = unreal.EditorUtilityLibrary
     selected_assets = editor_util_lib.get_selected_asset_data()
+    if batch:
+        return create_and_assign_mat_to_meshes(selected_assets, chunk_size, share_instances)
     
+    # .mtl and texture lookups of one mesh are reused by the next ones
+    material_index = MaterialIndex()
+    textures = TextureResolver()
+    shared_instances = SharedMaterialInstances() if share_instances else None
     with unreal.ScopedSlowTask(len(selected_assets), "Importing Materials..") as slow_task:
         # display the dialog
         slow_task.make_dialog(True)
@@ -640,7 +1080,7 @@ def create_and_assign_mat_to_selected_meshes():
             if slow_task.should_cancel():
                 break
             slow_task.enter_progress_frame(1, "Importing Materials For {}".format(selected_asset.asset_name))
-            create_and_assign_mat_to_mesh(selected_asset)
+            create_and_assign_mat_to_mesh(selected_asset, material_index, shared_instances, textures)
 
 
 if __name__ == "__main__":
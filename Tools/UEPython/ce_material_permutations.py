@@ -0,0 +1,108 @@
+import json
+import os
+from collections import Counter, defaultdict
+import ce_catalog
+import ce_material_convertor
+
+# Static switch permutations kept per parent material by write_permutation_budget
+DEFAULT_MAX_PERMUTATIONS = 8
+
+
+class NoTextureResolver:
+    """
+    Texture lookups for switch analysis: the switches of a MaterialParams do not depend on its textures.
+    """
+    def find_texture(self, mat_data, texture_name, is_gloss=False):
+        return None
+
+    def has_alpha_channel(self, texture_path):
+        return False
+
+
+def collect_switch_permutations(mtl_root, catalog=None):
+    """
+    Walks every .mtl under mtl_root and returns parent material -> Counter of the static switch
+    permutations (see ce_material_convertor.get_permutation_key) its materials turn on.
+    The permutation budget is not applied, these are the permutations the .mtl files ask for.
+    catalog is an optional ce_catalog.DatasetCatalog listing the .mtl files instead of os.walk.
+    """
+    textures = NoTextureResolver()
+    permutations = defaultdict(Counter)
+    for root, files in ce_catalog.walk_files(mtl_root, catalog, 'mtl'):
+        for file in files:
+            if not file.lower().endswith('.mtl'):
+                continue
+            for material in ce_material_convertor.parse_mtl_file_cached(os.path.join(root, file)):
+                builder = ce_material_convertor.MATERIAL_PARAM_BUILDERS.get(material.Shader)
+                if not builder:
+                    continue
+                params = builder(material, textures)
+                permutations[params.parent][ce_material_convertor.get_permutation_key(params.switches)] += 1
+    return permutations
+
+
+def find_nearest_permutation(permutation, kept):
+    """
+    Kept permutation a rare one folds into. Kept supersets come first, as they keep every feature of the
+    material, with the fewest extra switches; otherwise the one differing by the fewest switches.
+    Ties go to the most used one. kept is a Counter of permutation key -> usage.
+    """
+    switches = set(permutation.split('%')) - {''}
+
+    def distance(candidate):
+        candidate_switches = set(candidate.split('%')) - {''}
+        return (not switches <= candidate_switches, len(switches ^ candidate_switches), -kept[candidate], candidate)
+    return min(kept, key=distance)
+
+
+def plan_permutation_budget(permutations, max_permutations=DEFAULT_MAX_PERMUTATIONS):
+    """
+    Keeps the max_permutations most used permutations of each parent and returns
+    parent -> {folded permutation: kept permutation} for the others.
+    """
+    budget = {}
+    for parent, counts in permutations.items():
+        ranked = sorted(counts, key=lambda key: (-counts[key], key))
+        kept = Counter({key: counts[key] for key in ranked[:max_permutations]})
+        folded = {key: find_nearest_permutation(key, kept) for key in ranked[max_permutations:]}
+        if folded:
+            budget[parent] = folded
+    return budget
+
+
+def print_permutation_report(permutations, budget=None):
+    budget = budget or {}
+    for parent, counts in sorted(permutations.items()):
+        total = sum(counts.values())
+        folded = budget.get(parent, {})
+        print(f"{parent}: {len(counts)} permutations, {len(counts) - len(folded)} kept, {total} materials")
+        for key, count in counts.most_common():
+            line = f"  {count:6d} {count * 100.0 / total:5.1f}% {key or '(none)'}"
+            if key in folded:
+                line += f" -> {folded[key] or '(none)'}"
+            print(line)
+
+
+def write_permutation_budget(mtl_root, max_permutations=DEFAULT_MAX_PERMUTATIONS,
+                             budget_path=ce_material_convertor.PERMUTATION_BUDGET_MAP, catalog=None):
+    """
+    Analyzes the .mtl corpus and writes the budget applied by ce_material_convertor.build_material_params.
+    Folding into a superset turns switches on whose parameters stay at the parent's defaults, so the parent
+    material defaults should be neutral. Delete budget_path to go back to one permutation per combination.
+    """
+    permutations = collect_switch_permutations(mtl_root, catalog)
+    budget = plan_permutation_budget(permutations, max_permutations)
+    print_permutation_report(permutations, budget)
+    os.makedirs(os.path.dirname(os.path.abspath(budget_path)), exist_ok=True)
+    with open(budget_path, 'w', encoding='utf-8') as file:
+        json.dump({'max_permutations': max_permutations, 'parents': budget}, file, indent=1, sort_keys=True)
+    folded_count = sum(permutations[parent][key] for parent, folded in budget.items() for key in folded)
+    print(f"Permutation budget: {sum(len(folded) for folded in budget.values())} permutations folded, "
+          f"{folded_count} materials affected, written to {budget_path}")
+    return budget
+
+
+if __name__ == "__main__":
+    import ce_path_utils
+    print_permutation_report(collect_switch_permutations(ce_path_utils.CRY_ENGINE_OUTPUT_FOLDER_ROOT))
+    # write_permutation_budget(ce_path_utils.CRY_ENGINE_OUTPUT_FOLDER_ROOT)
@@ -0,0 +1,319 @@
+import json
+import os
+import struct
+import zlib
+from itertools import repeat
+import ce_dedup
+import ce_fbx_utils
+import ce_material_convertor
+import ce_mesh_convertor
+import ce_process_utils
+
+SCRIPT_DIR = os.path.dirname(os.path.abspath(__file__))
+# Plan written by build_material_plan and the copy of the last applied one, diffed by apply_material_plan
+MATERIAL_PLAN = os.path.join(SCRIPT_DIR, "build_manifests/material_plan.json")
+APPLIED_MATERIAL_PLAN = os.path.join(SCRIPT_DIR, "build_manifests/material_plan_applied.json")
+MATERIAL_PLAN_VERSION = 1
+# Meshes sent to a worker at once, they share its .mtl and texture lookups
+PLAN_CHUNK_SIZE = 32
+
+TGA_HEADER_SIZE = 18
+PNG_SIGNATURE = b'\x89PNG\r\n\x1a\n'
+
+
+def tga_has_alpha(data):
+    id_length, color_map_type, image_type = data[0], data[1], data[2]
+    color_map_length, color_map_depth = struct.unpack_from('<HB', data, 5)
+    bits_per_pixel, descriptor = data[16], data[17]
+    if bits_per_pixel != 32 and not descriptor & 0x0F:
+        return False
+    if image_type != 2 or bits_per_pixel != 32:
+        # run length encoded or 16 bit, trust the header
+        return True
+    offset = TGA_HEADER_SIZE + id_length + (color_map_length * ((color_map_depth + 7) // 8) if color_map_type else 0)
+    return bool(data[offset + 3::4].strip(b'\xff'))
+
+
+def png_has_alpha(data):
+    width, height, bit_depth, color_type = struct.unpack_from('>IIBB', data, 16)
+    if color_type not in (4, 6):
+        return False
+    if bit_depth != 8:
+        return True
+    idat = bytearray()
+    offset = len(PNG_SIGNATURE)
+    while offset < len(data):
+        length, chunk_type = struct.unpack_from('>I4s', data, offset)
+        if chunk_type == b'IDAT':
+            idat += data[offset + 8:offset + 8 + length]
+        offset += length + 12
+    rows = zlib.decompress(bytes(idat))
+    channels = 4 if color_type == 6 else 2
+    stride = width * channels + 1
+    if any(rows[row * stride] for row in range(height)):
+        # filtered rows need unfiltering, trust the color type
+        return True
+    for row in range(height):
+        row_data = rows[row * stride + 1:(row + 1) * stride]
+        if row_data[channels - 1::channels].strip(b'\xff'):
+            return True
+    return False
+
+
+def image_has_alpha(image_path):
+    """
+    Whether a converted texture has a non opaque alpha channel, the offline counterpart of the
+    HasAlphaChannel asset tag UE sets on import.
+    """
+    with open(image_path, 'rb') as file:
+        data = file.read()
+    if data.startswith(PNG_SIGNATURE):
+        return png_has_alpha(data)
+    return tga_has_alpha(data)
+
+
+class FileTextureResolver:
+    """
+    Offline stand-in for ce_material_convertor.TextureResolver: a texture package exists when its converted
+    image is in texture_dir (see ce_texture_convertor.get_texture_package_name) and its alpha channel is read
+    from that image.
+    """
+    def __init__(self, texture_dir, output_format='tga'):
+        self.texture_dir = texture_dir
+        self.output_format = output_format
+        self.exists = {}
+        self.alpha_channels = {}
+
+    def __repr__(self):
+        return f"FileTextureResolver(texture_dir={self.texture_dir}, textures={len(self.exists)})"
+
+    def get_image_path(self, texture_path):
+        relative_path = texture_path.replace('/Game/Old/', '', 1)
+        return os.path.join(self.texture_dir, relative_path.replace('/', os.sep) + '.' + self.output_format)
+
+    def find_texture(self, mat_data, texture_name, is_gloss=False):
+        texture_path = ce_material_convertor.get_texture_package_name(mat_data, texture_name, is_gloss)
+        if not texture_path:
+            return None
+        if texture_path not in self.exists:
+            self.exists[texture_path] = os.path.exists(self.get_image_path(texture_path))
+        return texture_path if self.exists[texture_path] else None
+
+    def has_alpha_channel(self, texture_path):
+        if texture_path not in self.alpha_channels:
+            self.alpha_channels[texture_path] = image_has_alpha(self.get_image_path(texture_path))
+        return self.alpha_channels[texture_path]
+
+
+# Lookups of a planner worker process, kept across the meshes it is sent
+_planner_state = None
+
+
+def get_planner_state(texture_dir, output_format):
+    global _planner_state
+    if _planner_state is None or _planner_state[0] != (texture_dir, output_format):
+        _planner_state = ((texture_dir, output_format), ce_material_convertor.MaterialIndex(),
+                          FileTextureResolver(texture_dir, output_format))
+    return _planner_state[1], _planner_state[2]
+
+
+def plan_mesh(mesh_path, texture_dir, output_format='tga'):
+    """
+    Plan entry of one mesh list entry, the offline counterpart of create_and_assign_mat_to_mesh.
+    Returns (package name, entry, MaterialParams dict by key), entry holding slot name -> material name
+    and params key, whether a slot is translucent and the problems found.
+    """
+    material_index, textures = get_planner_state(texture_dir, output_format)
+    package_name = f"/Game/Old/{os.path.splitext(mesh_path)[0]}"
+    fbx_path = ce_mesh_convertor.get_source_mesh_paths(mesh_path)[2]
+    entry = {'slots': {}, 'transparent': False, 'warnings': []}
+    materials = {}
+    try:
+        slot_names = ce_fbx_utils.get_material_names(ce_fbx_utils.read_fbx(fbx_path))
+    except (ce_fbx_utils.FbxFormatError, OSError) as e:
+        entry['warnings'].append(f"Cannot read {fbx_path}: {e}")
+        return package_name, entry, materials
+
+    source_folder = os.path.dirname(fbx_path)
+    for slot_name in slot_names:
+        parts = ce_material_convertor.split_material_slot_name(slot_name)
+        if not parts:
+            entry['warnings'].append(f"Material slot name {slot_name} does not match expected format")
+            continue
+        mtl_file_name, mat_name = parts
+        mtl_path = material_index.find_mtl_file(source_folder, mtl_file_name)
+        if not mtl_path:
+            entry['warnings'].append(f"Material file not found: {mtl_file_name}.mtl")
+            continue
+        mat_data = material_index.find_material(mtl_path, mat_name)
+        if not mat_data:
+            entry['warnings'].append(f"Material {mat_name} not found in {mtl_path}")
+            continue
+        params = ce_material_convertor.build_material_params(mat_data, textures)
+        if params is None:
+            entry['warnings'].append(f"Material {mat_data.name} is not Illum/Vege")
+            continue
+        key = params.key()
+        materials[key] = params.to_dict()
+        entry['slots'][slot_name] = {'material': mat_data.name, 'key': key}
+        if mat_data.Shader == "Glass":
+            entry['transparent'] = True
+    return package_name, entry, materials
+
+
+def build_material_plan(file_path, texture_dir, plan_path=MATERIAL_PLAN, output_format='tga', max_workers=None,
+                        alias_map_path=ce_dedup.MESH_ALIAS_MAP):
+    """
+    Resolves the material of every slot of the listed meshes without the editor, in worker processes,
+    and writes the plan: mesh package name -> slots, and params key -> MaterialParams.
+    texture_dir is the folder the textures were converted in, existing images stand for imported textures.
+    Duplicate meshes in the alias map are left out, like in ce_mesh_convertor.import_meshes_to_unreal.
+    """
+    alias_table = ce_dedup.AliasTable(alias_map_path) if alias_map_path else None
+    mesh_paths = [mesh_path for mesh_path in ce_mesh_convertor.read_mesh_list(file_path)
+                  if not (alias_table and alias_table.resolve(mesh_path))]
+    plan = {'version': MATERIAL_PLAN_VERSION, 'materials': {}, 'meshes': {}}
+    warning_count = 0
+    with ce_process_utils.create_process_pool(max_workers) as executor:
+        for package_name, entry, materials in executor.map(plan_mesh, mesh_paths, repeat(texture_dir),
+                                                           repeat(output_format), chunksize=PLAN_CHUNK_SIZE):
+            plan['meshes'][package_name] = entry
+            plan['materials'].update(materials)
+            warning_count += len(entry['warnings'])
+    os.makedirs(os.path.dirname(os.path.abspath(plan_path)), exist_ok=True)
+    with open(plan_path, 'w', encoding='utf-8') as file:
+        json.dump(plan, file, indent=1, sort_keys=True)
+    slot_count = sum(len(entry['slots']) for entry in plan['meshes'].values())
+    print(f"Material plan: {len(plan['meshes'])} meshes, {slot_count} slots, {len(plan['materials'])} unique "
+          f"parameter sets, {warning_count} warnings written to {plan_path}")
+    return plan
+
+
+def load_material_plan(plan_path=MATERIAL_PLAN):
+    if not plan_path or not os.path.exists(plan_path):
+        return None
+    with open(plan_path, 'r', encoding='utf-8') as file:
+        plan = json.load(file)
+    return plan if plan.get('version') == MATERIAL_PLAN_VERSION else None
+
+
+def get_plan_entry_state(entry):
+    return (entry['slots'], entry['transparent']) if entry else None
+
+
+def diff_material_plans(old_plan, new_plan):
+    """
+    Returns (changed, removed) mesh package names of new_plan against old_plan. Params keys hash the
+    parameters, so comparing the mesh entries also catches changed materials.
+    """
+    old_meshes = old_plan['meshes'] if old_plan else {}
+    new_meshes = new_plan['meshes']
+    changed = sorted(package_name for package_name, entry in new_meshes.items()
+                     if get_plan_entry_state(old_meshes.get(package_name)) != get_plan_entry_state(entry))
+    removed = sorted(set(old_meshes) - set(new_meshes))
+    return changed, removed
+
+
+def print_material_plan_diff(old_plan_path=APPLIED_MATERIAL_PLAN, new_plan_path=MATERIAL_PLAN):
+    changed, removed = diff_material_plans(load_material_plan(old_plan_path), load_material_plan(new_plan_path))
+    for package_name in changed:
+        print(f"  CHANGED {package_name}")
+    for package_name in removed:
+        print(f"  REMOVED {package_name}")
+    print(f"Material plan diff: {len(changed)} changed, {len(removed)} removed")
+    return changed, removed
+
+
+def apply_mesh_plan(package_name, entry, materials, textures, shared_instances, dirty_assets):
+    """
+    Creates or updates the instances of a mesh's planned slots and assigns them, appending what changed
+    to dirty_assets. Returns False if the mesh is not imported or any planned slot could not be applied,
+    so the mesh is retried by the next apply.
+    """
+    import unreal
+    if not unreal.EditorAssetLibrary.does_asset_exist(package_name):
+        unreal.log_warning(f"Mesh not imported, material plan skipped: {package_name}")
+        return False
+    static_mesh = unreal.EditorAssetLibrary.load_asset(package_name)
+    mesh_path, mesh_name = package_name.rsplit('/', 1)
+    mesh_changed = False
+    failed_count = 0
+    for slot_name, slot in entry['slots'].items():
+        slot_index = static_mesh.get_material_index(slot_name)
+        if slot_index < 0:
+            unreal.log_warning(f"Material slot {slot_name} not found on {package_name}")
+            failed_count += 1
+            continue
+        params = materials[slot['key']]
+        if shared_instances:
+            material_instance = shared_instances.get_or_create(slot['material'], params, textures, dirty_assets)
+        else:
+            material_instance = ce_material_convertor.update_material_instance(
+                mesh_path, f"mtl_{mesh_name}_{slot['material']}", params, dirty_assets, textures)
+        if not material_instance:
+            failed_count += 1
+        elif static_mesh.get_material(slot_index) != material_instance:
+            static_mesh.set_material(slot_index, material_instance)
+            mesh_changed = True
+    if entry['transparent'] and ce_material_convertor.disable_nanite(static_mesh):
+        mesh_changed = True
+    if mesh_changed:
+        dirty_assets.append(static_mesh)
+    if failed_count:
+        unreal.log_warning(f"{failed_count} of {len(entry['slots'])} planned slots not applied on {package_name}")
+    return failed_count == 0
+
+
+def apply_material_plan(plan_path=MATERIAL_PLAN, applied_plan_path=APPLIED_MATERIAL_PLAN, share_instances=False,
+                        chunk_size=ce_material_convertor.DEFAULT_MATERIAL_CHUNK_SIZE, force=False):
+    """
+    Editor side of the plan: only the meshes whose entry differs from the last applied plan are loaded,
+    unless force is set (e.g. after reimporting meshes). Changed packages are saved every chunk_size meshes
+    and the applied entries are recorded in applied_plan_path for the next diff.
+    """
+    import unreal
+    plan = load_material_plan(plan_path)
+    if not plan:
+        unreal.log_error(f"No material plan at {plan_path}, run build_material_plan first")
+        return 0
+    applied_plan = None if force else load_material_plan(applied_plan_path)
+    changed, _ = diff_material_plans(applied_plan, plan)
+    applied_meshes = dict(applied_plan['meshes']) if applied_plan else {}
+
+    materials = {key: ce_material_convertor.MaterialParams.from_dict(data) for key, data in plan['materials'].items()}
+    textures = ce_material_convertor.TextureResolver()
+    shared_instances = ce_material_convertor.SharedMaterialInstances() if share_instances else None
+    dirty_assets = []
+    saved_count = 0
+    failed_count = 0
+    with unreal.ScopedSlowTask(len(changed), "Applying Material Plan..") as slow_task:
+        slow_task.make_dialog(True)
+        for index, package_name in enumerate(changed):
+            if slow_task.should_cancel():
+                break
+            slow_task.enter_progress_frame(1, "Applying Materials For {}".format(package_name))
+            entry = plan['meshes'][package_name]
+            if apply_mesh_plan(package_name, entry, materials, textures, shared_instances, dirty_assets):
+                applied_meshes[package_name] = entry
+            else:
+                # only fully applied meshes are recorded, the others are retried by the next apply
+                applied_meshes.pop(package_name, None)
+                failed_count += 1
+            if (index + 1) % chunk_size == 0:
+                saved_count += ce_material_convertor.save_dirty_assets(dirty_assets)
+                textures.clear()
+    saved_count += ce_material_convertor.save_dirty_assets(dirty_assets)
+
+    with open(applied_plan_path, 'w', encoding='utf-8') as file:
+        json.dump({'version': MATERIAL_PLAN_VERSION, 'meshes': applied_meshes}, file, indent=1, sort_keys=True)
+    unreal.log(f"Material plan: {len(plan['meshes']) - len(changed)} meshes unchanged, {len(changed)} applied, "
+               f"{failed_count} incomplete, {saved_count} packages saved")
+    return saved_count
+
+
+if __name__ == "__main__":
+    # outside the editor
+    # build_material_plan(os.path.join(SCRIPT_DIR, "convert_mesh_list.txt"), "D:/temp/rataja_textures")
+    # print_material_plan_diff()
+    # in the editor
+    apply_material_plan()
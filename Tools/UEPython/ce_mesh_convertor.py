@@ -1,5 +1,10 @@
+import hashlib
+import json
 import os
-import subprocess
+import ce_build_manifest
+import ce_dedup
+import ce_mesh_policy
+import ce_process_utils
 
 CRY_ENGINE_OUTPUT_FOLDER_ROOT = "D:/temp/rataja"
 LEVEL_ROOT_FOLDER = "data/levels"  # Removed leading slash for consistency
@@ -9,54 +14,240 @@ PREFAB_ROOT_FOLDER = 'prefabs'
 
 LEVEL_NAME = "rataje"
 
-def convert_meshes_from_list(file_path):
+SCRIPT_DIR = os.path.dirname(os.path.abspath(__file__))
+# Can be an exe, a .py stand-in script or a full command prefix list
+CGF_CONVERTER_EXE = os.path.join(SCRIPT_DIR, "../cgf-converter.exe")
+MESH_CONVERT_LOG_DIR = os.path.join(SCRIPT_DIR, "logs/mesh_convert")
+# Records cgf -> dae conversion and fbx -> package import so unchanged meshes are skipped
+MESH_BUILD_MANIFEST = os.path.join(SCRIPT_DIR, "build_manifests/mesh_build_manifest.json")
+
+# Metadata tag holding the build policy applied by apply_mesh_build_policy. It is exposed to the asset
+# registry through MetaDataTagsForAssetRegistry in Config/DefaultGame.ini, so meshes already at the
+# target policy are skipped without being loaded.
+MESH_BUILD_POLICY_TAG = "CEBuildPolicy"
+MESH_BUILD_SAVE_BATCH_SIZE = 200
+
+
+def read_mesh_list(file_path):
+    with open(file_path, 'r') as file:
+        return [line.strip() for line in file if line.strip()]
+
+
+def get_source_mesh_paths(mesh_path):
+    """
+    Returns the (cgf, dae, fbx) file paths of a mesh list entry.
+    """
+    base_path = os.path.join(CRY_ENGINE_OUTPUT_FOLDER_ROOT, os.path.splitext(mesh_path)[0].replace("/", os.sep))
+    return base_path + ".cgf", base_path + ".dae", base_path + ".fbx"
+
+
+def convert_meshes_from_list(file_path, max_workers=None, converter_exe=None, log_dir=None,
+                             manifest_path=MESH_BUILD_MANIFEST, force=False):
     """
     Reads a list of mesh paths from a file and converts each using the cgf-converter tool.
+    Conversions run in parallel over max_workers processes (1 for the old serial behavior),
+    each one logging its output to <log_dir>/<mesh path>.log.
+    Meshes whose .cgf and produced .dae are unchanged since the last run are skipped
+    unless force is set; pass manifest_path=None to disable the check.
     """
-    script_dir = os.path.dirname(os.path.abspath(__file__))
-    converter_exe = os.path.join(script_dir, "../cgf-converter.exe")
-    with open(file_path, 'r') as file:
-        for line in file:
-            mesh_path = line.strip()
-            if not mesh_path:
-                continue
-            full_mesh_path = os.path.join(CRY_ENGINE_OUTPUT_FOLDER_ROOT, mesh_path.replace("/", os.sep))
-            command = [converter_exe, full_mesh_path, "-dae", "-group"]
-            try:
-                print(f"Executing: {' '.join(command)}")
-                subprocess.run(command, check=True)
-            except subprocess.CalledProcessError as e:
-                print(f"Error converting {mesh_path}: {e}")
+    converter_command = ce_process_utils.resolve_tool_command(converter_exe or CGF_CONVERTER_EXE)
+    log_dir = log_dir or MESH_CONVERT_LOG_DIR
+    manifest = ce_build_manifest.BuildManifest(manifest_path) if manifest_path else None
+    jobs = []
+    skipped_count = 0
+    for mesh_path in read_mesh_list(file_path):
+        full_mesh_path = os.path.join(CRY_ENGINE_OUTPUT_FOLDER_ROOT, mesh_path.replace("/", os.sep))
+        _, dae_path, _ = get_source_mesh_paths(mesh_path)
+        if manifest and not force and manifest.is_up_to_date("convert", mesh_path, [full_mesh_path], [dae_path]):
+            skipped_count += 1
+            continue
+        command = converter_command + [full_mesh_path, "-dae", "-group"]
+        log_path = os.path.join(log_dir, mesh_path.replace("/", os.sep) + ".log")
+        jobs.append(ce_process_utils.Job(mesh_path, [command], log_path))
+    print(f"Mesh conversion: {skipped_count} up to date, {len(jobs)} to convert")
+
+    def on_result(result):
+        status = "Converted" if result.success else "Error converting"
+        print(f"{status} {result.name} ({result.elapsed:.1f}s)")
+        if manifest:
+            full_mesh_path = os.path.join(CRY_ENGINE_OUTPUT_FOLDER_ROOT, result.name.replace("/", os.sep))
+            if result.success:
+                _, dae_path, _ = get_source_mesh_paths(result.name)
+                manifest.record("convert", result.name, [full_mesh_path], [dae_path])
+            else:
+                manifest.remove("convert", result.name)
+
+    try:
+        results = ce_process_utils.run_jobs_parallel(jobs, max_workers, on_result)
+    finally:
+        if manifest:
+            manifest.save()
+    ce_process_utils.print_job_report(results, "Mesh conversion", os.path.join(log_dir, "report.txt"))
+    return results
+
+
+def dedup_converted_meshes(file_path, max_workers=None, manifest_path=MESH_BUILD_MANIFEST,
+                           alias_map_path=ce_dedup.MESH_ALIAS_MAP):
+    """
+    Hashes the geometry of every converted .fbx in the list over max_workers processes and writes the
+    duplicate -> canonical alias map, so each unique mesh is imported once and every duplicate path
+    resolves to it. Hashes are kept in the build manifest and only recomputed for changed files.
+    """
+    manifest = ce_build_manifest.BuildManifest(manifest_path) if manifest_path else None
+    dedup_keys = {}
+    pending = []
+    for mesh_path in read_mesh_list(file_path):
+        _, _, fbx_path = get_source_mesh_paths(mesh_path)
+        if not os.path.exists(fbx_path):
+            continue
+        record = manifest.get_record("dedup", mesh_path) if manifest else None
+        if record and manifest.is_up_to_date("dedup", mesh_path, list(record['inputs'])):
+            dedup_keys[mesh_path] = record['dedup_key']
+        else:
+            pending.append((mesh_path, fbx_path))
+    print(f"Mesh dedup: {len(dedup_keys)} hashes up to date, {len(pending)} to compute")
+
+    if pending:
+        with ce_process_utils.create_process_pool(max_workers) as executor:
+            fbx_paths = [fbx_path for _, fbx_path in pending]
+            for (mesh_path, fbx_path), (dedup_key, mtl_paths) in zip(
+                    pending, executor.map(ce_dedup.compute_mesh_dedup_key, fbx_paths, chunksize=32)):
+                dedup_keys[mesh_path] = dedup_key
+                if manifest and dedup_key:
+                    manifest.record("dedup", mesh_path, [fbx_path] + mtl_paths, dedup_key=dedup_key)
+        if manifest:
+            manifest.save()
 
+    aliases, unique_count = ce_dedup.group_duplicates(dedup_keys)
+    alias_table = ce_dedup.AliasTable()
+    for duplicate, canonical in aliases:
+        alias_table.add(duplicate, canonical)
+    alias_table.save(alias_map_path)
+    print(f"Mesh dedup: {unique_count} unique meshes, {len(aliases)} duplicates written to {alias_map_path}")
+    return alias_table
 
 
+def get_mesh_policy(manifest, mesh_path, fbx_path):
+    """
+    Returns the ce_mesh_policy policy name of a converted mesh, from the manifest if its .fbx and .mtl
+    files are unchanged, otherwise by scanning them.
+    """
+    record = manifest.get_record("policy", mesh_path) if manifest else None
+    if record and manifest.is_up_to_date("policy", mesh_path, list(record['inputs'])):
+        return record['policy']
+    policy_name, mtl_paths = ce_mesh_policy.classify_fbx(fbx_path)
+    if manifest:
+        manifest.record("policy", mesh_path, [fbx_path] + mtl_paths, policy=policy_name)
+    return policy_name
+
+
+def classify_converted_meshes(file_path, max_workers=None, manifest_path=MESH_BUILD_MANIFEST):
+    """
+    Scans the converted .fbx/.mtl of every listed mesh over max_workers processes and stores each mesh's
+    import policy in the build manifest, so import_meshes_to_unreal does not have to scan them in the editor.
+    """
+    manifest = ce_build_manifest.BuildManifest(manifest_path)
+    pending = []
+    for mesh_path in read_mesh_list(file_path):
+        mesh_path = mesh_path.replace(".cgf", ".fbx")
+        _, _, fbx_path = get_source_mesh_paths(mesh_path)
+        if not os.path.exists(fbx_path):
+            continue
+        record = manifest.get_record("policy", mesh_path)
+        if not record or not manifest.is_up_to_date("policy", mesh_path, list(record['inputs'])):
+            pending.append((mesh_path, fbx_path))
 
-def import_meshes_to_unreal(file_path):
+    policy_counts = {}
+    if pending:
+        with ce_process_utils.create_process_pool(max_workers) as executor:
+            fbx_paths = [fbx_path for _, fbx_path in pending]
+            for (mesh_path, fbx_path), (policy_name, mtl_paths) in zip(
+                    pending, executor.map(ce_mesh_policy.classify_fbx, fbx_paths, chunksize=32)):
+                manifest.record("policy", mesh_path, [fbx_path] + mtl_paths, policy=policy_name)
+                policy_counts[policy_name] = policy_counts.get(policy_name, 0) + 1
+        manifest.save()
+    print(f"Mesh policies: {len(pending)} meshes classified {policy_counts}")
+
+
+def import_meshes_to_unreal(file_path, manifest_path=MESH_BUILD_MANIFEST, force=False, chunk_size=None,
+                            alias_map_path=ce_dedup.MESH_ALIAS_MAP):
+    """
+    Imports the .fbx of every listed mesh to /Game/Old/<mesh path>, chunk_size meshes per save.
+    Meshes whose .fbx is unchanged since their last import, and whose package still exists,
+    are skipped unless force is set; pass manifest_path=None to disable the check.
+    Duplicates listed in the alias map (see dedup_converted_meshes) are not imported.
+    Nanite, collision and lightmap UV settings come from each mesh's ce_mesh_policy class
+    (see classify_converted_meshes), with one set of import options per class.
+    """
     import unreal
     import asset_import_utils
     
     import importlib
     importlib.reload(asset_import_utils)
     
-    with open(file_path, 'r') as file:
-        tasks = []
-        for line in file:
-            mesh_path = line.strip()
-            if not mesh_path:
+    manifest = ce_build_manifest.BuildManifest(manifest_path) if manifest_path else None
+    existing_packages = asset_import_utils.list_existing_packages() if manifest and not force else set()
+    alias_table = ce_dedup.AliasTable(alias_map_path) if alias_map_path else None
+    import_entries = {}
+    skipped_count = 0
+    duplicate_count = 0
+    for mesh_path in read_mesh_list(file_path):
+        if alias_table and alias_table.resolve(mesh_path):
+            duplicate_count += 1
+            continue
+        mesh_path = mesh_path.replace(".cgf", ".fbx")
+        fbx_path = os.path.join(CRY_ENGINE_OUTPUT_FOLDER_ROOT, mesh_path.replace("/", os.sep))
+        
+        package_name = f"/Game/Old/{mesh_path.replace('.fbx', '')}"
+        if os.path.exists(fbx_path):
+            policy_name = get_mesh_policy(manifest, mesh_path, fbx_path)
+            if (package_name in existing_packages and
+                    (manifest.get_record("import", mesh_path) or {}).get('policy') == policy_name and
+                    manifest.is_up_to_date("import", mesh_path, [fbx_path])):
+                skipped_count += 1
                 continue
-            mesh_path = mesh_path.replace(".cgf", ".fbx")
-            fbx_path = os.path.join(CRY_ENGINE_OUTPUT_FOLDER_ROOT, mesh_path.replace("/", os.sep))
-            
-            package_name = f"/Game/Old/{mesh_path.replace('.fbx', '')}"
+            import_entries[fbx_path] = (mesh_path, package_name, policy_name)
+        else:
+            unreal.log_error("File not found: {}".format(fbx_path))
+    unreal.log("Mesh import: {} up to date, {} duplicates, {} to import".format(
+        skipped_count, duplicate_count, len(import_entries)))
+
+    def build_tasks():
+        for fbx_path, (mesh_path, package_name, policy_name) in import_entries.items():
             package_path = package_name[:package_name.rfind("/")]
             name = package_name.split("/")[-1]
-            if os.path.exists(fbx_path):
-                option = asset_import_utils.build_staticmesh_import_options()
-                task = asset_import_utils.build_input_task_simple(fbx_path, package_path, name, option)
-                tasks.append(task)
-            else:
-                unreal.log_error("File not found: {}".format(fbx_path))
-        asset_import_utils.execute_import_tasks(tasks)
+            profile_name = ce_mesh_policy.get_policy_import_profile(policy_name)
+            yield asset_import_utils.build_import_task(fbx_path, package_path, name, profile_name)
+
+    def on_result(result):
+        mesh_path, package_name, policy_name = import_entries[result.filename]
+        post_import_ok = result.success
+        if result.success:
+            # the mesh is still loaded, its chunk is saved right after
+            for imported_path in result.imported_paths:
+                # a failing mesh must not abort the chunk before it is saved
+                try:
+                    static_mesh = unreal.load_asset(imported_path)
+                    if static_mesh is None:
+                        raise RuntimeError("asset could not be loaded")
+                    ce_mesh_policy.apply_post_import_policy(static_mesh, policy_name)
+                except Exception as e:
+                    unreal.log_error(f"Post import policy {policy_name} failed on {imported_path}: "
+                                     f"{type(e).__name__}: {e}")
+                    post_import_ok = False
+        if not manifest:
+            return
+        # a failed post import step is not recorded, the mesh is imported again next time
+        if post_import_ok:
+            manifest.record("import", mesh_path, [result.filename], package=package_name, policy=policy_name)
+        else:
+            manifest.remove("import", mesh_path)
+
+    try:
+        asset_import_utils.execute_import_tasks_chunked(build_tasks(), chunk_size, on_result)
+    finally:
+        if manifest:
+            manifest.save()
         
         
 def batch_change_mesh_build_setting():
@@ -84,10 +275,105 @@ def batch_change_mesh_build_setting():
             sm_edit_sub.set_nanite_settings(static_mesh, nanite_setting, True)
             
             unreal.EditorAssetLibrary.save_loaded_asset(static_mesh)
-        
+
+
+def find_static_meshes(package_paths=("/Game/Old",), recursive=True, tag_filter=None):
+    """
+    Returns the asset data of the static meshes under package_paths from the asset registry,
+    keeping only the ones whose registry tags match every tag -> value pair in tag_filter.
+    """
+    import unreal
+    asset_registry = unreal.AssetRegistryHelpers.get_asset_registry()
+    ar_filter = unreal.ARFilter(
+        package_paths=list(package_paths),
+        recursive_paths=recursive,
+        class_paths=[unreal.TopLevelAssetPath("/Script/Engine", "StaticMesh")])
+    asset_datas = asset_registry.get_assets(ar_filter)
+    if tag_filter:
+        asset_datas = [asset_data for asset_data in asset_datas
+                       if all(str(asset_data.get_tag_value(tag)) == str(value) for tag, value in tag_filter.items())]
+    return asset_datas
+
+
+def get_mesh_build_policy_key(nanite_enabled, lod_build_settings):
+    policy = {'nanite': nanite_enabled, 'lod0': lod_build_settings}
+    return hashlib.sha1(json.dumps(policy, sort_keys=True).encode('utf-8')).hexdigest()[:16]
+
+
+def apply_mesh_build_settings(sm_edit_sub, static_mesh, nanite_enabled, lod_build_settings):
+    """
+    Applies the LOD0 build settings and Nanite state to a loaded mesh with at most one rebuild.
+    Returns True if the mesh was changed.
+    """
+    build_setting = sm_edit_sub.get_lod_build_settings(static_mesh, 0)
+    lod_changed = False
+    for prop, value in lod_build_settings.items():
+        if build_setting.get_editor_property(prop) != value:
+            build_setting.set_editor_property(prop, value)
+            lod_changed = True
+
+    nanite_setting = sm_edit_sub.get_nanite_settings(static_mesh)
+    nanite_changed = nanite_enabled is not None and nanite_setting.get_editor_property('enabled') != nanite_enabled
+    if nanite_changed:
+        nanite_setting.set_editor_property('enabled', nanite_enabled)
+        # only rebuild here if the LOD settings below will not rebuild anyway
+        sm_edit_sub.set_nanite_settings(static_mesh, nanite_setting, not lod_changed)
+    if lod_changed:
+        sm_edit_sub.set_lod_build_settings(static_mesh, 0, build_setting)
+    return lod_changed or nanite_changed
+
+
+def apply_mesh_build_policy(package_paths=("/Game/Old",), nanite_enabled=True, lod_build_settings=None,
+                            tag_filter=None, recursive=True, save_batch_size=MESH_BUILD_SAVE_BATCH_SIZE):
+    """
+    Registry driven version of batch_change_mesh_build_setting for whole folders.
+    Meshes are found with an asset registry query (see find_static_meshes), meshes whose
+    CEBuildPolicy tag already matches the policy are skipped without loading, the others get a
+    single rebuild and are saved save_batch_size at a time.
+    lod_build_settings is a MeshBuildSettings property -> value dict for LOD0, recompute_normals by default.
+    """
+    import unreal
+    if lod_build_settings is None:
+        lod_build_settings = {'recompute_normals': True}
+    policy_key = get_mesh_build_policy_key(nanite_enabled, lod_build_settings)
+    asset_datas = find_static_meshes(package_paths, recursive, tag_filter)
+    pending_assets = [asset_data for asset_data in asset_datas
+                      if str(asset_data.get_tag_value(MESH_BUILD_POLICY_TAG)) != policy_key]
+    unreal.log("Mesh build policy {}: {} meshes, {} already up to date".format(
+        policy_key, len(asset_datas), len(asset_datas) - len(pending_assets)))
+
+    sm_edit_sub = unreal.get_editor_subsystem(unreal.StaticMeshEditorSubsystem)
+    dirty_meshes = []
+    changed_count = 0
+
+    def save_dirty_meshes():
+        if dirty_meshes:
+            unreal.EditorAssetLibrary.save_loaded_assets(dirty_meshes, True)
+            del dirty_meshes[:]
+            unreal.SystemLibrary.collect_garbage()
+
+    with unreal.ScopedSlowTask(len(pending_assets), "Apply mesh build policy..") as slow_task:
+        # display the dialog
+        slow_task.make_dialog(True)
+
+        for asset_data in pending_assets:
+            if slow_task.should_cancel():
+                break
+            slow_task.enter_progress_frame(1, "Apply mesh build policy to {}".format(asset_data.asset_name))
+
+            static_mesh = unreal.load_asset(asset_data.package_name)
+            if apply_mesh_build_settings(sm_edit_sub, static_mesh, nanite_enabled, lod_build_settings):
+                changed_count += 1
+            unreal.EditorAssetLibrary.set_metadata_tag(static_mesh, MESH_BUILD_POLICY_TAG, policy_key)
+            dirty_meshes.append(static_mesh)
+            if len(dirty_meshes) >= save_batch_size:
+                save_dirty_meshes()
+        save_dirty_meshes()
+    unreal.log("Mesh build policy {}: {} meshes rebuilt".format(policy_key, changed_count))
+
+
 if __name__ == "__main__":
-    script_dir = os.path.dirname(os.path.abspath(__file__))
-    mesh_list_file = os.path.join(script_dir, "convert_mesh_list.txt")
+    mesh_list_file = os.path.join(SCRIPT_DIR, "convert_mesh_list.txt")
     # convert_meshes_from_list(mesh_list_file)
     # import_meshes_to_unreal(mesh_list_file)
     batch_change_mesh_build_setting()
@@ -0,0 +1,145 @@
+import functools
+import os
+import ce_fbx_utils
+import ce_material_convertor
+
+# Below both limits a mesh is cheaper as a classic mesh than as Nanite
+TINY_PROP_MAX_TRIANGLES = 512
+TINY_PROP_MAX_SIZE = 50.0  # cm, largest bounds axis
+# Above this size simple collision hulls are too coarse, so the render mesh is used for collision
+LARGE_STRUCTURE_MIN_SIZE = 1500.0  # cm, largest bounds axis
+
+DEFAULT_POLICY = 'default'
+
+
+class MeshPolicy:
+    """
+    Import/build settings shared by a class of meshes.
+    collision_trace is a CollisionTraceFlag name applied to the body setup after import, or None.
+    """
+    def __init__(self, name, nanite, auto_generate_collision, generate_lightmap_uvs=False, collision_trace=None):
+        self.name = name
+        self.nanite = nanite
+        self.auto_generate_collision = auto_generate_collision
+        self.generate_lightmap_uvs = generate_lightmap_uvs
+        self.collision_trace = collision_trace
+
+    def __repr__(self):
+        return f"MeshPolicy(name={self.name}, nanite={self.nanite})"
+
+
+MESH_POLICIES = {
+    DEFAULT_POLICY: MeshPolicy(DEFAULT_POLICY, nanite=True, auto_generate_collision=True),
+    # Glass can't be Nanite, build it classic once instead of switching Nanite off after material assignment.
+    # Translucent surfaces don't receive baked lighting, so no lightmap UVs
+    'translucent': MeshPolicy('translucent', nanite=False, auto_generate_collision=True),
+    # The classic LOD classes get lightmap UVs so they can be baked, the Nanite classes rely on dynamic lighting
+    # Masked foliage is expensive as Nanite and is not collided with
+    'foliage': MeshPolicy('foliage', nanite=False, auto_generate_collision=False, generate_lightmap_uvs=True),
+    'tiny_prop': MeshPolicy('tiny_prop', nanite=False, auto_generate_collision=True, generate_lightmap_uvs=True),
+    'large_structure': MeshPolicy('large_structure', nanite=True, auto_generate_collision=False,
+                                  collision_trace='CTF_USE_COMPLEX_AS_SIMPLE'),
+}
+
+
+class MeshImportStats:
+    def __init__(self, triangle_count=0, bounds_size=(0.0, 0.0, 0.0), shaders=None):
+        self.triangle_count = triangle_count
+        self.bounds_size = bounds_size
+        self.shaders = shaders or set()
+
+    def __repr__(self):
+        return f"MeshImportStats(triangles={self.triangle_count}, bounds={self.bounds_size}, shaders={self.shaders})"
+
+
+def gather_mesh_stats(fbx_path):
+    """
+    Reads triangle count and bounds from the .fbx and the shaders of its slots from the .mtl files next to it.
+    Returns (MeshImportStats, mtl paths read), or (None, []) if the .fbx can't be read.
+    """
+    try:
+        root = ce_fbx_utils.read_fbx(fbx_path)
+    except (ce_fbx_utils.FbxFormatError, OSError) as e:
+        print(f"Can't read mesh stats from {fbx_path}: {e}")
+        return None, []
+    fbx_stats = ce_fbx_utils.get_mesh_stats(root)
+
+    folder = os.path.dirname(fbx_path)
+    parsed_mtl_files = {}
+    shaders = set()
+    for material_name in fbx_stats.material_names:
+        parts = ce_material_convertor.split_material_slot_name(material_name)
+        if not parts:
+            continue
+        mtl_file_name, mat_name = parts
+        mtl_path = os.path.join(folder, mtl_file_name + ".mtl")
+        if mtl_path not in parsed_mtl_files:
+            parsed_mtl_files[mtl_path] = ce_material_convertor.parse_mtl_file_cached(mtl_path) if os.path.exists(mtl_path) else ()
+        mat_data = ce_material_convertor.find_material_by_name(parsed_mtl_files[mtl_path], mat_name)
+        if mat_data and mat_data.Shader:
+            shaders.add(mat_data.Shader)
+    stats = MeshImportStats(fbx_stats.triangle_count, fbx_stats.get_bounds_size(), shaders)
+    return stats, [path for path in parsed_mtl_files if os.path.exists(path)]
+
+
+def classify_mesh(stats):
+    """
+    Picks the MESH_POLICIES entry for a mesh from its stats.
+    """
+    if stats is None:
+        return DEFAULT_POLICY
+    if "Glass" in stats.shaders:
+        return 'translucent'
+    if "Vegetation" in stats.shaders:
+        return 'foliage'
+    largest_size = max(stats.bounds_size)
+    if stats.triangle_count <= TINY_PROP_MAX_TRIANGLES and largest_size <= TINY_PROP_MAX_SIZE:
+        return 'tiny_prop'
+    if largest_size >= LARGE_STRUCTURE_MIN_SIZE:
+        return 'large_structure'
+    return DEFAULT_POLICY
+
+
+def classify_fbx(fbx_path):
+    """
+    Returns (policy name, mtl paths read) for a converted mesh. Picklable for process pools.
+    """
+    stats, mtl_paths = gather_mesh_stats(fbx_path)
+    return classify_mesh(stats), mtl_paths
+
+
+def get_policy_import_profile(policy_name):
+    """
+    Name of the asset_import_utils import profile of a policy, registered on first use, so its
+    FbxImportUI is built once and shared by every task of that policy.
+    """
+    import asset_import_utils
+    profile_name = f"static_mesh_{policy_name}"
+    if profile_name not in asset_import_utils.IMPORT_PROFILES:
+        policy = MESH_POLICIES[policy_name]
+        asset_import_utils.register_import_profile(profile_name, functools.partial(
+            asset_import_utils.build_staticmesh_import_options,
+            build_nanite=policy.nanite,
+            auto_generate_collision=policy.auto_generate_collision,
+            generate_lightmap_uvs=policy.generate_lightmap_uvs))
+    return profile_name
+
+
+def get_policy_import_options(policy_name):
+    import asset_import_utils
+    return asset_import_utils.get_import_options(get_policy_import_profile(policy_name))
+
+
+def apply_post_import_policy(static_mesh, policy_name):
+    """
+    Applies the settings of a policy the FBX import options can't express. Returns True if the mesh changed.
+    """
+    import unreal
+    policy = MESH_POLICIES[policy_name]
+    if not policy.collision_trace:
+        return False
+    body_setup = static_mesh.get_editor_property('body_setup')
+    if body_setup is None:
+        return False
+    body_setup.set_editor_property('collision_trace_flag', getattr(unreal.CollisionTraceFlag, policy.collision_trace))
+    return True
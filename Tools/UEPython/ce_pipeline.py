@@ -0,0 +1,337 @@
+import os
+import threading
+import time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+import ce_build_manifest
+import ce_catalog
+import ce_dedup
+import ce_material_convertor
+import ce_material_planner
+import ce_mesh_convertor
+import ce_path_utils
+import ce_texture_convertor
+import ce_texture_roles
+
+SCRIPT_DIR = os.path.dirname(os.path.abspath(__file__))
+PIPELINE_MANIFEST = os.path.join(SCRIPT_DIR, "build_manifests/pipeline_manifest.json")
+# Offline stages running at the same time; each one already spreads its own work over processes
+DEFAULT_PIPELINE_WORKERS = 2
+# Status of the editor stages, and those depending on them, in a run outside the editor
+EDITOR_PENDING = 'pending (editor)'
+
+DEFAULT_MESH_LIST = os.path.join(SCRIPT_DIR, "convert_mesh_list.txt")
+DEFAULT_TEXTURE_DIR = r"D:\GameDev\UnrealEngine-release\KCD1Re\ArtRaw"
+
+
+class PipelineConfig:
+    """
+    Files the stages work on. veg_file is optional, without it there is no vegetation stage.
+    """
+    def __init__(self, mesh_list=DEFAULT_MESH_LIST, texture_dir=DEFAULT_TEXTURE_DIR, veg_file=None,
+                 staging_mode='hardlink', use_texture_decoder=True, max_workers=None, share_instances=False,
+                 level_names=None):
+        self.mesh_list = mesh_list
+        self.texture_dir = texture_dir
+        self.veg_file = veg_file
+        self.staging_mode = staging_mode
+        self.use_texture_decoder = use_texture_decoder
+        self.max_workers = max_workers
+        self.share_instances = share_instances
+        self.level_names = level_names or [ce_path_utils.LEVEL_NAME]
+        self.level_files = [os.path.join(ce_path_utils.CRY_ENGINE_OUTPUT_FOLDER_ROOT, ce_path_utils.LEVEL_ROOT_FOLDER,
+                                         level_name, ce_path_utils.LEVEL_EDITOR_XML) for level_name in self.level_names]
+
+    def __repr__(self):
+        return f"PipelineConfig(mesh_list={self.mesh_list}, texture_dir={self.texture_dir}, veg_file={self.veg_file})"
+
+
+class Stage:
+    """
+    One step of the pipeline: function(config) runs once the stages in depends are done, and is skipped
+    while its input files are unchanged since it last succeeded and its output files exist.
+    A stage without inputs always runs, and a stage runs whenever one of its dependencies ran since it last
+    succeeded, in this run or an earlier one, so it sees the files they wrote. A function returning False
+    reports that it changed nothing ('unchanged'), which does not make its dependents run.
+    Editor stages need the unreal module and run one after another in the editor session, the others run
+    next to each other outside of it.
+    """
+    def __init__(self, name, function, depends=(), inputs=None, outputs=(), editor=False):
+        self.name = name
+        self.function = function
+        self.depends = tuple(depends)
+        self.inputs = inputs
+        self.outputs = tuple(outputs)
+        self.editor = editor
+
+    def __repr__(self):
+        return f"Stage(name={self.name}, depends={self.depends}, editor={self.editor})"
+
+    def get_inputs(self):
+        # files that do not exist yet are left out, their appearance changes the input set
+        return [path for path in self.inputs if os.path.exists(path)]
+
+
+class StageResult:
+    def __init__(self, name, status, elapsed=0.0, error=None):
+        self.name = name
+        self.status = status
+        self.elapsed = elapsed
+        self.error = error
+
+    def __repr__(self):
+        return f"StageResult(name={self.name}, status={self.status}, elapsed={self.elapsed:.1f}s)"
+
+
+def refresh_catalog(config):
+    with ce_catalog.DatasetCatalog() as catalog:
+        # False when no file was added, changed or removed
+        return any(catalog.refresh(config.max_workers))
+
+
+def stage_textures(config):
+    # each stage thread opens its own connection, SQLite connections stay on their thread
+    with ce_catalog.DatasetCatalog() as catalog:
+        ce_texture_convertor.copy_dds_files_with_structure(ce_path_utils.CRY_ENGINE_OUTPUT_FOLDER_ROOT,
+                                                           config.texture_dir, config.staging_mode, catalog)
+
+
+def write_texture_roles(config):
+    with ce_catalog.DatasetCatalog() as catalog:
+        ce_texture_roles.write_texture_role_map(ce_path_utils.CRY_ENGINE_OUTPUT_FOLDER_ROOT, catalog=catalog)
+
+
+def convert_textures(config):
+    if config.use_texture_decoder:
+        ce_texture_convertor.decode_dds_files(config.texture_dir, max_workers=config.max_workers)
+    else:
+        ce_texture_convertor.process_dds_files(config.texture_dir, max_workers=config.max_workers)
+
+
+def import_level_prefabs(config):
+    import ce_level_importer
+    ce_level_importer.import_levels(config.level_names, recreate=False)
+
+
+def recreate_level(config):
+    import ce_level_importer
+    ce_level_importer.import_levels(config.level_names, generate_prefabs=False)
+
+
+def import_vegetation(config):
+    import ce_foliage_importer
+    ce_foliage_importer.import_veg_into_unreal(ce_foliage_importer.parse_veg_file(config.veg_file))
+
+
+def build_default_stages(config):
+    """
+    The CE -> UE pipeline. Every offline stage lists the dataset catalog as input, so a change in the
+    dump reruns them (each one only redoes its changed files) and an unchanged dump skips them.
+    The stages after one that ran run as well, so files it converted are picked up in the same run.
+    """
+    catalog = ce_catalog.DATASET_CATALOG
+    stages = [
+        Stage('catalog', refresh_catalog, outputs=[catalog]),
+        Stage('convert_meshes', lambda c: ce_mesh_convertor.convert_meshes_from_list(c.mesh_list, c.max_workers),
+              ['catalog'], [config.mesh_list, catalog]),
+        Stage('dedup_meshes', lambda c: ce_mesh_convertor.dedup_converted_meshes(c.mesh_list, c.max_workers),
+              ['convert_meshes'], [config.mesh_list, catalog], [ce_dedup.MESH_ALIAS_MAP]),
+        Stage('classify_meshes', lambda c: ce_mesh_convertor.classify_converted_meshes(c.mesh_list, c.max_workers),
+              ['dedup_meshes'], [config.mesh_list, catalog, ce_dedup.MESH_ALIAS_MAP]),
+        Stage('stage_textures', stage_textures, ['catalog'], [catalog]),
+        Stage('dedup_textures', lambda c: ce_texture_convertor.dedup_dds_files(c.texture_dir, c.max_workers),
+              ['stage_textures'], [catalog], [ce_dedup.TEXTURE_ALIAS_MAP]),
+        Stage('texture_roles', write_texture_roles, ['dedup_textures'], [catalog, ce_dedup.TEXTURE_ALIAS_MAP],
+              [ce_texture_roles.TEXTURE_ROLE_MAP]),
+        Stage('convert_textures', convert_textures, ['dedup_textures'], [catalog, ce_dedup.TEXTURE_ALIAS_MAP]),
+        Stage('material_plan', lambda c: ce_material_planner.build_material_plan(
+                  c.mesh_list, c.texture_dir, max_workers=c.max_workers),
+              ['dedup_meshes', 'convert_textures'],
+              [config.mesh_list, catalog, ce_dedup.MESH_ALIAS_MAP, ce_dedup.TEXTURE_ALIAS_MAP,
+               ce_material_convertor.PERMUTATION_BUDGET_MAP], [ce_material_planner.MATERIAL_PLAN]),
+        # editor session
+        Stage('import_meshes', lambda c: ce_mesh_convertor.import_meshes_to_unreal(c.mesh_list),
+              ['classify_meshes'], [config.mesh_list, catalog, ce_dedup.MESH_ALIAS_MAP], editor=True),
+        Stage('import_textures', lambda c: ce_texture_convertor.import_dds_to_unreal(c.texture_dir),
+              ['convert_textures', 'texture_roles'],
+              [catalog, ce_dedup.TEXTURE_ALIAS_MAP, ce_texture_roles.TEXTURE_ROLE_MAP], editor=True),
+        Stage('assign_materials', lambda c: ce_material_planner.apply_material_plan(
+                  share_instances=c.share_instances),
+              ['material_plan', 'import_meshes', 'import_textures'], [ce_material_planner.MATERIAL_PLAN],
+              editor=True),
+        Stage('generate_prefabs', import_level_prefabs, ['assign_materials'], config.level_files + [catalog],
+              editor=True),
+        Stage('recreate_level', recreate_level, ['generate_prefabs'], config.level_files + [catalog], editor=True),
+    ]
+    if config.veg_file:
+        stages.append(Stage('import_vegetation', import_vegetation, ['assign_materials'], [config.veg_file],
+                            editor=True))
+    return stages
+
+
+def is_editor_session():
+    try:
+        import unreal
+    except ImportError:
+        return False
+    return True
+
+
+def select_stages(stages, targets=None):
+    """
+    The stages needed for targets (names): the targets and everything they depend on, all when None.
+    """
+    by_name = {stage.name: stage for stage in stages}
+    if not targets:
+        return list(stages)
+    unknown = [name for name in targets if name not in by_name]
+    if unknown:
+        raise ValueError(f"Unknown pipeline stages {unknown}, valid stages are {list(by_name)}")
+    selected = set()
+    pending = list(targets)
+    while pending:
+        name = pending.pop()
+        if name not in selected:
+            selected.add(name)
+            pending.extend(by_name[name].depends)
+    return [stage for stage in stages if stage.name in selected]
+
+
+class Pipeline:
+    """
+    Runs stages in dependency order: offline stages on max_workers threads at the same time (mesh conversion
+    alongside texture conversion), editor stages one by one on the calling thread as soon as their
+    dependencies are done. Outside the editor the editor stages are left pending.
+    Successful stages are recorded in the manifest under the 'pipeline' stage.
+    """
+    def __init__(self, stages, config, manifest_path=PIPELINE_MANIFEST, max_workers=DEFAULT_PIPELINE_WORKERS):
+        self.stages = stages
+        self.config = config
+        self.manifest = ce_build_manifest.BuildManifest(manifest_path)
+        self.max_workers = max_workers
+        self.lock = threading.Lock()
+        self.results = {}
+        self.force = False
+
+    def __repr__(self):
+        return f"Pipeline(stages={len(self.stages)}, done={len(self.results)})"
+
+    def get_run_id(self, name):
+        record = self.manifest.get_record('pipeline', name)
+        return record.get('run_id') if record else None
+
+    def get_dependency_runs(self, stage):
+        # run ids of the dependencies, a dependency that ran since stage last ran has a new one
+        return {name: self.get_run_id(name) for name in stage.depends}
+
+    def is_up_to_date(self, stage):
+        if stage.inputs is None or not all(os.path.exists(path) for path in stage.outputs):
+            return False
+        with self.lock:
+            record = self.manifest.get_record('pipeline', stage.name)
+            if not record or record.get('depends') != self.get_dependency_runs(stage):
+                return False
+            return self.manifest.is_up_to_date('pipeline', stage.name, stage.get_inputs())
+
+    def should_run(self, stage):
+        return self.force or not self.is_up_to_date(stage)
+
+    def run_stage(self, stage):
+        print(f"Pipeline: running {stage.name}")
+        start_time = time.perf_counter()
+        try:
+            changed = stage.function(self.config)
+        except Exception as e:
+            with self.lock:
+                self.manifest.remove('pipeline', stage.name)
+            return StageResult(stage.name, 'failed', time.perf_counter() - start_time, f"{type(e).__name__}: {e}")
+        elapsed = time.perf_counter() - start_time
+        with self.lock:
+            run_id = self.get_run_id(stage.name) if changed is False else None
+            self.manifest.record('pipeline', stage.name, stage.get_inputs() if stage.inputs is not None else [],
+                                 elapsed=elapsed, run_id=run_id or time.time_ns(),
+                                 depends=self.get_dependency_runs(stage))
+            self.manifest.save()
+        return StageResult(stage.name, 'unchanged' if changed is False else 'ran', elapsed)
+
+    def finish(self, result):
+        self.results[result.name] = result
+        message = f"Pipeline: {result.name} {result.status} ({result.elapsed:.1f}s)"
+        print(message + (f": {result.error}" if result.error else ""))
+
+    def get_ready_stages(self, pending):
+        ready = []
+        for stage in pending:
+            statuses = [self.results[name].status if name in self.results else None for name in stage.depends]
+            if None in statuses:
+                continue
+            if EDITOR_PENDING in statuses:
+                self.finish(StageResult(stage.name, EDITOR_PENDING))
+            elif any(status not in ('ran', 'unchanged', 'skipped') for status in statuses):
+                self.finish(StageResult(stage.name, 'blocked'))
+            elif 'ran' in statuses or self.should_run(stage):
+                ready.append(stage)
+            else:
+                self.finish(StageResult(stage.name, 'skipped'))
+        return ready
+
+    def run(self, force=False):
+        in_editor = is_editor_session()
+        self.force = force
+        pending = list(self.stages)
+        editor_queue = []
+        running = {}
+        with ThreadPoolExecutor(max_workers=self.max_workers) as executor:
+            while pending or editor_queue or running:
+                finished_count = len(self.results)
+                for stage in self.get_ready_stages(pending):
+                    pending.remove(stage)
+                    if not stage.editor:
+                        running[executor.submit(self.run_stage, stage)] = stage
+                    elif in_editor:
+                        editor_queue.append(stage)
+                    else:
+                        self.finish(StageResult(stage.name, EDITOR_PENDING))
+                pending = [stage for stage in pending if stage.name not in self.results]
+                if editor_queue:
+                    # editor work stays on the calling thread, offline stages keep running meanwhile
+                    self.finish(self.run_stage(editor_queue.pop(0)))
+                elif running:
+                    done, _ = wait(running, return_when=FIRST_COMPLETED)
+                    for future in done:
+                        running.pop(future)
+                        self.finish(future.result())
+                elif pending and finished_count == len(self.results):
+                    # depends on a stage that is not part of the run
+                    for stage in pending:
+                        self.finish(StageResult(stage.name, 'blocked', error="missing dependency"))
+                    pending = []
+        with self.lock:
+            self.manifest.save()
+        self.print_report()
+        return self.results
+
+    def print_report(self):
+        lines = ["Pipeline report:"]
+        for stage in self.stages:
+            result = self.results.get(stage.name)
+            if result:
+                lines.append(f"  {result.status:16s} {result.elapsed:8.1f}s {stage.name}"
+                             + (f" ({result.error})" if result.error else ""))
+        print("\n".join(lines))
+
+
+def run_pipeline(config=None, targets=None, force=False, max_workers=DEFAULT_PIPELINE_WORKERS,
+                 manifest_path=PIPELINE_MANIFEST):
+    """
+    Runs the default stages needed for targets (stage names, all when None). Run it outside the editor for
+    the offline stages, then in the editor, where the up to date offline stages are skipped.
+    """
+    config = config or PipelineConfig()
+    stages = select_stages(build_default_stages(config), targets)
+    return Pipeline(stages, config, manifest_path, max_workers).run(force)
+
+
+if __name__ == "__main__":
+    run_pipeline()
+    # run_pipeline(targets=['material_plan'])
+    # run_pipeline(PipelineConfig(veg_file=r"D:\temp\ceoutput\ratajeveg.veg"))
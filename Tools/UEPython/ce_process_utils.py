@@ -0,0 +1,172 @@
+import multiprocessing
+import os
+import subprocess
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor, as_completed
+
+# Leave one core for the editor / OS by default
+DEFAULT_MAX_WORKERS = max(1, (os.cpu_count() or 2) - 1)
+
+
+class Job:
+    """
+    One unit of work for the external tool pool: a list of commands that run one
+    after another, sharing a single log file. The job stops at the first failing command.
+    """
+    def __init__(self, name, commands, log_path=None):
+        self.name = name
+        self.commands = commands
+        self.log_path = log_path
+
+    def __repr__(self):
+        return f"Job(name={self.name}, commands={len(self.commands)})"
+
+
+class JobResult:
+    def __init__(self, name, success, returncode=0, elapsed=0.0, log_path=None, error=None):
+        self.name = name
+        self.success = success
+        self.returncode = returncode
+        self.elapsed = elapsed
+        self.log_path = log_path
+        self.error = error
+
+    def __repr__(self):
+        return f"JobResult(name={self.name}, success={self.success}, elapsed={self.elapsed:.2f}s)"
+
+
+def resolve_tool_command(tool):
+    """
+    Returns the command prefix used to launch a tool.
+    A list is used as is, a .py stand-in script is run with the current interpreter
+    so the Windows tools can be replaced by a fake on Linux.
+    """
+    if isinstance(tool, (list, tuple)):
+        return list(tool)
+    if tool.lower().endswith('.py'):
+        return [sys.executable, tool]
+    return [tool]
+
+
+def get_tool_name(command):
+    # report the stand-in script rather than the interpreter running it
+    tool = command[1] if command[0] == sys.executable and len(command) > 1 else command[0]
+    return os.path.basename(tool)
+
+
+def run_job(job):
+    start_time = time.perf_counter()
+    log_file = None
+    if job.log_path:
+        os.makedirs(os.path.dirname(job.log_path), exist_ok=True)
+        log_file = open(job.log_path, 'w', encoding='utf-8', errors='replace')
+    try:
+        for command in job.commands:
+            if log_file:
+                log_file.write(f"Executing: {' '.join(command)}\n")
+                log_file.flush()
+            try:
+                completed = subprocess.run(command, stdout=log_file or subprocess.DEVNULL,
+                                           stderr=subprocess.STDOUT, check=False)
+            except OSError as e:
+                return JobResult(job.name, False, None, time.perf_counter() - start_time, job.log_path, str(e))
+            if completed.returncode != 0:
+                return JobResult(job.name, False, completed.returncode, time.perf_counter() - start_time,
+                                 job.log_path, f"{get_tool_name(command)} exited with {completed.returncode}")
+        return JobResult(job.name, True, 0, time.perf_counter() - start_time, job.log_path)
+    finally:
+        if log_file:
+            log_file.close()
+
+
+def run_jobs_parallel(jobs, max_workers=None, on_result=None):
+    """
+    Runs the jobs over a bounded thread pool (the work happens in the child processes,
+    so threads are enough to keep every core busy). on_result is called for each finished
+    job in completion order.
+    """
+    max_workers = max_workers or DEFAULT_MAX_WORKERS
+    results = []
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        futures = [executor.submit(run_job, job) for job in jobs]
+        for future in as_completed(futures):
+            result = future.result()
+            results.append(result)
+            if on_result:
+                on_result(result)
+    return results
+
+
+def run_call(name, function, args):
+    """
+    Runs an in-process job in a pool worker; function and args must be picklable.
+    """
+    start_time = time.perf_counter()
+    try:
+        function(*args)
+    except Exception as e:
+        return JobResult(name, False, None, time.perf_counter() - start_time, None, f"{type(e).__name__}: {e}")
+    return JobResult(name, True, 0, time.perf_counter() - start_time)
+
+
+def get_pool_python_executable():
+    """
+    Python interpreter process pool workers are spawned with. Inside the editor sys.executable is the editor
+    binary, so workers must be pointed at the python.exe bundled with the engine. None outside the editor.
+    """
+    try:
+        import unreal
+    except ImportError:
+        return None
+    if hasattr(unreal, 'get_interpreter_executable_path'):
+        python_path = unreal.get_interpreter_executable_path()
+    else:
+        python_path = os.path.join(sys.prefix, 'python.exe' if os.name == 'nt' else 'bin/python3')
+    if not python_path or not os.path.isfile(python_path):
+        raise RuntimeError(f"No Python interpreter to spawn pool workers with from the editor (tried {python_path})")
+    return python_path
+
+
+def create_process_pool(max_workers=None):
+    """
+    ProcessPoolExecutor usable both from a plain Python process and from the editor.
+    """
+    python_path = get_pool_python_executable()
+    if python_path:
+        multiprocessing.set_executable(python_path)
+    return ProcessPoolExecutor(max_workers=max_workers or DEFAULT_MAX_WORKERS)
+
+
+def run_calls_parallel(calls, max_workers=None, on_result=None):
+    """
+    Process pool counterpart of run_jobs_parallel for pure Python work: calls is a list of
+    (name, function, args) and each finished call is reported as a JobResult.
+    """
+    results = []
+    with create_process_pool(max_workers) as executor:
+        futures = [executor.submit(run_call, name, function, args) for name, function, args in calls]
+        for future in as_completed(futures):
+            result = future.result()
+            results.append(result)
+            if on_result:
+                on_result(result)
+    return results
+
+
+def print_job_report(results, title="Jobs", report_path=None):
+    """
+    Prints a success/failure summary and optionally writes the failed job list to report_path.
+    """
+    failed = [r for r in results if not r.success]
+    total_time = sum(r.elapsed for r in results)
+    lines = [f"{title}: {len(results) - len(failed)} succeeded, {len(failed)} failed "
+             f"({total_time:.1f}s of job time)"]
+    for result in sorted(failed, key=lambda r: r.name):
+        lines.append(f"  FAILED {result.name}: {result.error} (log: {result.log_path})")
+    print("\n".join(lines))
+    if report_path:
+        os.makedirs(os.path.dirname(os.path.abspath(report_path)), exist_ok=True)
+        with open(report_path, 'w', encoding='utf-8') as report_file:
+            report_file.write("\n".join(lines) + "\n")
+    return failed
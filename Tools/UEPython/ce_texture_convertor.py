@@ -1,126 +1,551 @@
 import os
+import queue
 import shutil
-import subprocess
+import threading
+import time
+from collections import defaultdict
+import ce_build_manifest
+import ce_catalog
+import ce_dedup
 import ce_path_utils
+import ce_process_utils
+import ce_texture_roles
 # import dds2png
 
+SCRIPT_DIR = os.path.dirname(os.path.abspath(__file__))
+# Tools can be an exe, a .py stand-in script or a full command prefix list
+DDS_UNSPLITTER_PATH = r"D:\GameDev\UnrealEngine-release\KCD1Re\Tools\AssetConverter\DDS-Unsplitter.exe"
+NVTT_EXPORT_PATH = r"C:\Program Files\NVIDIA Corporation\NVIDIA Texture Tools\nvtt_export.exe"
+TEXTURE_CONVERT_LOG_DIR = os.path.join(SCRIPT_DIR, "logs/texture_convert")
+STAGING_MODES = ('copy', 'hardlink', 'symlink')
+# Records the .tga each texture package was imported from so unchanged textures are skipped
+TEXTURE_BUILD_MANIFEST = os.path.join(SCRIPT_DIR, "build_manifests/texture_build_manifest.json")
+# Suffix of the image exported from the attached alpha of a texture (the gloss of normal maps)
+GLOSS_SUFFIX = "_glossmap"
+# Converted images waiting for import in stream_textures_to_unreal; the converters wait while it is full
+STREAM_QUEUE_SIZE = 1000
+# Seconds a blocking stream waits for a chunk to fill before importing what it has
+STREAM_CHUNK_WAIT = 5.0
+
+
+def group_dds_variants(files):
+    """
+    Single pass index of a folder listing: base name -> the files of its split .dds chain.
+    """
+    groups = defaultdict(list)
+    for file in files:
+        if file.endswith('.dds') or '.dds.' in file:
+            groups[file.split('.dds')[0]].append(file)
+    return groups
+
+
+def is_already_staged(source_file, target_file, mode):
+    """
+    Whether target_file is source_file staged in mode. A link of another kind than mode (e.g. a symlink
+    when copying) is never up to date, so switching modes restages the tree.
+    """
+    try:
+        target_stat = os.lstat(target_file)
+    except FileNotFoundError:
+        return False
+    if os.path.islink(target_file):
+        return mode == 'symlink' and os.readlink(target_file) == source_file
+    source_stat = os.stat(source_file)
+    if os.path.samestat(source_stat, target_stat):
+        return mode == 'hardlink'
+    # a plain copy, also what hardlink and symlink fall back to when the file system refuses links
+    return source_stat.st_size == target_stat.st_size and source_stat.st_mtime_ns == target_stat.st_mtime_ns
+
+
+def stage_file(source_file, target_file, mode='copy'):
+    """
+    Places source_file at target_file by copy, hardlink or symlink. Links fall back to a copy when the
+    file system refuses them (e.g. staging onto another drive). Returns the mode actually used.
+    """
+    # remove a previously staged file or link first, copying through a link would write into the dump
+    if os.path.lexists(target_file):
+        os.remove(target_file)
+    if mode != 'copy':
+        try:
+            if mode == 'hardlink':
+                os.link(source_file, target_file)
+            else:
+                os.symlink(source_file, target_file)
+            return mode
+        except OSError:
+            pass
+    shutil.copy2(source_file, target_file)
+    return 'copy'
+
+
+def copy_dds_files_with_structure(source_dir, target_dir, mode='copy', catalog=None):
+    """
+    Stages every split .dds chain of source_dir into target_dir, keeping the folder structure and renaming
+    name.dds to name.dds.0. mode is one of STAGING_MODES: with 'hardlink'/'symlink' the mip files are
+    linked and only the small header file is materialized, so the tools never write through into the dump.
+    Files already staged by a previous run are skipped. With a ce_catalog.DatasetCatalog of the dump the
+    .dds files are listed from it instead of walking source_dir.
+    """
+    if mode not in STAGING_MODES:
+        raise ValueError(f"Unknown staging mode {mode}, expected one of {STAGING_MODES}")
+    # symlinks must point at absolute paths to resolve from the staging tree
+    source_dir = os.path.abspath(source_dir)
+    counts = defaultdict(int)
+    for root, files in ce_catalog.walk_files(source_dir, catalog, 'dds'):
+        groups = group_dds_variants(files)
+        if not groups:
+            continue
+
+        # Determine relative path for subfolder structure
+        relative_path = os.path.relpath(root, source_dir)
+        target_subfolder = os.path.join(target_dir, relative_path)
+        os.makedirs(target_subfolder, exist_ok=True)
+
+        for base_name, variants in groups.items():
+            for variant in variants:
+                source_file = os.path.join(root, variant)
+                target_file = os.path.join(target_subfolder, variant)
+                file_mode = mode
+
+                # Rename base .dds to .dds.0 in the target folder
+                if variant == base_name + '.dds':
+                    target_file = os.path.join(target_subfolder, base_name + '.dds.0')
+                    file_mode = 'copy'
+
+                if is_already_staged(source_file, target_file, file_mode):
+                    counts['skipped'] += 1
+                    continue
+                counts[stage_file(source_file, target_file, file_mode)] += 1
+    print(f"Staged {target_dir}: " + ", ".join(f"{count} {kind}" for kind, count in sorted(counts.items())))
+    return counts
+
+
+def get_dds_chain_base_name(file_name):
+    """
+    Returns the base name of the header file of a split .dds chain ('name.dds', or 'name.dds.0' once staged),
+    None for any other file.
+    """
+    for suffix in ('.dds', '.dds.0'):
+        if file_name.endswith(suffix):
+            return file_name[:-len(suffix)]
+    return None
+
+
+def get_texture_relative_path(target_dir, root, base_name):
+    """
+    Dump relative path of a texture as its .mtl files reference it, e.g. 'objects/props/barrel_diff.dds'.
+    """
+    return os.path.relpath(os.path.join(root, base_name + '.dds'), target_dir).replace(os.sep, '/')
+
+
+def dedup_dds_files(target_dir, max_workers=None, manifest_path=TEXTURE_BUILD_MANIFEST,
+                    alias_map_path=ce_dedup.TEXTURE_ALIAS_MAP, catalog=None):
+    """
+    Hashes every staged .dds chain under target_dir over max_workers processes and writes the
+    duplicate -> canonical alias map, so each unique texture is converted and imported once and
+    ce_material_convertor.find_texture_by_path resolves every copy to it.
+    Hashes are kept in the build manifest and only recomputed for changed chains.
+    catalog is an optional ce_catalog.DatasetCatalog of target_dir listing the chains instead of os.walk.
+    """
+    manifest = ce_build_manifest.BuildManifest(manifest_path) if manifest_path else None
+    dedup_keys = {}
+    pending = []
+    for root, files in ce_catalog.walk_files(target_dir, catalog, 'dds'):
+        for base_name, variants in group_dds_variants(files).items():
+            if base_name.endswith('.combined'):
+                continue
+            relative_path = get_texture_relative_path(target_dir, root, base_name)
+            chain_paths = [os.path.join(root, variant) for variant in variants]
+            record = manifest.get_record("texture_dedup", relative_path) if manifest else None
+            if record and manifest.is_up_to_date("texture_dedup", relative_path, chain_paths):
+                dedup_keys[relative_path] = record['dedup_key']
+            else:
+                pending.append((relative_path, chain_paths))
+    print(f"Texture dedup: {len(dedup_keys)} hashes up to date, {len(pending)} to compute")
+
+    if pending:
+        with ce_process_utils.create_process_pool(max_workers) as executor:
+            chains = [chain_paths for _, chain_paths in pending]
+            for (relative_path, chain_paths), dedup_key in zip(
+                    pending, executor.map(ce_dedup.compute_texture_dedup_key, chains, chunksize=64)):
+                dedup_keys[relative_path] = dedup_key
+                if manifest and dedup_key:
+                    manifest.record("texture_dedup", relative_path, chain_paths, dedup_key=dedup_key)
+        if manifest:
+            manifest.save()
+
+    aliases, unique_count = ce_dedup.group_duplicates(dedup_keys)
+    alias_table = ce_dedup.AliasTable()
+    for duplicate, canonical in aliases:
+        alias_table.add(duplicate, canonical)
+    alias_table.save(alias_map_path)
+    print(f"Texture dedup: {unique_count} unique textures, {len(aliases)} duplicates written to {alias_map_path}")
+    return alias_table
+
+
+def load_texture_alias_table(alias_map_path):
+    return ce_dedup.AliasTable(alias_map_path) if alias_map_path and os.path.exists(alias_map_path) else None
+
+
+def build_dds_convert_job(dds_file_path, base_name, tool_path, nvtt_export_path, log_path):
+    """
+    One job per texture: unsplit the chain to <base>.combined.dds, then export it to <base>.tga.
+    """
+    root = os.path.dirname(dds_file_path)
+    combined_file_path = os.path.join(root, base_name + '.combined.dds')
+    tga_file_path = os.path.join(root, base_name + '.tga')
+    commands = [
+        ce_process_utils.resolve_tool_command(tool_path) + [dds_file_path, '-s'],
+        ce_process_utils.resolve_tool_command(nvtt_export_path) + [combined_file_path, '-o', tga_file_path],
+    ]
+    return ce_process_utils.Job(dds_file_path, commands, log_path)
+
+
+def process_dds_files(target_dir, tool_path=None, nvtt_export_path=None, max_workers=None, log_dir=None,
+                      alias_map_path=ce_dedup.TEXTURE_ALIAS_MAP, on_result=None, catalog=None):
+    """
+    Unsplits and exports every .dds chain under target_dir to .tga over max_workers parallel jobs,
+    each job logging to <log_dir>/<relative dds path>.log, and prints a per-file report at the end.
+    Tool paths default to DDS_UNSPLITTER_PATH / NVTT_EXPORT_PATH and can be .py stand-ins.
+    Duplicates listed in the alias map (see dedup_dds_files) are not converted.
+    on_result is called with the JobResult of every texture as soon as it is converted.
+    catalog is an optional ce_catalog.DatasetCatalog of target_dir listing the chains instead of os.walk.
+    """
+    tool_path = tool_path or DDS_UNSPLITTER_PATH
+    nvtt_export_path = nvtt_export_path or NVTT_EXPORT_PATH
+    log_dir = log_dir or TEXTURE_CONVERT_LOG_DIR
+    alias_table = load_texture_alias_table(alias_map_path)
+    jobs = []
+    for root, files in ce_catalog.walk_files(target_dir, catalog, 'dds'):
+        for base_name, variants in group_dds_variants(files).items():
+            if base_name.endswith('.combined'):
+                continue
+            if alias_table and alias_table.resolve(get_texture_relative_path(target_dir, root, base_name)):
+                continue
+            # one job per chain, the staged header name.dds.0 is preferred over a name.dds left next to it
+            header_names = [name for name in (base_name + '.dds.0', base_name + '.dds') if name in variants]
+            if not header_names:
+                continue
+            dds_file_path = os.path.join(root, header_names[0])
+            log_path = os.path.join(log_dir, os.path.relpath(dds_file_path, target_dir) + ".log")
+            jobs.append(build_dds_convert_job(dds_file_path, base_name, tool_path, nvtt_export_path, log_path))
+    print(f"Texture conversion: {len(jobs)} textures")
+
+    def on_job_result(result):
+        status = "Processed" if result.success else "Error processing"
+        print(f"{status}: {result.name} ({result.elapsed:.1f}s)")
+        if on_result:
+            on_result(result)
+
+    results = ce_process_utils.run_jobs_parallel(jobs, max_workers, on_job_result)
+    ce_process_utils.print_job_report(results, "Texture conversion", os.path.join(log_dir, "report.txt"))
+    return results
+
+
+def decode_dds_files(target_dir, output_format='tga', max_workers=None, log_dir=None,
+                     alias_map_path=ce_dedup.TEXTURE_ALIAS_MAP, on_result=None, catalog=None):
+    """
+    In-process alternative to process_dds_files: reassembles and decodes every .dds chain under target_dir
+    with ce_dds_decoder over a process pool, without launching DDS-Unsplitter / nvtt_export or writing
+    a .combined.dds. Attached alpha images are written as <base>_glossmap.<output_format>.
+    Duplicates listed in the alias map (see dedup_dds_files) are not decoded.
+    on_result is called with the JobResult of every texture as soon as it is decoded.
+    catalog is an optional ce_catalog.DatasetCatalog of target_dir listing the chains instead of os.walk.
+    """
+    import ce_dds_decoder
+    log_dir = log_dir or TEXTURE_CONVERT_LOG_DIR
+    alias_table = load_texture_alias_table(alias_map_path)
+    calls = []
+    for root, files in ce_catalog.walk_files(target_dir, catalog, 'dds'):
+        for base_name, variants in group_dds_variants(files).items():
+            if base_name.endswith('.combined'):
+                continue
+            if alias_table and alias_table.resolve(get_texture_relative_path(target_dir, root, base_name)):
+                continue
+            # the staged header is name.dds.0, prefer it over a name.dds left next to it
+            header_names = [name for name in (base_name + '.dds.0', base_name + '.dds') if name in variants]
+            if not header_names:
+                continue
+            dds_file_path = os.path.join(root, header_names[0])
+            # only the chain's own file names are sent to the worker, not the whole folder listing
+            calls.append((dds_file_path, ce_dds_decoder.convert_dds_chain, (dds_file_path, output_format, variants)))
+    print(f"Texture decoding: {len(calls)} textures")
+
+    def on_call_result(result):
+        status = "Decoded" if result.success else f"Error decoding ({result.error})"
+        print(f"{status}: {result.name} ({result.elapsed:.1f}s)")
+        if on_result:
+            on_result(result)
+
+    results = ce_process_utils.run_calls_parallel(calls, max_workers, on_call_result)
+    ce_process_utils.print_job_report(results, "Texture decoding", os.path.join(log_dir, "decode_report.txt"))
+    return results
 
-def copy_dds_files_with_structure(source_dir, target_dir):
-    for root, _, files in os.walk(source_dir):
-        # Filter for .dds and its variants
-        dds_files = [f for f in files if f.endswith('.dds') or '.dds.' in f]
-        
-        for dds_file in dds_files:
-            base_name = dds_file.split('.dds')[0]  # Extract base name
-            base_path = os.path.join(root, base_name + '.dds')
-            
-            # Determine relative path for subfolder structure
-            relative_path = os.path.relpath(root, source_dir)
-            target_subfolder = os.path.join(target_dir, relative_path)
-            os.makedirs(target_subfolder, exist_ok=True)
-            
-            # Copy all files with the same base name
-            for variant in files:
-                if variant.startswith(base_name + '.dds'):
-                    source_file = os.path.join(root, variant)
-                    target_file = os.path.join(target_subfolder, variant)
-                    
-                    # Rename base .dds to .dds.0 in the target folder
-                    if variant == base_name + '.dds':
-                        target_file = os.path.join(target_subfolder, base_name + '.dds.0')
-                    
-                    shutil.copy2(source_file, target_file)
-                    print(f"Copied: {source_file} -> {target_file}")
-                    
-
-def process_dds_files(target_dir, tool_path):
-    for root, _, files in os.walk(target_dir):
-        for file in files:
-            if file.endswith('.dds'):
-                dds_file_path = os.path.join(root, file)
-                base_name = file[:-4]  # Remove '.dds.0' to get the base name
-                
-                # Construct the command
-                command = [tool_path, dds_file_path, '-s']
-                # command = [tool_path, dds_file_path]
-                try:
-                    # Execute the command
-                    subprocess.run(command, check=True)
-                    print(f"Processed: {dds_file_path}")
-                    
-                    combined_file_path = os.path.join(root, base_name + '.combined.dds')
-                    print(combined_file_path)
-                    # Delete all .dds.x files for this base name
-                    # for variant in files:
-                    #     if variant.startswith(base_name + '.dds'):
-                    #         variant_path = os.path.join(root, variant)
-                    #         os.remove(variant_path)
-                    #         print(f"Deleted: {variant_path}")
-                    
-                    # filename = dds_file_path.replace(".dds.0", ".dds")
-                    # (base_filename, filename_ext) = os.path.splitext(filename)
-                    # output_filename = base_filename + '.png'
-                    # # Load DDS file using imageio
-                    # dds_image = imageio.imread(filename)
-                    # # Convert numpy array to PIL image
-                    # image = Image.fromarray(dds_image)
-                    # # Save as TGA
-                    # image.save(output_filename)
-                    
-                except subprocess.CalledProcessError as e:
-                    print(f"Error processing {dds_file_path}: {e}")
-                
-                command = [nvtt_export_path, combined_file_path, '-o', combined_file_path.replace('.dds', '.tga')]   
-                try:
-                    # Execute the command
-                    subprocess.run(command, check=True)
-                    print(f"Processed: {combined_file_path}")
-                except subprocess.CalledProcessError as e:
-                    print(f"Error processing {combined_file_path}: {e}") 
-                
-                print(file)   
-                break
 
+def get_texture_package_name(tga_file_path, target_dir):
+    package_name = tga_file_path.replace(target_dir, "/Game/Old").replace("\\", "/")
+    return package_name.replace('.tga', '')
 
-def import_dds_to_unreal(target_dir):
+
+def get_converted_texture_paths(dds_file_path, output_format='tga'):
+    """
+    Images written for a .dds chain by either converter: <base>.<ext> and, for textures with an attached
+    alpha, <base>_glossmap.<ext>.
+    """
+    root, file = os.path.split(dds_file_path)
+    base_path = os.path.join(root, get_dds_chain_base_name(file))
+    return [path for path in (f"{base_path}.{output_format}", f"{base_path}{GLOSS_SUFFIX}.{output_format}")
+            if os.path.exists(path)]
+
+
+class TextureImporter:
+    """
+    State shared by one texture import run: the existing packages (one asset registry query), the build
+    manifest, the texture alias map and the role map. .tga files are added one by one, the ones that need
+    importing are queued and imported chunk by chunk with import_pending.
+    """
+    def __init__(self, target_dir, manifest_path=TEXTURE_BUILD_MANIFEST, force=False,
+                 alias_map_path=ce_dedup.TEXTURE_ALIAS_MAP, role_map_path=ce_texture_roles.TEXTURE_ROLE_MAP):
+        import asset_import_utils
+        self.target_dir = target_dir
+        self.manifest = ce_build_manifest.BuildManifest(manifest_path) if manifest_path else None
+        self.existing_packages = asset_import_utils.list_existing_packages() if not force else set()
+        self.alias_table = load_texture_alias_table(alias_map_path)
+        self.role_map = ce_texture_roles.load_texture_role_map(role_map_path)
+        self.import_entries = {}
+        self.skipped_count = 0
+        self.duplicate_count = 0
+        self.imported_count = 0
+
+    def __repr__(self):
+        return (f"TextureImporter(target_dir={self.target_dir}, pending={len(self.import_entries)}, "
+                f"imported={self.imported_count})")
+
+    def add(self, tga_file_path):
+        """
+        Queues a .tga for import unless it is a duplicate or already imported and unchanged.
+        """
+        root, file = os.path.split(tga_file_path)
+        file = file.lower()
+        base_name = file[:-len('.tga')]
+        if base_name.endswith(GLOSS_SUFFIX):
+            base_name = base_name[:-len(GLOSS_SUFFIX)]
+        if self.alias_table and self.alias_table.resolve(get_texture_relative_path(self.target_dir, root, base_name)):
+            self.duplicate_count += 1
+            return False
+        tga_file_path = os.path.join(root, file)
+        package_name = get_texture_package_name(tga_file_path, self.target_dir)
+        package_path = package_name[:package_name.rfind("/")]
+        name = package_name.split("/")[-1]
+        role_name = ce_texture_roles.classify_texture(
+            os.path.relpath(tga_file_path, self.target_dir).replace(os.sep, '/'), self.role_map)
+
+        manifest = self.manifest
+        if package_name in self.existing_packages and (not manifest or (
+                (manifest.get_record("texture_import", package_name) or {}).get('role') == role_name and
+                manifest.is_up_to_date("texture_import", package_name, [tga_file_path]))):
+            self.skipped_count += 1
+            return False
+        self.import_entries[tga_file_path] = (package_path, name, role_name)
+        return True
+
+    def import_pending(self, chunk_size=None):
+        """
+        Imports every queued texture, chunk_size per save, and clears the queue.
+        """
+        import unreal
+        import asset_import_utils
+        import_entries = self.import_entries
+        self.import_entries = {}
+        if not import_entries:
+            return []
+
+        # tasks are built lazily so only one chunk of them is alive at a time
+        tasks = (asset_import_utils.build_import_task(tga_file_path, package_path, name, 'texture')
+                 for tga_file_path, (package_path, name, _) in import_entries.items())
+
+        def on_result(result):
+            role_name = import_entries[result.filename][2]
+            if result.success:
+                # the texture is still loaded, its chunk is saved right after
+                for imported_path in result.imported_paths:
+                    ce_texture_roles.apply_texture_role(unreal.load_asset(imported_path), role_name)
+                self.imported_count += 1
+            if not self.manifest:
+                return
+            package_name = get_texture_package_name(result.filename, self.target_dir)
+            if result.success:
+                self.manifest.record("texture_import", package_name, [result.filename], role=role_name)
+            else:
+                self.manifest.remove("texture_import", package_name)
+
+        try:
+            return asset_import_utils.execute_import_tasks_chunked(tasks, chunk_size, on_result)
+        finally:
+            self.save()
+
+    def save(self):
+        if self.manifest:
+            self.manifest.save()
+
+
+def import_dds_to_unreal(target_dir, chunk_size=None, manifest_path=TEXTURE_BUILD_MANIFEST, force=False,
+                         alias_map_path=ce_dedup.TEXTURE_ALIAS_MAP, role_map_path=ce_texture_roles.TEXTURE_ROLE_MAP,
+                         catalog=None):
+    """
+    Imports every .tga under target_dir to /Game/Old/<relative path>, chunk_size textures per save.
+    Existing packages are listed with one asset registry query; a texture is skipped when its package
+    exists and its .tga is unchanged since the last import recorded in the manifest, so changed files
+    are reimported. force imports everything, manifest_path=None falls back to skipping existing packages.
+    Duplicates listed in the alias map (see dedup_dds_files) are not imported.
+    Compression, sRGB, LOD group, mips and streaming come from each texture's ce_texture_roles role
+    (see ce_texture_roles.write_texture_role_map); a texture whose role changed is reimported.
+    catalog is an optional ce_catalog.DatasetCatalog of target_dir listing the .tga files instead of os.walk.
+    """
     import unreal
-    import asset_import_utils
-    tasks = []
-    should_break = False
-    for root, _, files in os.walk(target_dir):
+    importer = TextureImporter(target_dir, manifest_path, force, alias_map_path, role_map_path)
+    for root, files in ce_catalog.walk_files(target_dir, catalog, 'tga'):
         for file in files:
-            file = file.lower()
-            if file.endswith('.tga'):
-                dds_file_path = os.path.join(root, file)
-                package_name = dds_file_path.replace(target_dir, "/Game/Old").replace("\\", "/")
-                package_name = package_name.replace('.tga', '')
-                package_path = package_name[:package_name.rfind("/")]
-                name = package_name.split("/")[-1]
-                
-                if unreal.EditorAssetLibrary.does_asset_exist(package_name):
-                    # print(f"Asset already exists: {package_name}")
-                    continue
-                task = asset_import_utils.build_input_task_simple(dds_file_path, package_path, name)
-                tasks.append(task)
-            #     should_break = True
-            #     break
-            # if should_break:
-            #     break
-                
-    asset_import_utils.execute_import_tasks(tasks)
-                
-
-# Define source and target directories
-source_directory = r"D:\temp\Cryengine"
-target_directory = r"D:\GameDev\UnrealEngine-release\KCD1Re\ArtRaw"
-tool_path = r"D:\GameDev\UnrealEngine-release\KCD1Re\Tools\AssetConverter\DDS-Unsplitter.exe"
-nvtt_export_path = r"C:\Program Files\NVIDIA Corporation\NVIDIA Texture Tools\nvtt_export.exe"
-
-# Execute the function
-# copy_dds_files_with_structure(ce_path_utils.CRY_ENGINE_OUTPUT_FOLDER_ROOT, target_directory)
-
-# script_dir = os.path.dirname(os.path.abspath(__file__))
-# converter_exe = os.path.join(script_dir, "../DDS-Unsplitter.exe")
-# process_dds_files(ce_path_utils.CRY_ENGINE_OUTPUT_FOLDER_ROOT, tool_path)
-
-import_dds_to_unreal(target_directory)
\ No newline at end of file
+            if file.lower().endswith('.tga'):
+                importer.add(os.path.join(root, file))
+    unreal.log("Texture import: {} up to date, {} duplicates, {} to import".format(
+        importer.skipped_count, importer.duplicate_count, len(importer.import_entries)))
+    importer.import_pending(chunk_size)
+
+
+class TextureStream:
+    """
+    Overlaps texture conversion with import: a producer thread converts the staged textures and puts
+    every finished image on a bounded queue, the editor imports them chunk by chunk as they arrive.
+    """
+    def __init__(self, importer, chunk_size=None, queue_size=STREAM_QUEUE_SIZE):
+        import asset_import_utils
+        self.importer = importer
+        self.chunk_size = chunk_size or asset_import_utils.DEFAULT_IMPORT_CHUNK_SIZE
+        self.queue = queue.Queue(maxsize=queue_size)
+        self.producer = None
+        self.producer_error = None
+        self.finished = False
+        self.tick_handle = None
+
+    def __repr__(self):
+        return f"TextureStream(queued={self.queue.qsize()}, finished={self.finished}, importer={self.importer})"
+
+    def start(self, convert_function, *args, **kwargs):
+        """
+        Runs convert_function(*args, on_result=..., **kwargs) (process_dds_files or decode_dds_files)
+        on the producer thread.
+        """
+        def on_result(result):
+            if result.success:
+                for image_path in get_converted_texture_paths(result.name):
+                    # blocks while the queue is full, until the importer catches up
+                    self.queue.put(image_path)
+
+        def produce():
+            try:
+                convert_function(*args, on_result=on_result, **kwargs)
+            except Exception as e:
+                self.producer_error = e
+            finally:
+                self.queue.put(None)
+
+        self.producer = threading.Thread(target=produce, name="TextureStreamProducer", daemon=True)
+        self.producer.start()
+
+    def drain(self, block=False, timeout=STREAM_CHUNK_WAIT):
+        """
+        Takes up to one chunk of images off the queue and imports the ones that need it. With block set,
+        waits up to timeout seconds for the chunk to fill. Returns False once the producer is done and
+        the queue is empty.
+        """
+        if self.finished:
+            return False
+        deadline = time.monotonic() + timeout
+        taken = 0
+        while taken < self.chunk_size:
+            try:
+                if block:
+                    image_path = self.queue.get(timeout=max(0.0, deadline - time.monotonic()))
+                else:
+                    image_path = self.queue.get_nowait()
+            except queue.Empty:
+                break
+            if image_path is None:
+                self.finished = True
+                break
+            taken += 1
+            if image_path.lower().endswith('.tga'):
+                self.importer.add(image_path)
+        if self.importer.import_entries:
+            self.importer.import_pending(self.chunk_size)
+        if self.finished and self.producer_error:
+            raise self.producer_error
+        return not self.finished
+
+    def run_blocking(self):
+        """
+        Imports on the calling thread until the producer is done.
+        """
+        while self.drain(block=True):
+            pass
+
+    def run_on_tick(self):
+        """
+        Imports one chunk per editor tick so the editor stays responsive while the producer runs.
+        """
+        import unreal
+
+        def on_tick(delta_time):
+            try:
+                running = self.drain()
+            except Exception as e:
+                unreal.log_error("Texture stream failed: {}".format(e))
+                running = False
+            if not running:
+                unreal.unregister_slate_post_tick_callback(self.tick_handle)
+                self.tick_handle = None
+                unreal.log("Texture stream done: {} imported, {} up to date, {} duplicates".format(
+                    self.importer.imported_count, self.importer.skipped_count, self.importer.duplicate_count))
+
+        self.tick_handle = unreal.register_slate_post_tick_callback(on_tick)
+
+
+def stream_textures_to_unreal(target_dir, use_decoder=False, blocking=True, chunk_size=None,
+                              queue_size=STREAM_QUEUE_SIZE, max_workers=None, manifest_path=TEXTURE_BUILD_MANIFEST,
+                              force=False, alias_map_path=ce_dedup.TEXTURE_ALIAS_MAP,
+                              role_map_path=ce_texture_roles.TEXTURE_ROLE_MAP):
+    """
+    Converts the staged textures under target_dir (process_dds_files, or decode_dds_files with use_decoder)
+    and imports each chunk as soon as it is converted instead of after the whole dump.
+    blocking imports on the calling thread until done, otherwise the import runs from the editor tick and
+    the TextureStream is returned right away.
+    """
+    importer = TextureImporter(target_dir, manifest_path, force, alias_map_path, role_map_path)
+    stream = TextureStream(importer, chunk_size, queue_size)
+    convert_function = decode_dds_files if use_decoder else process_dds_files
+    stream.start(convert_function, target_dir, max_workers=max_workers, alias_map_path=alias_map_path)
+    if blocking:
+        stream.run_blocking()
+    else:
+        stream.run_on_tick()
+    return stream
+
+
+if __name__ == "__main__":
+    # Define source and target directories
+    source_directory = r"D:\temp\Cryengine"
+    target_directory = r"D:\GameDev\UnrealEngine-release\KCD1Re\ArtRaw"
+
+    # Execute the function
+    # copy_dds_files_with_structure(ce_path_utils.CRY_ENGINE_OUTPUT_FOLDER_ROOT, target_directory, mode='hardlink')
+
+    # dedup_dds_files(target_directory)
+    # ce_texture_roles.write_texture_role_map(ce_path_utils.CRY_ENGINE_OUTPUT_FOLDER_ROOT)
+    # process_dds_files(target_directory)
+    # or without the external tools:
+    # decode_dds_files(target_directory)
+
+    import_dds_to_unreal(target_directory)
+    # or convert and import at the same time:
+    # stream_textures_to_unreal(target_directory)
@@ -0,0 +1,155 @@
+import json
+import os
+import ce_catalog
+import ce_dedup
+import ce_material_convertor
+
+SCRIPT_DIR = os.path.dirname(os.path.abspath(__file__))
+# Texture path -> role collected from the .mtl files by write_texture_role_map
+TEXTURE_ROLE_MAP = os.path.join(SCRIPT_DIR, "build_manifests/texture_role_map.json")
+# Virtual texture streaming needs r.VirtualTextures enabled in the project, off until it is
+ENABLE_VIRTUAL_TEXTURES = False
+
+DEFAULT_ROLE = 'color'
+
+
+class TextureRole:
+    """
+    Texture settings shared by every texture used the same way. The settings are names of the
+    unreal enum values, resolved when they are applied.
+    """
+    def __init__(self, name, compression_settings, srgb, lod_group, mip_gen_settings='TMGS_FROM_TEXTURE_GROUP',
+                 virtual_texture_streaming=False):
+        self.name = name
+        self.compression_settings = compression_settings
+        self.srgb = srgb
+        self.lod_group = lod_group
+        self.mip_gen_settings = mip_gen_settings
+        self.virtual_texture_streaming = virtual_texture_streaming
+
+    def __repr__(self):
+        return f"TextureRole(name={self.name}, compression={self.compression_settings}, srgb={self.srgb})"
+
+
+TEXTURE_ROLES = {
+    DEFAULT_ROLE: TextureRole(DEFAULT_ROLE, 'TC_DEFAULT', True, 'TEXTUREGROUP_WORLD', virtual_texture_streaming=True),
+    'normal': TextureRole('normal', 'TC_NORMALMAP', False, 'TEXTUREGROUP_WORLD_NORMAL_MAP', virtual_texture_streaming=True),
+    'gloss': TextureRole('gloss', 'TC_GRAYSCALE', False, 'TEXTUREGROUP_WORLD_SPECULAR'),
+    'specular': TextureRole('specular', 'TC_DEFAULT', True, 'TEXTUREGROUP_WORLD_SPECULAR'),
+    # alpha tested coverage falls apart on blurred mips
+    'opacity': TextureRole('opacity', 'TC_GRAYSCALE', False, 'TEXTUREGROUP_WORLD', 'TMGS_SHARPEN4'),
+    'height': TextureRole('height', 'TC_GRAYSCALE', False, 'TEXTUREGROUP_WORLD'),
+    # CE detail maps pack bump and gloss detail, all linear data
+    'detail': TextureRole('detail', 'TC_MASKS', False, 'TEXTUREGROUP_WORLD'),
+}
+
+# .mtl <Texture Map=...> -> role
+MTL_MAP_ROLES = {
+    'Diffuse': DEFAULT_ROLE,
+    '[1] Diffuse': DEFAULT_ROLE,
+    'Custom': DEFAULT_ROLE,  # second blend layer diffuse
+    'Bumpmap': 'normal',
+    '[1] Custom': 'normal',  # second blend layer bump
+    'Specular': 'specular',
+    'Opacity': 'opacity',
+    'Detail': 'detail',
+    'Heightmap': 'height',
+    'Displacement': 'height',
+}
+
+# CE file name suffixes, checked when no .mtl uses the texture. Longest first.
+SUFFIX_ROLES = (
+    ('_glossmap', 'gloss'),
+    ('_ddna', 'normal'),
+    ('_ddn', 'normal'),
+    ('_spec', 'specular'),
+    ('_detail', 'detail'),
+    ('_det', 'detail'),
+    ('_opacity', 'opacity'),
+    ('_alpha', 'opacity'),
+    ('_mask', 'opacity'),
+    ('_displ', 'height'),
+    ('_height', 'height'),
+    ('_diff', DEFAULT_ROLE),
+)
+
+# A texture used in several slots gets the first of its roles in this order
+ROLE_PRIORITY = ('normal', 'gloss', 'opacity', 'detail', 'height', 'specular', DEFAULT_ROLE)
+
+
+def classify_texture_name(texture_path):
+    """
+    Role of a texture from its file name suffix.
+    """
+    name = os.path.splitext(os.path.basename(texture_path.replace('\\', '/')))[0].lower()
+    for suffix, role in SUFFIX_ROLES:
+        if name.endswith(suffix):
+            return role
+    return DEFAULT_ROLE
+
+
+def collect_texture_roles(mtl_root, alias_map_path=ce_dedup.TEXTURE_ALIAS_MAP, catalog=None):
+    """
+    Walks every .mtl under mtl_root and returns texture key (see ce_dedup.normalize_asset_key) -> role
+    of the Map slots referencing it. Duplicate textures count for their canonical copy.
+    catalog is an optional ce_catalog.DatasetCatalog listing the .mtl files instead of os.walk.
+    """
+    alias_table = ce_dedup.AliasTable(alias_map_path)
+    roles = {}
+    for root, files in ce_catalog.walk_files(mtl_root, catalog, 'mtl'):
+        for file in files:
+            if not file.lower().endswith('.mtl'):
+                continue
+            for material in ce_material_convertor.parse_mtl_file(os.path.join(root, file)):
+                for texture in material.textures:
+                    role = MTL_MAP_ROLES.get(texture.Map)
+                    if not texture.File or not role:
+                        continue
+                    key = ce_dedup.normalize_asset_key(alias_table.resolve(texture.File) or texture.File)
+                    previous = roles.get(key)
+                    if previous is None or ROLE_PRIORITY.index(role) < ROLE_PRIORITY.index(previous):
+                        roles[key] = role
+    return roles
+
+
+def write_texture_role_map(mtl_root, role_map_path=TEXTURE_ROLE_MAP, alias_map_path=ce_dedup.TEXTURE_ALIAS_MAP,
+                           catalog=None):
+    roles = collect_texture_roles(mtl_root, alias_map_path, catalog)
+    os.makedirs(os.path.dirname(os.path.abspath(role_map_path)), exist_ok=True)
+    with open(role_map_path, 'w', encoding='utf-8') as file:
+        json.dump({'roles': roles}, file, indent=1, sort_keys=True)
+    print(f"Texture roles: {len(roles)} textures written to {role_map_path}")
+    return roles
+
+
+def load_texture_role_map(role_map_path=TEXTURE_ROLE_MAP):
+    if not role_map_path or not os.path.exists(role_map_path):
+        return {}
+    with open(role_map_path, 'r', encoding='utf-8') as file:
+        return json.load(file).get('roles', {})
+
+
+def classify_texture(texture_path, role_map):
+    """
+    Role of a texture given its dump relative path: the _glossmap image exported from an attached alpha
+    is always gloss, otherwise the .mtl slots using it decide, then its file name suffix.
+    """
+    if classify_texture_name(texture_path) == 'gloss':
+        return 'gloss'
+    return role_map.get(ce_dedup.normalize_asset_key(texture_path)) or classify_texture_name(texture_path)
+
+
+def apply_texture_role(texture, role_name):
+    """
+    Sets the compression, sRGB, LOD group, mip and streaming settings of a role on an imported texture.
+    Run right after import, before the chunk is saved, so the package is written once with its final settings.
+    """
+    import unreal
+    role = TEXTURE_ROLES[role_name]
+    texture.set_editor_properties({
+        'compression_settings': getattr(unreal.TextureCompressionSettings, role.compression_settings),
+        'srgb': role.srgb,
+        'lod_group': getattr(unreal.TextureGroup, role.lod_group),
+        'mip_gen_settings': getattr(unreal.TextureMipGenSettings, role.mip_gen_settings),
+        'virtual_texture_streaming': role.virtual_texture_streaming and ENABLE_VIRTUAL_TEXTURES,
+    })